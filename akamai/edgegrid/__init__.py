@@ -30,10 +30,12 @@ usage:
     Hongkong, Hong Kong
 """
 
-from .edgegrid import EdgeGridAuth
+from .clock import ClockSkew
+from .edgegrid import EdgeGridAuth, StreamingBody
 from .edgerc import EdgeRc
+from .session import EdgeGridSession
 
-__all__ = ['EdgeGridAuth', 'EdgeRc']
+__all__ = ['ClockSkew', 'EdgeGridAuth', 'EdgeGridSession', 'EdgeRc', 'StreamingBody']
 
 __title__ = 'edgegrid-python'
 __version__ = '2.0.7rc1'
@@ -0,0 +1,193 @@
+# pylint: disable=too-many-arguments,too-many-instance-attributes
+"""Batching of many small JSON POST requests, such as purge requests"""
+
+import json
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urljoin
+
+logger = logging.getLogger(__name__)
+
+__all__ = ['BatchingClient']
+
+# the Fast Purge API accepts request bodies of up to 50,000 bytes
+PURGE_MAX_BYTES = 50000
+JSON_SEPARATORS = (',', ':')
+
+
+def dump_json(value):
+    """Serializes a value as compact JSON, as the batch sizes are computed"""
+    return json.dumps(value, separators=JSON_SEPARATORS)
+
+
+class BatchingClient:
+    """Accumulates items, e.g. purge objects, and sends them as the array of a single JSON
+    POST body once a batch reaches max_items items or max_bytes bytes, or max_delay seconds
+    after its first item. Each submitted item gets a future resolved with the response of
+    its batch. Batches are sent by a bounded pool of worker threads, and submit() blocks
+    while max_pending items are waiting to be sent.
+
+    Usage::
+        >>> with session.batch('/ccu/v3/invalidate/url/production') as purges:
+        ...     futures = [purges.submit(url) for url in urls]
+        >>> futures[0].result().status_code
+        201
+
+    """
+
+    def __init__(self, session, url, *, key='objects', fields=None, max_items=1000,
+                 max_bytes=None, max_delay=1.0, workers=4, max_pending=10000, method='POST',
+                 clock=time.monotonic):
+        """
+        :param session: EdgeGridSession (or requests.Session) sending the batches
+        :param url: request URL, relative to the session's base_url if set
+        :param key: name of the JSON array the items are sent in (default 'objects')
+        :param fields: other fields of the JSON body, e.g. {'hostname': 'www.example.com'}
+        :param max_items: number of items which triggers a flush (default 1000)
+        :param max_bytes: maximum size of a JSON body in bytes (default is the smaller of
+            the 50,000 bytes limit of the Fast Purge API and the max_body of the session's
+            EdgeGridAuth, so that the whole body is covered by the signature)
+        :param max_delay: seconds after its first item that a batch is flushed (default 1.0)
+        :param workers: number of batches sent concurrently (default 4)
+        :param max_pending: number of submitted items not yet sent above which submit()
+            blocks (default 10000)
+        :param method: HTTP method (default 'POST')
+        :param clock: monotonic clock in seconds (default time.monotonic)
+        """
+        self.session = session
+        self.url = url
+        self.key = key
+        self.fields = dict(fields or {})
+        self.max_items = max_items
+        if max_bytes is None:
+            max_bytes = PURGE_MAX_BYTES
+            if hasattr(session.auth, 'engine_for'):
+                # the max_body of the signing policy of the URL, if any
+                full_url = urljoin(getattr(session, 'base_url', None) or '', url)
+                max_body = session.auth.engine_for(full_url).max_body
+            else:
+                max_body = getattr(getattr(session.auth, 'ah', None), 'max_body', None)
+            if max_body:
+                max_bytes = min(max_bytes, max_body)
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self.method = method
+        self.clock = clock
+
+        # the size of a body with an empty array; each item adds its size and a comma
+        self.empty_size = len(dump_json({**self.fields, key: []}).encode('utf8'))
+        self._cond = threading.Condition()
+        self._items = []
+        self._futures = []
+        self._size = self.empty_size
+        self._deadline = None
+        self._closed = False
+        self._pending = threading.Semaphore(max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix='edgegrid-batch')
+        self._timer = threading.Thread(target=self._run_timer, daemon=True)
+        self._timer.start()
+
+    def submit(self, item, timeout=None):
+        """
+        Adds an item to the current batch.
+
+        :param item: JSON serializable item
+        :param timeout: seconds to wait while max_pending items are waiting to be sent
+            (default None, wait until there is room)
+        :returns: concurrent.futures.Future resolved with the requests.Response of the
+            batch, or with the exception which failed it
+        :raises ValueError: if the item alone does not fit in max_bytes
+        :raises TimeoutError: if there was no room for the item within timeout
+        """
+        item_size = len(dump_json(item).encode('utf8'))
+        if self.empty_size + item_size > self.max_bytes:
+            raise ValueError(f'akamai.edgegrid: item of {item_size} bytes does not fit in '
+                             f'a batch of {self.max_bytes} bytes')
+        if not self._pending.acquire(timeout=timeout):  # pylint: disable=consider-using-with
+            raise TimeoutError(f'akamai.edgegrid: no room for the item within {timeout}s')
+
+        future = Future()
+        with self._cond:
+            if self._closed:
+                self._pending.release()
+                raise RuntimeError('akamai.edgegrid: cannot submit to a closed BatchingClient')
+            added_size = item_size + (1 if self._items else 0)
+            if self._size + added_size > self.max_bytes:
+                self._flush_locked()
+                added_size = item_size
+            self._items.append(item)
+            self._futures.append(future)
+            self._size += added_size
+            if self._deadline is None:
+                self._deadline = self.clock() + self.max_delay
+                self._cond.notify()
+            if len(self._items) >= self.max_items:
+                self._flush_locked()
+        return future
+
+    def flush(self):
+        """Sends the current batch without waiting for a threshold"""
+        with self._cond:
+            self._flush_locked()
+
+    def close(self):
+        """Sends the current batch and waits until all batches have been sent"""
+        with self._cond:
+            if self._closed:
+                return
+            self._flush_locked()
+            self._closed = True
+            self._cond.notify()
+        self._timer.join()
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def _flush_locked(self):
+        items, futures = self._items, self._futures
+        self._items, self._futures = [], []
+        self._size = self.empty_size
+        self._deadline = None
+        if items:
+            self._executor.submit(self._send, items, futures)
+
+    def _run_timer(self):
+        with self._cond:
+            while not self._closed:
+                if self._deadline is None:
+                    self._cond.wait()
+                    continue
+                remaining = self._deadline - self.clock()
+                if remaining <= 0:
+                    self._flush_locked()
+                else:
+                    self._cond.wait(remaining)
+
+    def _send(self, items, futures):
+        # items whose future was cancelled are not sent
+        sent = [(item, future) for item, future in zip(items, futures)
+                if future.set_running_or_notify_cancel()]
+        if len(sent) < len(futures):
+            self._pending.release(len(futures) - len(sent))
+        if not sent:
+            return
+        body = dump_json({**self.fields, self.key: [item for item, _ in sent]})
+        logger.debug("sending a batch of %d items in %d bytes", len(sent), len(body))
+        try:
+            res = self.session.request(self.method, self.url, data=body.encode('utf8'),
+                                       headers={'Content-Type': 'application/json'})
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            for _, future in sent:
+                future.set_exception(exc)
+        else:
+            for _, future in sent:
+                future.set_result(res)
+        finally:
+            self._pending.release(len(sent))
@@ -0,0 +1,208 @@
+# pylint: disable=too-many-arguments,too-many-instance-attributes
+"""Per-host and per-endpoint circuit breaking for EdgeGrid sessions"""
+
+import logging
+import threading
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+import requests
+
+from .metrics import default_endpoint
+
+logger = logging.getLogger(__name__)
+
+__all__ = ['CircuitBreaker', 'CircuitOpenError']
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised instead of sending a request while the circuit of its host and endpoint
+    is open"""
+
+
+def is_failure_response(res):
+    """Tells whether a response counts as a failure: a server error or a 429 Too Many
+    Requests, which means the API is shedding load itself"""
+    return res.status_code >= 500 or res.status_code == 429
+
+
+class RollingWindow:
+    """Counts requests, failures and slow requests over the last duration seconds in
+    a ring of buckets, so that old outcomes expire a bucket at a time"""
+
+    def __init__(self, duration, buckets, clock):
+        self.width = duration / buckets
+        self.buckets = buckets
+        self.clock = clock
+        # [bucket number, requests, failures, slow requests]
+        self.counts = deque()
+
+    def _expire(self):
+        """Drops the buckets which left the window and returns the current bucket number"""
+        current = int(self.clock() // self.width)
+        while self.counts and self.counts[0][0] <= current - self.buckets:
+            self.counts.popleft()
+        return current
+
+    def add(self, failure, slow):
+        """Counts a request"""
+        current = self._expire()
+        if not self.counts or self.counts[-1][0] != current:
+            self.counts.append([current, 0, 0, 0])
+        bucket = self.counts[-1]
+        bucket[1] += 1
+        bucket[2] += failure
+        bucket[3] += slow
+
+    def totals(self):
+        """Returns the number of requests, failures and slow requests in the window"""
+        self._expire()
+        return tuple(sum(bucket[i] for bucket in self.counts) for i in (1, 2, 3))
+
+    def clear(self):
+        """Forgets all counted requests"""
+        self.counts.clear()
+
+
+class Circuit:
+    """The state of the circuit of one host and endpoint"""
+
+    def __init__(self, breaker, key):
+        self.breaker = breaker
+        self.key = key
+        self.state = CLOSED
+        self.window = RollingWindow(breaker.window, breaker.buckets, breaker.clock)
+        self.opened_at = None
+        self.probes = 0
+        self.probe_successes = 0
+
+    def acquire(self):
+        """Admits a request, telling whether it is a half-open probe, or raises
+        CircuitOpenError to fail fast"""
+        breaker = self.breaker
+        with breaker.lock:
+            if self.state == OPEN and breaker.clock() >= self.opened_at + breaker.open_duration:
+                logger.info("circuit %s half-open, probing", self.key)
+                self.state = HALF_OPEN
+                self.probes = self.probe_successes = 0
+            if self.state == CLOSED:
+                return False
+            if self.state == HALF_OPEN and self.probes < breaker.half_open_requests:
+                self.probes += 1
+                return True
+            retry_in = max(self.opened_at + breaker.open_duration - breaker.clock(), 0.0)
+        raise CircuitOpenError(
+            f'akamai.edgegrid: circuit open for {self.key[0]}'
+            f'{self.key[1] if self.key[1] else ""}, retry in {retry_in:.1f}s')
+
+    def record(self, failure, elapsed, probe):
+        """Records the outcome of an admitted request. A failure of None releases the
+        request without an outcome, e.g. when it was cancelled."""
+        breaker = self.breaker
+        slow = breaker.slow_call_duration is not None and elapsed >= breaker.slow_call_duration
+        with breaker.lock:
+            if probe:
+                self.probes -= 1
+            if failure is None or self.state == OPEN:
+                return
+            if self.state == HALF_OPEN:
+                if not probe:
+                    return
+                if failure or slow:
+                    self._open('probe failed')
+                else:
+                    self.probe_successes += 1
+                    if self.probe_successes >= breaker.half_open_requests:
+                        logger.info("circuit %s closed", self.key)
+                        self.state = CLOSED
+                        self.window.clear()
+                return
+
+            self.window.add(failure, slow)
+            total, failures, slows = self.window.totals()
+            if total < breaker.min_requests:
+                return
+            if failures / total >= breaker.failure_rate:
+                self._open(f'{failures} of {total} requests failed')
+            elif breaker.slow_call_duration is not None and slows / total >= breaker.slow_call_rate:
+                self._open(f'{slows} of {total} requests were slow')
+
+    def _open(self, reason):
+        logger.warning("circuit %s open: %s", self.key, reason)
+        self.state = OPEN
+        self.opened_at = self.breaker.clock()
+        self.window.clear()
+
+
+class CircuitBreaker:
+    """Stops sending requests to a host and endpoint whose error rate or latency crossed
+    a threshold in a rolling window, failing fast with CircuitOpenError instead. After
+    open_duration seconds, a few half-open probe requests are let through: the circuit
+    closes if they succeed and opens again otherwise.
+
+    Usage::
+        >>> session = EdgeGridSession.from_edgerc(
+        ...     '~/.edgerc', breaker=CircuitBreaker(slow_call_duration=5.0))
+
+    """
+
+    def __init__(self, *, failure_rate=0.5, slow_call_duration=None, slow_call_rate=0.5,
+                 min_requests=10, window=60.0, buckets=6, open_duration=30.0,
+                 half_open_requests=1, per_endpoint=True, is_failure=is_failure_response,
+                 clock=time.monotonic):
+        """
+        :param failure_rate: ratio of failed requests in the window opening the circuit
+            (default 0.5)
+        :param slow_call_duration: seconds after which a request counts as slow (default
+            None, latency is not tracked)
+        :param slow_call_rate: ratio of slow requests in the window opening the circuit
+            (default 0.5)
+        :param min_requests: number of requests in the window before the circuit may open
+            (default 10)
+        :param window: length of the rolling window in seconds (default 60.0)
+        :param buckets: number of buckets the window expires by (default 6)
+        :param open_duration: seconds the circuit stays open before probing (default 30.0)
+        :param half_open_requests: number of probe requests which must succeed to close
+            the circuit (default 1)
+        :param per_endpoint: keep a circuit per endpoint of a host, rather than per host
+            (default True)
+        :param is_failure: callable telling whether a response counts as a failure (default
+            server errors and 429 Too Many Requests); connection errors and timeouts always do
+        :param clock: monotonic clock in seconds (default time.monotonic)
+        """
+        self.failure_rate = failure_rate
+        self.slow_call_duration = slow_call_duration
+        self.slow_call_rate = slow_call_rate
+        self.min_requests = min_requests
+        self.window = window
+        self.buckets = buckets
+        self.open_duration = open_duration
+        self.half_open_requests = half_open_requests
+        self.per_endpoint = per_endpoint
+        self.is_failure = is_failure
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.circuits = {}
+
+    def key(self, url):
+        """Returns the host and endpoint (or None if not per_endpoint) of a URL"""
+        parsed = urlparse(url)
+        return parsed.netloc, default_endpoint(parsed.path) if self.per_endpoint else None
+
+    def circuit(self, url):
+        """Returns the circuit of the host and endpoint of a URL"""
+        key = self.key(url)
+        with self.lock:
+            circuit = self.circuits.get(key)
+            if circuit is None:
+                circuit = self.circuits[key] = Circuit(self, key)
+            return circuit
+
+    def state(self, url):
+        """Returns the state of the circuit of a URL: 'closed', 'open' or 'half-open'"""
+        return self.circuit(url).state
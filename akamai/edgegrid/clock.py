@@ -0,0 +1,64 @@
+"""Server clock skew estimation for EdgeGrid timestamps"""
+
+import logging
+import time
+from email.utils import parsedate_to_datetime
+
+from .edgegrid import eg_timestamp
+
+logger = logging.getLogger(__name__)
+
+__all__ = ['ClockSkew']
+
+
+class ClockSkew:
+    """Estimates the offset between the local clock and the server clock from the Date
+    headers of responses, so that EdgeGrid timestamps can be generated in server time.
+
+    Usage::
+        >>> auth = EdgeGridAuth.from_edgerc('~/.edgerc', clock_skew=ClockSkew())
+
+    """
+
+    def __init__(self, *, smoothing=0.5, clock=time.time):
+        """
+        :param smoothing: weight of a new sample in the moving average of the offset,
+            between 0 (ignore new samples) and 1 (use only the last sample) (default 0.5)
+        :param clock: function returning the local time in seconds since the epoch
+        """
+        self.smoothing = smoothing
+        self.clock = clock
+        self.offset = 0.0
+        self.samples = 0
+
+    def observe(self, res, *, reset=False):
+        """Updates the offset estimate from the Date header of a response.
+
+        :param res: requests.Response
+        :param reset: replace the current estimate instead of averaging with it
+        :returns: True if the response carried a usable Date header
+        """
+        try:
+            server_time = parsedate_to_datetime(res.headers['Date']).timestamp()
+        except (KeyError, TypeError, ValueError):
+            return False
+
+        # The server generated Date about halfway through the round trip and truncated
+        # it to whole seconds
+        midpoint = self.clock() - res.elapsed.total_seconds() / 2
+        sample = server_time + 0.5 - midpoint
+        if reset or not self.samples:
+            self.offset = sample
+        else:
+            self.offset += self.smoothing * (sample - self.offset)
+        self.samples += 1
+        logger.debug("server clock offset sample %.3fs, estimate %.3fs", sample, self.offset)
+        return True
+
+    def now(self):
+        """Returns the estimated server time in seconds since the epoch"""
+        return self.clock() + self.offset
+
+    def timestamp(self):
+        """Generates an EdgeGrid timestamp in estimated server time"""
+        return eg_timestamp(self.now())
@@ -0,0 +1,143 @@
+"""Deadlines capping the total time spent on requests, propagated to nested calls"""
+
+import contextvars
+import logging
+import socket
+import time
+
+import requests
+from urllib3.exceptions import ReadTimeoutError
+
+logger = logging.getLogger(__name__)
+
+__all__ = ['Deadline', 'DeadlineExceeded', 'current_deadline']
+
+_current = contextvars.ContextVar('akamai.edgegrid.deadline', default=None)
+
+
+class DeadlineExceeded(requests.Timeout):
+    """Raised when a request could not complete before its deadline"""
+
+
+def current_deadline():
+    """Returns the Deadline in effect in the current context, or None"""
+    return _current.get()
+
+
+class Deadline:
+    """A point in time by which a request, including its redirects, retries and hedged
+    copies, must have completed. Used as a context manager, it applies to every request
+    sent in the context, and nested deadlines can only shorten the time left.
+
+    Usage::
+        >>> with Deadline(2.0):
+        ...     groups = session.get('/papi/v1/groups')
+        ...     contracts = session.get('/papi/v1/contracts')
+
+    """
+
+    def __init__(self, seconds, *, clock=time.monotonic):
+        """
+        :param seconds: time left from now, in seconds
+        :param clock: monotonic clock in seconds (default time.monotonic)
+        """
+        self.clock = clock
+        self.expires = clock() + seconds
+        self._tokens = []
+
+    def remaining(self):
+        """Returns the time left in seconds, which is negative once the deadline passed"""
+        return self.expires - self.clock()
+
+    def expired(self):
+        """Tells whether the deadline passed"""
+        return self.remaining() <= 0
+
+    def timeout(self, timeout=None, request=None):
+        """
+        Caps a requests timeout, a number of seconds or a (connect, read) tuple, at the
+        time left.
+
+        :param timeout: timeout of the request (default None, no timeout)
+        :param request: the request the timeout is for, set on DeadlineExceeded
+        :raises DeadlineExceeded: if the deadline already passed
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(
+                f'akamai.edgegrid: deadline exceeded by {-remaining:.3f}s', request=request)
+        if isinstance(timeout, tuple):
+            return tuple(remaining if t is None else min(t, remaining) for t in timeout)
+        return remaining if timeout is None else min(timeout, remaining)
+
+    def guard_body(self, res, *_, **kwargs):
+        """Response hook making the reads of a response body, unless the request is
+        streamed, raise DeadlineExceeded once the deadline passed"""
+        if not kwargs.get('stream') and not isinstance(res.raw, DeadlineBody):
+            res.raw = DeadlineBody(res.raw, self, res.request)
+
+    def __enter__(self):
+        parent = _current.get()
+        # an inner deadline cannot extend the time left to an outer one
+        effective = self
+        if parent is not None and parent.remaining() < self.remaining():
+            effective = parent
+        self._tokens.append(_current.set(effective))
+        return self
+
+    def __exit__(self, *_):
+        _current.reset(self._tokens.pop())
+
+
+class DeadlineBody:
+    """The raw body of a response, e.g. a urllib3 HTTPResponse, read within a deadline.
+    Each read returns what the connection received so far, waiting at most the time left,
+    so that a server trickling the body cannot hold a read past the deadline."""
+
+    def __init__(self, raw, deadline, request):
+        self.raw = raw
+        self.deadline = deadline
+        self.request = request
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    def stream(self, amt=2 ** 16, decode_content=None):
+        """Yields the body in chunks of at most amt bytes, as iter_content() reads it"""
+        if not hasattr(self.raw, 'read1'):
+            # e.g. the bodies of HTTP2Adapter, which yield chunks as they arrive
+            for chunk in self.raw.stream(amt, decode_content=decode_content):
+                self.deadline.timeout(request=self.request)
+                yield chunk
+            return
+        while True:
+            chunk = self.read1(amt, decode_content)
+            if not chunk:
+                return
+            yield chunk
+
+    def read(self, amt=None, decode_content=None, **kwargs):
+        """Reads at most amt bytes of the body, or all of it"""
+        if not hasattr(self.raw, 'read1') or kwargs:
+            self.deadline.timeout(request=self.request)
+            return self.raw.read(amt, decode_content=decode_content, **kwargs)
+        if amt is None:
+            return b''.join(self.stream(decode_content=decode_content))
+        return self.read1(amt, decode_content)
+
+    def read1(self, amt=None, decode_content=None):
+        """Reads at most amt bytes of what the connection received, waiting for some
+        at most the time left"""
+        sock = getattr(getattr(self.raw, 'connection', None), 'sock', None)
+        if sock is None:
+            timeout = self.deadline.timeout(request=self.request)
+        else:
+            timeout = self.deadline.timeout(sock.gettimeout(), self.request)
+            sock.settimeout(timeout)
+        try:
+            return self.raw.read1(amt, decode_content=decode_content)
+        except (ReadTimeoutError, socket.timeout) as exc:
+            if self.deadline.expired():
+                raise DeadlineExceeded(f'akamai.edgegrid: deadline exceeded reading the body '
+                                       f'after {timeout:.3f}s', request=self.request) from exc
+            raise
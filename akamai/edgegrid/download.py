@@ -0,0 +1,281 @@
+# pylint: disable=too-many-arguments,too-many-instance-attributes
+"""Parallel ranged downloads of large files over signed requests"""
+
+import errno
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger(__name__)
+
+__all__ = ['Download', 'IncompleteDownload']
+
+CONTENT_RANGE_RE = re.compile(r'bytes (?:(\d+)-(\d+)|\*)/(\d+|\*)')
+# Content-Range counts the bytes of the encoded body, so ranges are requested of the body
+# as is rather than of a compressed encoding which requests would decode
+IDENTITY = {'Accept-Encoding': 'identity'}
+RETRIED_ERRORS = (requests.ConnectionError, requests.Timeout,
+                  requests.exceptions.ChunkedEncodingError)
+
+Download = namedtuple('Download', ['path', 'size', 'parts', 'resumed', 'elapsed'])
+Download.__doc__ = """Outcome of EdgeGridSession.download(): the path of the downloaded file,
+its size, the number of parts it was downloaded in, the number of bytes which had been
+downloaded by an earlier attempt and the seconds the download took"""
+
+
+class IncompleteDownload(requests.RequestException):
+    """Raised when a download could not be completed. The parts downloaded so far are
+    kept, and downloading the same URL to the same path again resumes the download."""
+
+
+def parse_content_range(value):
+    """Returns the first byte, last byte and total size of a Content-Range header, with
+    None for the unknown ones, or None if the header is missing or invalid"""
+    match = CONTENT_RANGE_RE.fullmatch((value or '').strip())
+    if match is None:
+        return None
+    return tuple(None if group in (None, '*') else int(group) for group in match.groups())
+
+
+class RangedDownload:
+    """Downloads a file in parts of part_size bytes with parallel Range GET requests sent
+    by the session, so each is signed on its own. The parts are written in place into a
+    preallocated <path>.partial file, and the parts already written are recorded in
+    <path>.partial.json so that an interrupted download resumes where it stopped. The
+    file is moved to path once every part has been written."""
+
+    def __init__(self, session, url, path, *, part_size=8 * 1024 * 1024, workers=4,
+                 retries=2, chunk_size=65536):
+        self.session = session
+        self.url = url
+        self.path = os.fspath(path)
+        self.partial = self.path + '.partial'
+        self.state_path = self.partial + '.json'
+        self.part_size = part_size
+        self.workers = workers
+        self.retries = retries
+        self.chunk_size = chunk_size
+        self.size = None
+        self.validator = None
+        self.done = set()
+        self._lock = threading.Lock()
+        self._failed = threading.Event()
+        self._fd = None
+        self._headers = CaseInsensitiveDict()
+
+    def run(self, **kwargs):
+        """
+        Downloads the file.
+
+        :param kwargs: passed to every request, e.g. timeout, params or headers, which
+            cannot override the Range and Accept-Encoding headers of the parts
+        :returns: Download
+        :raises IncompleteDownload: if a part could not be downloaded
+        """
+        start = time.monotonic()
+        self._headers = CaseInsensitiveDict(kwargs.pop('headers', None))
+        self._headers.update(IDENTITY)
+        # the parts are always streamed to the file
+        kwargs.pop('stream', None)
+        with self.session.get(self.url, headers=self._range_headers(0, 0), stream=True,
+                              **kwargs) as res:
+            if res.status_code == 200:
+                # ranges are not supported, the whole file is in this response
+                size = self._write_whole(res)
+                return Download(self.path, size, 1, 0, time.monotonic() - start)
+            self._probe(res)
+
+        resumed = self._open()
+        try:
+            parts = [i for i in range(self.parts()) if i not in self.done]
+            logger.debug("downloading %s in %d parts of %d bytes, %d to go",
+                         self.url, self.parts(), self.part_size, len(parts))
+            with ThreadPoolExecutor(max_workers=self.workers,
+                                    thread_name_prefix='edgegrid-download') as executor:
+                futures = [executor.submit(self._fetch, i, kwargs) for i in parts]
+            for future in futures:
+                if future.exception() is not None:
+                    raise IncompleteDownload(
+                        f'akamai.edgegrid: downloaded {len(self.done)} of {self.parts()} '
+                        f'parts of {self.url}: {future.exception()}') from future.exception()
+
+            # every part was written, and the file was not truncated since
+            if len(self.done) != self.parts() or os.fstat(self._fd).st_size != self.size:
+                raise IncompleteDownload(f'akamai.edgegrid: incomplete download of {self.url}')
+        finally:
+            os.close(self._fd)
+        os.replace(self.partial, self.path)
+        os.remove(self.state_path)
+        return Download(self.path, self.size, self.parts(), resumed, time.monotonic() - start)
+
+    def parts(self):
+        """Returns the number of parts of the file"""
+        return -(-self.size // self.part_size)
+
+    def _probe(self, res):
+        """Learns the size of the file and the validator identifying its version from
+        the response to a request for its first byte"""
+        content_range = parse_content_range(res.headers.get('Content-Range'))
+        if res.status_code == 416 and content_range is not None and content_range[2] == 0:
+            self.size = 0
+            return
+        res.raise_for_status()
+        if res.status_code != 206 or content_range is None or content_range[2] is None:
+            raise IncompleteDownload(
+                f'akamai.edgegrid: cannot determine the size of {self.url}', response=res)
+        self.size = content_range[2]
+        etag = res.headers.get('ETag')
+        # If-Range only accepts a strong entity tag
+        if etag and not etag.startswith('W/'):
+            self.validator = etag
+        else:
+            self.validator = res.headers.get('Last-Modified')
+
+    def state(self):
+        """Returns what identifies the download in its state file"""
+        return {'url': self.url, 'size': self.size, 'validator': self.validator,
+                'part_size': self.part_size}
+
+    def _open(self):
+        """Opens the partial file, keeping the parts of an earlier attempt at the same
+        download, and returns the number of bytes they hold"""
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                state = json.load(f)
+            done = state.pop('done')
+            # an earlier attempt at the same version of the file
+            if (state == self.state() and self.validator is not None
+                    and os.path.getsize(self.partial) == self.size):
+                self.done = set(done)
+        except (OSError, ValueError, KeyError):
+            pass
+
+        if self.done:
+            logger.debug("resuming %s with %d parts done", self.url, len(self.done))
+            self._fd = os.open(self.partial, os.O_RDWR | getattr(os, 'O_BINARY', 0))
+            return sum(self._part_range(i)[1] - self._part_range(i)[0] + 1 for i in self.done)
+
+        self._fd = os.open(self.partial, os.O_RDWR | os.O_CREAT | os.O_TRUNC
+                           | getattr(os, 'O_BINARY', 0))
+        os.ftruncate(self._fd, self.size)
+        if self.size and hasattr(os, 'posix_fallocate'):
+            try:
+                # reserve the disk space up front, failing early if there is not enough
+                os.posix_fallocate(self._fd, 0, self.size)
+            except OSError as exc:
+                if exc.errno == errno.ENOSPC:
+                    os.close(self._fd)
+                    raise
+        self._save_state()
+        return 0
+
+    def _save_state(self):
+        state = self.state()
+        state['done'] = sorted(self.done)
+        with open(self.state_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(self.state_path + '.tmp', self.state_path)
+
+    def _part_range(self, index):
+        first = index * self.part_size
+        return first, min(first + self.part_size, self.size) - 1
+
+    def _range_headers(self, first, last):
+        """Returns the headers of a request for bytes first to last"""
+        headers = self._headers.copy()
+        headers['Range'] = f'bytes={first}-{last}'
+        return headers
+
+    def _write(self, data, offset):
+        view = memoryview(data)
+        while view:
+            if hasattr(os, 'pwrite'):
+                written = os.pwrite(self._fd, view, offset)
+            else:
+                with self._lock:
+                    os.lseek(self._fd, offset, os.SEEK_SET)
+                    written = os.write(self._fd, view)
+            view = view[written:]
+            offset += written
+
+    def _fetch(self, index, kwargs):
+        """Downloads a part, unless another part failed already"""
+        if self._failed.is_set():
+            return
+        try:
+            self._fetch_part(index, kwargs)
+        except BaseException:
+            self._failed.set()
+            raise
+
+    def _fetch_part(self, index, kwargs):
+        """Downloads a part, retrying from the last byte received on transient errors"""
+        offset, last = self._part_range(index)
+        failures = 0
+        while offset <= last:
+            headers = self._range_headers(offset, last)
+            if self.validator is not None:
+                # the server sends the whole file instead if it changed
+                headers['If-Range'] = self.validator
+            received = offset
+            try:
+                with self.session.get(self.url, headers=headers, stream=True, **kwargs) as res:
+                    if res.status_code >= 500:
+                        res.raise_for_status()
+                    content_range = parse_content_range(res.headers.get('Content-Range'))
+                    if (res.status_code != 206 or content_range is None
+                            or content_range[0] != offset or content_range[2] != self.size):
+                        res.raise_for_status()
+                        raise IncompleteDownload(
+                            f'akamai.edgegrid: unexpected response to a request for bytes '
+                            f'{offset}-{last} of {self.url}: {res.status_code} '
+                            f'{res.headers.get("Content-Range")}, the file may have changed',
+                            response=res)
+                    for chunk in res.iter_content(self.chunk_size):
+                        chunk = chunk[:last + 1 - offset]
+                        self._write(chunk, offset)
+                        offset += len(chunk)
+            except (requests.HTTPError,) + RETRIED_ERRORS as exc:
+                if isinstance(exc, requests.HTTPError) and exc.response.status_code < 500:
+                    raise
+                failures += 1
+                if failures > self.retries:
+                    raise
+                logger.debug("retrying bytes %d-%d of %s: %s", offset, last, self.url, exc)
+                continue
+            if offset == received:
+                failures += 1
+                if failures > self.retries:
+                    raise IncompleteDownload(
+                        f'akamai.edgegrid: no data received for bytes {offset}-{last} '
+                        f'of {self.url}')
+
+        # the part is on disk before it is recorded as done
+        os.fsync(self._fd)
+        with self._lock:
+            self.done.add(index)
+            self._save_state()
+
+    def _write_whole(self, res):
+        """Writes the response to a request which ignored the Range header to path"""
+        written = 0
+        with open(self.partial, 'wb') as f:
+            for chunk in res.iter_content(self.chunk_size):
+                f.write(chunk)
+                written += len(chunk)
+        expected = res.headers.get('Content-Length')
+        if expected is not None and int(expected) != written:
+            raise IncompleteDownload(f'akamai.edgegrid: received {written} of {expected} '
+                                     f'bytes of {self.url}', response=res)
+        os.replace(self.partial, self.path)
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+        return written
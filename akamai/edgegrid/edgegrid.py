@@ -1,28 +1,45 @@
-# pylint: disable=too-many-arguments,missing-function-docstring
+# pylint: disable=too-many-arguments,too-many-instance-attributes,missing-function-docstring
 """EdgeGrid requests Auth handler"""
 
+import asyncio
 import logging
+import threading
 import uuid
 import hashlib
 import hmac
 import base64
+import io
+import mmap
 import re
 import os
+import stat
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
 from time import gmtime, strftime
 from urllib.parse import urlparse
 
 from requests.auth import AuthBase
 
+from .deadline import current_deadline
 from .edgerc import EdgeRc
+from .policy import SigningPolicyTable
 
 logger = logging.getLogger(__name__)
 
-__all__ = ['EdgeGridAuth']
+__all__ = ['DifferentialAuthHeaders', 'EdgeGridAuth', 'EdgeGridAuthHeaders',
+           'OptimizedAuthHeaders', 'RequestTemplate', 'StreamingBody']
 
+STREAM_CHUNK_SIZE = 8192
+# bodies hashing fewer bytes are signed in the caller thread by sign_future()
+INLINE_HASH_THRESHOLD = 65536
+WHITESPACE_RE = re.compile('\\s+')
 
-def eg_timestamp():
-    """Generates EdgeGrid compatible timestamp"""
-    return strftime('%Y%m%dT%H:%M:%S+0000', gmtime())
+
+def eg_timestamp(now=None):
+    """Generates EdgeGrid compatible timestamp for now (seconds since the epoch, default is
+    the current time)"""
+    return strftime('%Y%m%dT%H:%M:%S+0000', gmtime(now))
 
 
 def new_nonce():
@@ -79,23 +96,67 @@ def read_stream_and_rewind(f, max_read):
     return res
 
 
+def file_prefix_hash(f, max_body):
+    """Returns the content hash of up to max_body bytes of a binary regular file from its
+    current position, hashed from a read-only memory map of the file instead of being read
+    into a buffer, then rewinds the file like read_stream_and_rewind(). Returns None if f
+    is not a binary regular file or cannot be mapped, so that it is read instead."""
+    if not isinstance(f, (io.BufferedReader, io.BufferedRandom, io.FileIO)):
+        return None
+    try:
+        position = f.tell()
+        fd = f.fileno()
+        st = os.fstat(fd)
+    except (OSError, ValueError):
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+
+    length = min(max(st.st_size - position, 0), max_body)
+    content_hash = ''
+    if length:
+        # the offset of a mapping must be a multiple of the allocation granularity
+        start = position - position % mmap.ALLOCATIONGRANULARITY
+        try:
+            with mmap.mmap(fd, position + length - start, offset=start,
+                           access=mmap.ACCESS_READ) as mapped, \
+                    memoryview(mapped) as view, view[position - start:] as prefix:
+                content_hash = base64.b64encode(hashlib.sha256(prefix).digest()).decode('utf8')
+        except (OSError, ValueError):
+            return None
+    f.seek(0)
+    return content_hash
+
+
 def read_body_content(body, max_body):
     """The body argument may be one of the following:
     1. bytes object
     2. str object
     3. _io.BufferedReader object for body input from file
     4. requests_toolbelt.MultipartEncoder object for multipart form requests
-    5. httpie.uploads.ChunkedUploadStream object for chunked transfer encoding
-    (when --chunked, currently not supported)
+    5. StreamingBody object wrapping a generator, a MultipartEncoder or
+    httpie.uploads.ChunkedUploadStream object for chunked transfer encoding
     May raise TypeError for unexpected input type or OSError for I/O operations.
     """
     if isinstance(body, bytes):
         return body[:max_body]
     if isinstance(body, str):
-        return body.encode('utf8')[:max_body]
+        # the first max_body bytes encode at most max_body characters
+        return body[:max_body].encode('utf8')[:max_body]
+    if isinstance(body, StreamingBody):
+        return body.prefix[:max_body]
     return read_stream_and_rewind(body, max_body)
 
 
+def utf8_len(text, chunk_size=STREAM_CHUNK_SIZE):
+    """Returns the length of text encoded in UTF-8, encoding chunk_size characters at a
+    time instead of copying the whole text"""
+    if text.isascii():
+        return len(text)
+    return sum(len(text[i:i + chunk_size].encode('utf8'))
+               for i in range(0, len(text), chunk_size))
+
+
 def determine_body_len(body):
     """May raise exception if body appears to be a file (is not a str, bytes or MultipartEncoder)
     but either:
@@ -104,7 +165,7 @@ def determine_body_len(body):
     if isinstance(body, bytes):
         return len(body)
     if isinstance(body, str):
-        return len(body.encode('utf8'))
+        return utf8_len(body)
 
     try:
         # a MultipartEncoder?
@@ -118,6 +179,131 @@ def determine_body_len(body):
                 f'akamai.edgegrid: unexpected body type: {type(body).__name__}') from exc
 
 
+def is_streaming_body(body):
+    """Tells whether body can only be read once, i.e. it is neither str, bytes nor a seekable
+    file, and must be wrapped in a StreamingBody before its content can be hashed"""
+    if body is None or isinstance(body, (bytes, str, StreamingBody)):
+        return False
+    return not hasattr(body, 'seek')
+
+
+def iter_body_chunks(body, chunk_size=STREAM_CHUNK_SIZE):
+    """Yields the content of a readable (e.g. MultipartEncoder) or iterable (e.g. generator,
+    ChunkedUploadStream) body as bytes chunks"""
+    if hasattr(body, 'read'):
+        while True:
+            chunk = body.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk.encode('utf8') if isinstance(chunk, str) else chunk
+    else:
+        for chunk in body:
+            if chunk:
+                yield chunk.encode('utf8') if isinstance(chunk, str) else chunk
+
+
+class StreamingBody:
+    """A request body wrapper for streams which cannot be rewound, like generators,
+    httpie's ChunkedUploadStream or a MultipartEncoder.
+
+    On creation it pulls chunks from the stream until max_body bytes are buffered, hashing
+    them as they pass through. Iterating the wrapper yields the buffered prefix followed by
+    the rest of the stream, so the transport sends the whole body while at most max_body
+    bytes (plus one chunk) are held in memory and the stream is never rewound.
+    """
+
+    def __init__(self, body, max_body, chunk_size=STREAM_CHUNK_SIZE):
+        self.max_body = max_body
+        self._chunks = iter_body_chunks(body, chunk_size)
+        if hasattr(body, 'len'):
+            # preserve the MultipartEncoder length so that Content-Length can still be computed
+            self.len = body.len
+
+        self._prefix = deque()
+        # the chunks read ahead, still referenced once sent so that the body can be signed
+        # again, e.g. for a redirect to a path with another max_body
+        self._read_ahead = []
+        self.buffered = 0
+        self._sending = False
+        self._buffer(max_body)
+        self.hashed = min(self.buffered, max_body)
+        self.truncated = self.buffered > max_body
+        self.content_hash = self._hash(max_body)
+
+    def _buffer(self, max_body):
+        """Pulls chunks from the stream until more than max_body bytes are buffered"""
+        while self.buffered <= max_body and not self._sending:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._prefix.append(chunk)
+            self._read_ahead.append(chunk)
+            self.buffered += len(chunk)
+
+    def content_hash_for(self, max_body):
+        """Returns the content hash of the first max_body bytes of the body, buffering more
+        of the stream if it has not been sent yet. Once sent, the hash covers at most the
+        bytes buffered before."""
+        if max_body == self.max_body:
+            return self.content_hash
+        self._buffer(max_body)
+        return self._hash(max_body)
+
+    def _hash(self, max_body):
+        hasher = hashlib.sha256()
+        remaining = max_body
+        for chunk in self._read_ahead:
+            if remaining <= 0:
+                break
+            hasher.update(memoryview(chunk)[:remaining])
+            remaining -= len(chunk)
+        if remaining == max_body:
+            return ''
+        return base64.b64encode(hasher.digest()).decode('utf8')
+
+    @property
+    def prefix(self):
+        """The buffered beginning of the body which has not been sent yet"""
+        return b''.join(self._prefix)
+
+    def __iter__(self):
+        self._sending = True
+        while self._prefix:
+            yield self._prefix.popleft()
+        yield from self._chunks
+
+
+def body_hash_window(body, max_body):
+    """Returns the number of body bytes covered by the content hash and whether the body was
+    truncated for hashing, or (None, None) when the body length cannot be determined"""
+    if isinstance(body, StreamingBody):
+        return body.hashed, body.truncated
+    try:
+        body_len = determine_body_len(body)
+    except (TypeError, OSError):
+        return None, None
+    return min(body_len, max_body), body_len > max_body
+
+
+_shared_executors = {}
+_shared_executors_lock = threading.Lock()
+
+
+def hashing_executor():
+    """Returns the executor shared by all EdgeGridAuth instances for reading and hashing
+    large request bodies outside of the caller thread"""
+    with _shared_executors_lock:
+        if 'hashing' not in _shared_executors:
+            _shared_executors['hashing'] = ThreadPoolExecutor(
+                max_workers=min(4, os.cpu_count() or 1), thread_name_prefix='edgegrid-hashing')
+        return _shared_executors['hashing']
+
+
+def is_timestamp_rejection(res):
+    """Tells whether the response rejects a request because of its EdgeGrid timestamp"""
+    return res.status_code == 401 and 'timestamp' in res.text.lower()
+
+
 class EdgeGridAuth(AuthBase):
     """A Requests authentication handler that provides Akamai {OPEN} EdgeGrid support.
 
@@ -134,7 +320,9 @@ class EdgeGridAuth(AuthBase):
     """
 
     def __init__(self, client_token, client_secret, access_token,
-                 *, headers_to_sign=(), max_body=131072):
+                 *, headers_to_sign=(), max_body=131072, clock_skew=None, tracer=None,
+                 engine='optimized', executor=None, inline_threshold=INLINE_HASH_THRESHOLD,
+                 policies=None):
         """Initialize authentication using the given parameters from the Akamai OPEN APIs
            Interface:
 
@@ -145,19 +333,48 @@ class EdgeGridAuth(AuthBase):
             the signature.  This will be provided by specific APIs. (default [])
         :param max_body: Maximum content body size for POST requests. This will be provided by
             specific APIs. (default 131072)
+        :param clock_skew: optional ClockSkew estimator. When set, timestamps are generated in
+            estimated server time and a request rejected because of its timestamp is re-signed
+            and retried once. (default None)
+        :param tracer: optional tracer (see akamai.edgegrid.tracing) receiving a span for
+            each signed request. (default None)
+        :param engine: signing engine computing the authorization header, one of
+            'optimized', 'reference' (the original EdgeGridAuthHeaders implementation) and
+            'differential' (signs with both and reports mismatches), or a callable taking
+            the same arguments as EdgeGridAuthHeaders. (default 'optimized')
+        :param executor: concurrent.futures executor in which sign_future() and
+            sign_async() read and hash large bodies. (default a small thread pool shared by
+            all EdgeGridAuth instances)
+        :param inline_threshold: sign_future() and sign_async() sign str and bytes bodies
+            hashing fewer bytes in the caller thread. (default 65536)
+        :param policies: optional SigningPolicyTable overriding headers_to_sign and max_body
+            for the requests to some hosts and path prefixes. (default None)
 
         """
+        self.clock_skew = clock_skew
+        self.tracer = tracer
+        self.executor = executor
+        self.inline_threshold = inline_threshold
+        if isinstance(engine, str):
+            try:
+                engine = SIGNING_ENGINES[engine]
+            except KeyError:
+                raise ValueError(f'akamai.edgegrid: unknown signing engine: {engine}') from None
         # pylint: disable=invalid-name
-        self.ah = EdgeGridAuthHeaders(
+        self.ah = engine(
             client_token,
             client_secret,
             access_token,
             headers_to_sign=headers_to_sign,
             max_body=max_body
         )
+        self.policies = policies
+        # an engine per policy, signing with its headers_to_sign and max_body
+        self._engine = partial(engine, client_token, client_secret, access_token)
+        self._policy_engines = {}
 
     @staticmethod
-    def from_edgerc(rcinput, section='default'):
+    def from_edgerc(rcinput, section='default', **kwargs):
         """
         Returns an EdgeGridAuth object from the configuration from the given section
         of the given edgerc file.
@@ -165,6 +382,8 @@ class EdgeGridAuth(AuthBase):
         :param rcinput: EdgeRc instance or path to the edgerc file
         :param section: the section to use (this is the [bracketed] part of the edgerc,
             default is 'default')
+        :param kwargs: other EdgeGridAuth options, e.g. clock_skew or engine (policies
+            default to those of the section's signing_policies and signing_policies_file)
 
         """
         if isinstance(rcinput, EdgeRc):
@@ -172,15 +391,82 @@ class EdgeGridAuth(AuthBase):
         else:
             edgerc = EdgeRc(rcinput)
 
+        kwargs.setdefault('policies', SigningPolicyTable.from_edgerc(edgerc, section))
         return EdgeGridAuth(
             client_token=edgerc.get(section, 'client_token'),
             client_secret=edgerc.get(section, 'client_secret'),
             access_token=edgerc.get(section, 'access_token'),
             headers_to_sign=edgerc.getlist(section, 'headers_to_sign'),
-            max_body=edgerc.getint(section, 'max_body')
+            max_body=edgerc.getint(section, 'max_body'),
+            **kwargs
         )
 
-    def handle_redirect(self, res, **_):
+    def engine_for(self, url, headers=None):
+        """
+        Returns the signing engine of a request: the engine of the policy of its host and
+        path, or the engine of the handler if no policy applies.
+
+        :param url: request URL
+        :param headers: request headers, whose Host header overrides the host of url
+        """
+        if not self.policies:
+            return self.ah
+        parsed = urlparse(url)
+        host = headers.get('Host') if headers else None
+        policy = self.policies.resolve(host or parsed.netloc, parsed.path)
+        if policy is None:
+            return self.ah
+        engine = self._policy_engines.get(policy)
+        if engine is None:
+            engine = self._policy_engines[policy] = self._engine(
+                headers_to_sign=(self.ah.headers_to_sign if policy.headers_to_sign is None
+                                 else policy.headers_to_sign),
+                max_body=self.ah.max_body if policy.max_body is None else policy.max_body)
+        return engine
+
+    def timestamp(self):
+        """Generates the timestamp for a new signature"""
+        if self.clock_skew is not None:
+            return self.clock_skew.timestamp()
+        return eg_timestamp()
+
+    def retry_with_server_time(self, res, **kwargs):
+        """Re-signs a request rejected because of its timestamp once the clock skew has been
+        learned from the rejection, and sends it again"""
+        if not isinstance(res.request.body, (bytes, str, type(None))):
+            # a stream has been consumed by the first attempt
+            return None
+        logger.debug("timestamp rejected, retrying with clock offset %.3fs",
+                     self.clock_skew.offset)
+
+        # consume content and release the original connection
+        # to allow our new request to reuse the same one.
+        _ = res.content
+        res.close()
+        prep = res.request.copy()
+        prep.headers['Authorization'] = self.engine_for(prep.url, prep.headers).make_auth_header(
+            prep, self.timestamp(), new_nonce())
+        deadline = current_deadline()
+        if deadline is not None:
+            kwargs['timeout'] = deadline.timeout(kwargs.get('timeout'), prep)
+
+        retried = res.connection.send(prep, **kwargs)
+        retried.history.append(res)
+        retried.request = prep
+        self.clock_skew.observe(retried)
+        return retried
+
+    def handle_redirect(self, res, **kwargs):
+        """Response hook which learns the server clock skew (if enabled) and signs the
+        location of a redirect"""
+        if self.clock_skew is not None:
+            rejected = is_timestamp_rejection(res)
+            self.clock_skew.observe(res, reset=rejected)
+            if rejected:
+                retried = self.retry_with_server_time(res, **kwargs)
+                if retried is not None:
+                    return retried
+
         if res.is_redirect:
             redirect_location = res.headers['location']
 
@@ -188,17 +474,97 @@ class EdgeGridAuth(AuthBase):
             request_to_sign = res.request.copy()
             request_to_sign.url = redirect_location
 
-            res.request.headers['Authorization'] = self.ah.make_auth_header(
-                request_to_sign, eg_timestamp(), new_nonce())
+            engine = self.engine_for(redirect_location, request_to_sign.headers)
+            res.request.headers['Authorization'] = engine.make_auth_header(
+                request_to_sign, self.timestamp(), new_nonce())
+        return None
 
-    def __call__(self, r):
-        timestamp = eg_timestamp()
+    def resign(self, r):
+        """Signs an already signed request again with a fresh timestamp and nonce, e.g.
+        before sending it after a delay"""
+        r.headers['Authorization'] = self.engine_for(r.url, r.headers).make_auth_header(
+            r, self.timestamp(), new_nonce())
+        return r
+
+    def sign(self, r):
+        engine = self.engine_for(r.url, r.headers)
+        if r.method == 'POST' and is_streaming_body(r.body):
+            r.body = StreamingBody(r.body, engine.max_body)
+
+        timestamp = self.timestamp()
         nonce = new_nonce()
 
-        r.headers['Authorization'] = self.ah.make_auth_header(r, timestamp, nonce)
+        r.headers['Authorization'] = engine.make_auth_header(r, timestamp, nonce)
         r.register_hook('response', self.handle_redirect)
         return r
 
+    def __call__(self, r):
+        if self.tracer is None:
+            return self.sign(r)
+        return self.sign_traced(r, self.tracer)
+
+    def sign_traced(self, r, tracer):
+        """Signs a prepared request within an edgegrid.sign span of tracer"""
+        attributes = {'http.request.method': r.method, 'server.address': urlparse(r.url).hostname}
+        with tracer.start_span('edgegrid.sign', attributes) as span:
+            r = self.sign(r)
+            if r.method == 'POST' and r.body:
+                hashed, truncated = body_hash_window(
+                    r.body, self.engine_for(r.url, r.headers).max_body)
+                if hashed is not None:
+                    span.set_attribute('edgegrid.body.hashed_bytes', hashed)
+                    span.set_attribute('edgegrid.body.truncated', truncated)
+            return r
+
+    def signs_inline(self, r):
+        """Tells whether signing a prepared request is cheap enough for the caller thread:
+        there is no body to hash, or it is already in memory and fewer than inline_threshold
+        of its bytes are hashed. Reading file and stream bodies may block."""
+        if r.method != 'POST' or not r.body or isinstance(r.body, StreamingBody):
+            return True
+        if isinstance(r.body, (bytes, str)):
+            max_body = self.engine_for(r.url, r.headers).max_body
+            return min(len(r.body), max_body) < self.inline_threshold
+        return False
+
+    def sign_future(self, r):
+        """
+        Signs a prepared request like calling the auth handler, but reads and hashes a
+        large body in the executor, so that the caller thread is not blocked by file I/O
+        or SHA-256. SHA-256 releases the GIL on large buffers, so the caller keeps running
+        while a body is hashed.
+
+        :param r: prepared request
+        :returns: concurrent.futures.Future resolved with the signed request
+        """
+        if self.signs_inline(r):
+            future = Future()
+            try:
+                future.set_result(self(r))
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                future.set_exception(exc)
+            return future
+        logger.debug("signing a %s body in the executor", type(r.body).__name__)
+        return (self.executor or hashing_executor()).submit(self, r)
+
+    async def sign_async(self, r):
+        """
+        Awaitable version of sign_future() for asyncio code, which keeps the event loop
+        running while a large body is read and hashed.
+
+        Usage::
+            >>> prepared = requests.Request('POST', url, data=open('rules.json', 'rb')).prepare()
+            >>> prepared = await auth.sign_async(prepared)
+
+        :param r: prepared request
+        :returns: the signed request
+        """
+        return await asyncio.wrap_future(self.sign_future(r))
+
+    def compile(self, request):
+        """Returns a RequestTemplate for repeatedly sending the given prepared request"""
+        return RequestTemplate(self, request)
+
 
 class EdgeGridAuthHeaders:
     """
@@ -232,7 +598,14 @@ class EdgeGridAuthHeaders:
     def make_content_hash(self, body, method):
         logger.debug("body is '%s'", body)
         content_hash = ""
-        if method == 'POST':
+        if method == 'POST' and isinstance(body, StreamingBody):
+            # the body may have been wrapped for the max_body of another path, e.g. before
+            # a redirect
+            content_hash = body.content_hash_for(self.max_body)
+            if body.buffered > self.max_body:
+                logger.debug("streaming data is larger than maximum %d "
+                             "and was truncated for computing the hash", self.max_body)
+        elif method == 'POST':
             buf = read_body_content(body, self.max_body)
             if buf:
                 logger.debug("signing content: %s", buf)
@@ -275,7 +648,9 @@ class EdgeGridAuthHeaders:
 
         return header
 
-    def make_data_to_sign(self, request, auth_header):
+    def make_request_data(self, request):
+        """Returns the request part of the data to sign, i.e. everything but the trailing
+        unsigned authorization header"""
         parsed_url = urlparse(request.url)
 
         if request.headers.get('Host', False):
@@ -285,7 +660,7 @@ class EdgeGridAuthHeaders:
 
         self.get_header_versions(request.headers)
 
-        data_to_sign = '\t'.join([
+        return '\t'.join([
             request.method,
             parsed_url.scheme,
             netloc,
@@ -294,8 +669,10 @@ class EdgeGridAuthHeaders:
             ('?' + parsed_url.query if parsed_url.query else ""),
             self.canonicalize_headers(request.headers),
             self.make_content_hash(request.body or '', request.method),
-            auth_header
         ])
+
+    def make_data_to_sign(self, request, auth_header):
+        data_to_sign = self.make_request_data(request) + '\t' + auth_header
         logger.debug('data to sign: %s', '\\t'.join(data_to_sign.split('\t')))
         return data_to_sign
 
@@ -305,7 +682,7 @@ class EdgeGridAuthHeaders:
             self.make_signing_key(timestamp)
         )
 
-    def make_auth_header(self, request, timestamp, nonce):
+    def make_unsigned_auth_header(self, timestamp, nonce):
         kvps = [
             ('client_token', self.client_token),
             ('access_token', self.access_token),
@@ -315,9 +692,195 @@ class EdgeGridAuthHeaders:
         auth_header = "EG1-HMAC-SHA256 " + \
             ';'.join([f"{k}={v}" for k, v in kvps]) + ';'
         logger.debug('unsigned authorization header: %s', auth_header)
+        return auth_header
+
+    def make_auth_header(self, request, timestamp, nonce):
+        auth_header = self.make_unsigned_auth_header(timestamp, nonce)
 
         signed_auth_header = auth_header + \
             'signature=' + self.sign_request(request, timestamp, auth_header)
 
         logger.debug('signed authorization header: %s', signed_auth_header)
         return signed_auth_header
+
+
+class OptimizedAuthHeaders(EdgeGridAuthHeaders):
+    """
+        The default signing engine. It produces the same authorization headers as the
+        reference EdgeGridAuthHeaders implementation, but reuses the signing key within the
+        same timestamp, hashes bytes bodies without copying them, hashes file bodies from
+        a memory map instead of reading them and skips formatting and body length lookups
+        needed only for debug logging.
+    """
+    def __init__(self, client_token, client_secret, access_token,
+                 *, headers_to_sign=(), max_body=131072):
+        super().__init__(client_token, client_secret, access_token,
+                         headers_to_sign=headers_to_sign, max_body=max_body)
+        self._signing_key = (None, None)
+
+    def make_signing_key(self, timestamp):
+        cached_timestamp, signing_key = self._signing_key
+        if cached_timestamp != timestamp:
+            signing_key = base64_hmac_sha256(timestamp, self.client_secret)
+            self._signing_key = (timestamp, signing_key)
+        return signing_key
+
+    def canonicalize_headers(self, headers):
+        if not self.headers_to_sign:
+            return ''
+        return '\t'.join([
+            f"{h}:{WHITESPACE_RE.sub(' ', headers[h].strip())}"
+            for h in self.headers_to_sign if h in headers
+        ])
+
+    def make_content_hash(self, body, method):
+        if method != 'POST':
+            return ''
+        if logger.isEnabledFor(logging.DEBUG):
+            return super().make_content_hash(body, method)
+        if not isinstance(body, (bytes, str)):
+            content_hash = file_prefix_hash(body, self.max_body)
+            if content_hash is None:
+                return super().make_content_hash(body, method)
+            return content_hash
+        if isinstance(body, str):
+            body = body[:self.max_body].encode('utf8')
+        if not body:
+            return ''
+        return base64.b64encode(
+            hashlib.sha256(memoryview(body)[:self.max_body]).digest()).decode('utf8')
+
+    def make_data_to_sign(self, request, auth_header):
+        data_to_sign = self.make_request_data(request) + '\t' + auth_header
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('data to sign: %s', '\\t'.join(data_to_sign.split('\t')))
+        return data_to_sign
+
+    def make_unsigned_auth_header(self, timestamp, nonce):
+        return (f'EG1-HMAC-SHA256 client_token={self.client_token};'
+                f'access_token={self.access_token};timestamp={timestamp};nonce={nonce};')
+
+
+class DifferentialAuthHeaders:
+    """
+        A signing engine for verifying an optimized engine against the reference one. Every
+        signature is computed by both engines, a mismatch is logged as an error and passed to
+        the on_mismatch callback, and the reference result is used for the request.
+
+        Usage::
+            >>> auth = EdgeGridAuth.from_edgerc('~/.edgerc', engine=functools.partial(
+            ...     DifferentialAuthHeaders, on_mismatch=report))
+    """
+    def __init__(self, client_token, client_secret, access_token,
+                 *, headers_to_sign=(), max_body=131072,
+                 reference=EdgeGridAuthHeaders, candidate=OptimizedAuthHeaders, on_mismatch=None):
+        """
+        :param reference: engine class trusted to sign correctly (default EdgeGridAuthHeaders)
+        :param candidate: engine class checked against reference (default OptimizedAuthHeaders)
+        :param on_mismatch: optional callable called with the name of the differing method,
+            the request, the reference result and the candidate result
+        """
+        kwargs = {'headers_to_sign': headers_to_sign, 'max_body': max_body}
+        self.reference = reference(client_token, client_secret, access_token, **kwargs)
+        self.candidate = candidate(client_token, client_secret, access_token, **kwargs)
+        self.on_mismatch = on_mismatch
+        self.mismatches = 0
+
+    def __getattr__(self, name):
+        # attributes and methods not compared, e.g. max_body or make_unsigned_auth_header
+        return getattr(self.reference, name)
+
+    def compare(self, method, request, expected, actual):
+        """Reports a mismatch between the reference and candidate results of method"""
+        if expected == actual:
+            return
+        self.mismatches += 1
+        logger.error("signing engine mismatch in %s for %s %s: reference %r, candidate %r",
+                     method, getattr(request, 'method', None), getattr(request, 'url', None),
+                     expected, actual)
+        if self.on_mismatch is not None:
+            self.on_mismatch(method, request, expected, actual)
+
+    def make_signing_key(self, timestamp):
+        expected = self.reference.make_signing_key(timestamp)
+        self.compare('make_signing_key', None, expected,
+                     self.candidate.make_signing_key(timestamp))
+        return expected
+
+    def differential(self, method, request, *args):
+        # the candidate signs a copy, as get_header_versions() updates the request headers
+        actual = getattr(self.candidate, method)(request.copy(), *args)
+        expected = getattr(self.reference, method)(request, *args)
+        self.compare(method, request, expected, actual)
+        return expected
+
+    def make_request_data(self, request):
+        return self.differential('make_request_data', request)
+
+    def make_data_to_sign(self, request, auth_header):
+        return self.differential('make_data_to_sign', request, auth_header)
+
+    def make_auth_header(self, request, timestamp, nonce):
+        return self.differential('make_auth_header', request, timestamp, nonce)
+
+
+SIGNING_ENGINES = {
+    'optimized': OptimizedAuthHeaders,
+    'reference': EdgeGridAuthHeaders,
+    'differential': DifferentialAuthHeaders,
+}
+
+
+class RequestTemplate:
+    """A prepared request which is sent repeatedly, e.g. by a poller, with its EdgeGrid
+    signing data precomputed.
+
+    The method, scheme, netloc, path with query, canonical headers and content hash are
+    computed once on creation. Each call to prepare() only fills in a fresh timestamp and
+    nonce and computes the final HMAC.
+
+    Usage::
+        >>> template = auth.compile(requests.Request('GET', url).prepare())
+        >>> session.send(template.prepare())
+
+    """
+
+    def __init__(self, auth, request):
+        """
+        :param auth: EdgeGridAuth instance used to sign the request
+        :param request: requests.PreparedRequest with a str or bytes body (or no body)
+        """
+        if request.body is not None and not isinstance(request.body, (bytes, str)):
+            raise TypeError(
+                f'akamai.edgegrid: cannot template body type: {type(request.body).__name__}')
+        self.auth = auth
+        self.request = request.copy()
+        self.request.hooks = {event: list(hooks) for event, hooks in request.hooks.items()}
+        self.request.headers.pop('Authorization', None)
+        self.request_data = auth.engine_for(
+            self.request.url, self.request.headers).make_request_data(self.request)
+        self._signing_key = (None, None)
+
+    def make_signing_key(self, timestamp):
+        """Returns the signing key for timestamp, reusing the previous one within the
+        same second"""
+        cached_timestamp, signing_key = self._signing_key
+        if cached_timestamp != timestamp:
+            signing_key = self.auth.ah.make_signing_key(timestamp)
+            self._signing_key = (timestamp, signing_key)
+        return signing_key
+
+    def make_auth_header(self, timestamp, nonce):
+        auth_header = self.auth.ah.make_unsigned_auth_header(timestamp, nonce)
+        return auth_header + 'signature=' + base64_hmac_sha256(
+            self.request_data + '\t' + auth_header, self.make_signing_key(timestamp))
+
+    def prepare(self):
+        """Returns a copy of the template request signed with a fresh timestamp and nonce"""
+        r = self.request.copy()
+        r.headers['Authorization'] = self.make_auth_header(self.auth.timestamp(), new_nonce())
+        # PreparedRequest.copy() shares the hooks dict with the template
+        r.hooks = {event: list(hooks) for event, hooks in self.request.hooks.items()}
+        if self.auth.handle_redirect not in r.hooks['response']:
+            r.register_hook('response', self.auth.handle_redirect)
+        return r
@@ -0,0 +1,167 @@
+# pylint: disable=too-many-arguments,too-many-instance-attributes
+"""Hedging of slow idempotent requests with independently signed copies"""
+
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
+from .deadline import current_deadline
+from .metrics import default_endpoint
+
+logger = logging.getLogger(__name__)
+
+__all__ = ['Hedging']
+
+# set in the threads sending hedged attempts, whose redirects are not hedged again
+_in_attempt = contextvars.ContextVar('akamai.edgegrid.hedging', default=False)
+
+
+def close_response(future):
+    """Done callback releasing the connection of the response which lost the race"""
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+class Hedging:
+    """Sends a second, independently signed copy of an idempotent request which has not
+    been answered within a high percentile of the recent latencies of its host and
+    endpoint, and returns whichever response arrives first. The extra load is bounded by
+    budget, the ratio of requests which may be hedged.
+
+    Usage::
+        >>> session = EdgeGridSession.from_edgerc(
+        ...     '~/.edgerc', hedging=Hedging(percentile=0.95, budget=0.05))
+
+    """
+
+    def __init__(self, *, percentile=0.95, initial_delay=1.0, min_delay=0.01, window=200,
+                 min_samples=20, budget=0.1, methods=('GET',), workers=64,
+                 clock=time.monotonic):
+        """
+        :param percentile: percentile of the recent latencies after which a request is
+            hedged (default 0.95)
+        :param initial_delay: seconds after which a request is hedged until min_samples
+            latencies of its endpoint were observed (default 1.0)
+        :param min_delay: lower bound of the hedging delay in seconds (default 0.01)
+        :param window: number of recent latencies kept per host and endpoint (default 200)
+        :param min_samples: number of latencies needed to use the percentile (default 20)
+        :param budget: maximum ratio of hedged requests to requests (default 0.1)
+        :param methods: idempotent HTTP methods which are hedged (default ('GET',))
+        :param workers: maximum number of requests in flight at a time (default 64)
+        :param clock: monotonic clock in seconds (default time.monotonic)
+        """
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.window = window
+        self.min_samples = min_samples
+        self.budget = budget
+        self.methods = tuple(methods)
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix='edgegrid-hedging')
+
+    def applies(self, request):
+        """Tells whether a prepared request may be hedged: an idempotent method without a
+        body, not sent by a hedged attempt itself"""
+        return request.method in self.methods and not request.body and not _in_attempt.get()
+
+    @staticmethod
+    def key(url):
+        """Returns the host and endpoint whose latencies a URL is compared with"""
+        parsed = urlparse(url)
+        return parsed.netloc, default_endpoint(parsed.path)
+
+    def observe(self, url, latency):
+        """Records the latency in seconds of a request to a URL"""
+        key = self.key(url)
+        with self.lock:
+            samples = self.latencies.get(key)
+            if samples is None:
+                samples = self.latencies[key] = deque(maxlen=self.window)
+            samples.append(latency)
+
+    def delay(self, url):
+        """Returns the seconds after which a request to a URL is hedged"""
+        with self.lock:
+            samples = sorted(self.latencies.get(self.key(url), ()))
+        if len(samples) < self.min_samples:
+            return self.initial_delay
+        return max(samples[min(int(self.percentile * len(samples)), len(samples) - 1)],
+                   self.min_delay)
+
+    def _admit(self):
+        with self.lock:
+            if self.hedged < self.budget * self.requests:
+                self.hedged += 1
+                return True
+            return False
+
+    def _submit(self, send, request, kwargs):
+        """Sends a request from the pool. Returns its future and an event set once a
+        worker started sending it."""
+        started = threading.Event()
+
+        def attempt():
+            started.set()
+            start = self.clock()
+            _in_attempt.set(True)
+            res = send(request, **kwargs)
+            self.observe(request.url, self.clock() - start)
+            return res
+
+        # each attempt runs in its own copy of the context, e.g. with the caller's deadline
+        return self._executor.submit(contextvars.copy_context().run, attempt), started
+
+    def send(self, send, request, copy_request, **kwargs):
+        """
+        Sends a request, hedged if it is not answered in time.
+
+        :param send: function sending a prepared request with the send() kwargs
+        :param request: prepared request
+        :param copy_request: function returning an independently signed copy of request
+        :param kwargs: passed to send, e.g. timeout or stream
+        :returns: the first response received
+        :raises: the exception of the request if no attempt succeeded
+        """
+        with self.lock:
+            self.requests += 1
+        delay = self.delay(request.url)
+        primary, started = self._submit(send, request, kwargs)
+        deadline = current_deadline()
+        # the hedging delay runs from when the request is sent, not while it waits for a
+        # worker, as a hedged copy would wait in the same queue
+        started.wait(None if deadline is None else max(deadline.remaining(), 0))
+        if deadline is not None and deadline.remaining() <= delay:
+            # no time left for a hedged request to win
+            return primary.result()
+        if wait([primary], timeout=delay).done or not self._admit():
+            return primary.result()
+
+        logger.debug("no response to %s %s after %.3fs, sending a hedged request",
+                     request.method, request.url, delay)
+        hedge, _ = self._submit(send, copy_request(request), kwargs)
+        pending = {primary, hedge}
+        winner = None
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next((f for f in done if f.exception() is None), None)
+        if winner is None:
+            return primary.result()
+
+        for future in (primary, hedge):
+            if future is not winner:
+                future.add_done_callback(close_response)
+        if winner is hedge:
+            with self.lock:
+                self.hedge_wins += 1
+        return winner.result()
@@ -0,0 +1,207 @@
+# pylint: disable=missing-function-docstring,too-many-instance-attributes
+"""HTTP/2 transport adapter for EdgeGrid sessions. Requires the httpx[http2] package."""
+
+import asyncio
+import logging
+import os
+import ssl
+import threading
+
+from requests.adapters import BaseAdapter
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from requests.exceptions import ConnectTimeout, ReadTimeout, RequestException
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers, select_proxy
+
+from .edgegrid import iter_body_chunks
+
+logger = logging.getLogger(__name__)
+
+__all__ = ['HTTP2Adapter']
+
+# connection specific headers which must not be sent over HTTP/2
+HOP_BY_HOP_HEADERS = frozenset(['connection', 'keep-alive', 'transfer-encoding', 'upgrade'])
+
+
+class RawResponse:
+    """Exposes the decoded content of an httpx response through the subset of the
+    urllib3.HTTPResponse interface used by requests.Response"""
+
+    def __init__(self, response, run):
+        self.response = response
+        self.run = run
+
+    def stream(self, amt=None, decode_content=True):  # pylint: disable=unused-argument
+        chunks = self.response.aiter_bytes(amt)
+        try:
+            while True:
+                try:
+                    yield self.run(anext(chunks))
+                except StopAsyncIteration:
+                    return
+        finally:
+            self.close()
+
+    def read(self, amt=None):  # pylint: disable=unused-argument
+        return self.run(self.response.aread())
+
+    def close(self):
+        self.run(self.response.aclose())
+
+
+def make_ssl_context(verify, cert):
+    """Returns the httpx verify setting of requests' verify and cert settings: verify
+    itself, or an SSLContext loading the CA bundle or directory and client certificate"""
+    if cert is None and isinstance(verify, bool):
+        return verify
+    if verify is False:
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    elif isinstance(verify, str) and os.path.isdir(verify):
+        context = ssl.create_default_context(capath=verify)
+    elif isinstance(verify, str):
+        context = ssl.create_default_context(cafile=verify)
+    else:
+        context = ssl.create_default_context()
+    if isinstance(cert, (tuple, list)):
+        context.load_cert_chain(*cert)
+    elif cert is not None:
+        context.load_cert_chain(cert)
+    return context
+
+
+async def aiter_sync(chunks):
+    """Pulls the chunks of a blocking iterator in a worker thread"""
+    chunks = iter(chunks)
+    while True:
+        chunk = await asyncio.to_thread(next, chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+class HTTP2Adapter(BaseAdapter):
+    """A requests transport adapter sending requests over multiplexed HTTP/2 connections,
+    so that many concurrent requests to a host share a few connections.
+
+    Requests are still prepared and signed one by one by the session's EdgeGridAuth,
+    each becoming its own HTTP/2 stream. Streams of all calling threads are driven by
+    an httpx.AsyncClient running in the adapter's own event loop thread, one client per
+    combination of the verify, cert and proxy settings of the requests.
+
+    Usage::
+        >>> session = EdgeGridSession.from_edgerc('~/.edgerc', http2=True)
+
+    or, to mount it explicitly::
+        >>> session.mount('https://', HTTP2Adapter())
+
+    """
+
+    def __init__(self, *, http1=True, max_connections=10, verify=True, cert=None):
+        """
+        :param http1: allow falling back to HTTP/1.1 for servers not negotiating HTTP/2.
+            Set to False to use HTTP/2 with prior knowledge, e.g. for cleartext http:// URLs
+        :param max_connections: maximum number of connections (default 10)
+        :param verify: TLS verification setting used when a request has requests'
+            default verify=True, see requests' verify
+        :param cert: client certificate used when a request has none, see requests' cert
+        """
+        super().__init__()
+        try:
+            # pylint: disable=import-outside-toplevel
+            import httpx
+        except ImportError as exc:
+            raise ImportError('akamai.edgegrid: HTTP2Adapter requires the httpx[http2] '
+                              'package') from exc
+        self.httpx = httpx
+        self.http1 = http1
+        self.verify = verify
+        self.cert = cert
+        self.limits = httpx.Limits(max_connections=max_connections)
+        self.clients = {}
+        self._lock = threading.Lock()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True,
+                                       name='edgegrid-http2')
+        self.thread.start()
+        self.client_for(verify, cert, None)
+
+    async def create_client(self, **kwargs):
+        return self.httpx.AsyncClient(**kwargs)
+
+    def client_for(self, verify, cert, proxy):
+        """Returns the client for the given TLS settings and proxy URL, created on first
+        use, as httpx applies them to all connections of a client. Proxies come from the
+        session, which already merged those of the environment."""
+        key = (verify, tuple(cert) if isinstance(cert, list) else cert, proxy)
+        with self._lock:
+            client = self.clients.get(key)
+            if client is None:
+                client = self.clients[key] = self.run(self.create_client(
+                    http1=self.http1, http2=True, verify=make_ssl_context(verify, cert),
+                    proxy=proxy, limits=self.limits, trust_env=False))
+        return client
+
+    def run(self, coro):
+        """Runs a coroutine in the adapter's event loop and waits for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def make_timeout(self, timeout):
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            return self.httpx.Timeout(read, connect=connect)
+        return self.httpx.Timeout(timeout)
+
+    @staticmethod
+    def make_content(body):
+        if body is None or isinstance(body, (bytes, str)):
+            return body
+        return aiter_sync(iter_body_chunks(body))
+
+    def build_response(self, request, response):
+        res = Response()
+        res.status_code = response.status_code
+        res.headers = CaseInsensitiveDict(response.headers.multi_items())
+        res.encoding = get_encoding_from_headers(res.headers)
+        res.reason = response.reason_phrase
+        res.raw = RawResponse(response, self.run)
+        res.url = request.url
+        res.request = request
+        res.connection = self
+        return res
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None,
+             proxies=None):
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        client = self.client_for(self.verify if verify is True else verify,
+                                 self.cert if cert is None else cert,
+                                 select_proxy(request.url, proxies))
+        headers = [(k, v) for k, v in request.headers.items()
+                   if k.lower() not in HOP_BY_HOP_HEADERS]
+        outgoing = client.build_request(
+            request.method, request.url, headers=headers,
+            content=self.make_content(request.body), timeout=self.make_timeout(timeout))
+        try:
+            response = self.run(client.send(outgoing, stream=True))
+        except self.httpx.ConnectTimeout as exc:
+            raise ConnectTimeout(exc, request=request) from exc
+        except self.httpx.TimeoutException as exc:
+            raise ReadTimeout(exc, request=request) from exc
+        except (self.httpx.ConnectError, self.httpx.RemoteProtocolError) as exc:
+            raise RequestsConnectionError(exc, request=request) from exc
+        except self.httpx.HTTPError as exc:
+            raise RequestException(exc, request=request) from exc
+        logger.debug("%s %s: %s %d", response.http_version, request.method, request.url,
+                     response.status_code)
+        return self.build_response(request, response)
+
+    def close(self):
+        if self.loop.is_closed():
+            return
+        for client in self.clients.values():
+            self.run(client.aclose())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
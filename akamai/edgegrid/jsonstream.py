@@ -0,0 +1,198 @@
+"""Incremental parsing of large JSON responses"""
+
+import codecs
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+__all__ = ['iter_json_items']
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+STRUCTURE = re.compile(r'[\[\]{}"]')
+STRING_END = re.compile(r'["\\]')
+NUMBER_CHARS = frozenset('0123456789.eE+-')
+# decoding is stateless, so one decoder serves every reader
+DECODER = json.JSONDecoder()
+
+
+class JSONStreamReader:
+    """Reads JSON values from a stream of bytes chunks, keeping only the unparsed part of the
+    stream in memory"""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        # text of the value being scanned by decode_value, which starts at mark in buf
+        # and whose earlier part is kept in a list of chunks
+        self.mark = None
+        self.kept = []
+
+    def fill(self):
+        """Appends the next chunk to the buffer, dropping the parsed part, or keeping it
+        aside while decode_value scans a value. Returns False at the end of the stream."""
+        if self.eof:
+            return False
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            self.eof = True
+            text = self.decoder.decode(b'', final=True)
+        else:
+            text = self.decoder.decode(chunk)
+        if self.mark is not None:
+            self.kept.append(self.buf[self.mark:self.pos])
+            self.mark = 0
+        self.buf = self.buf[self.pos:] + text
+        self.pos = 0
+        return chunk is not None or bool(text)
+
+    def peek(self):
+        """Returns the next non-whitespace character without consuming it, '' at the end"""
+        while True:
+            self.pos = WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, char):
+        """Consumes the next non-whitespace character, which must be char"""
+        found = self.peek()
+        if found != char:
+            raise json.JSONDecodeError(f'Expecting {char!r}', self.buf, self.pos)
+        self.pos += 1
+
+    def decode_value(self):
+        """Decodes the next complete value. The end of a string, array or object is found
+        with the scanner of skip_value first, so that a value spanning many chunks is
+        decoded once rather than on every chunk."""
+        if self.peek() not in '[{"':
+            return self.decode_scalar()
+        self.mark = self.pos
+        try:
+            self.skip_value()
+            self.kept.append(self.buf[self.mark:self.pos])
+            text = ''.join(self.kept)
+        finally:
+            self.mark = None
+            self.kept = []
+        value, end = DECODER.raw_decode(text)
+        if end != len(text):
+            raise json.JSONDecodeError('Extra data', text, end)
+        return value
+
+    def decode_scalar(self):
+        """Decodes the next number or literal"""
+        self.peek()
+        while True:
+            try:
+                value, end = DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            # a number or literal at the end of the buffer may continue in the next chunk,
+            # e.g. '-0.' is decoded as -0 until the rest of '-0.15' arrives
+            if end < len(self.buf) and self.buf[end] not in NUMBER_CHARS or not self.fill():
+                self.pos = end
+                return value
+
+    def skip_string(self):
+        """Skips the string starting at the current position"""
+        self.pos += 1
+        while True:
+            match = STRING_END.search(self.buf, self.pos)
+            if match is None or match.end() == len(self.buf) and match.group() == '\\':
+                self.pos = len(self.buf) if match is None else match.start()
+                if not self.fill():
+                    raise json.JSONDecodeError('Unterminated string', self.buf, self.pos)
+                continue
+            if match.group() == '\\':
+                self.pos = match.end() + 1
+            else:
+                self.pos = match.end()
+                return
+
+    def skip_value(self):
+        """Skips the next value without building it, so that skipped arrays and objects
+        do not need to fit in memory"""
+        char = self.peek()
+        if char not in '[{':
+            if char == '"':
+                self.skip_string()
+            else:
+                self.decode_scalar()
+            return
+
+        depth = 0
+        while True:
+            match = STRUCTURE.search(self.buf, self.pos)
+            if match is None:
+                self.pos = len(self.buf)
+                if not self.fill():
+                    raise json.JSONDecodeError('Unexpected end of data', self.buf, self.pos)
+                continue
+            self.pos = match.start()
+            char = match.group()
+            if char == '"':
+                self.skip_string()
+                continue
+            self.pos += 1
+            depth += 1 if char in '[{' else -1
+            if depth == 0:
+                return
+
+    def find_key(self, key):
+        """Consumes the members of the current object up to the value of key.
+        Returns False if the object has no such key."""
+        self.expect('{')
+        if self.peek() == '}':
+            return False
+        while True:
+            if self.peek() != '"':
+                raise json.JSONDecodeError('Expecting property name', self.buf, self.pos)
+            name = self.decode_value()
+            self.expect(':')
+            if name == key:
+                return True
+            self.skip_value()
+            if self.peek() == '}':
+                return False
+            self.expect(',')
+
+    def iter_array(self):
+        """Yields the items of the array starting at the current position"""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.decode_value()
+            if self.peek() == ']':
+                self.pos += 1
+                return
+            self.expect(',')
+
+
+def iter_json_items(chunks, path=()):
+    """
+    Parses a JSON document incrementally and yields the items of the array found at path,
+    so that only one item and one chunk of the document are in memory at a time.
+
+    :param chunks: iterable of bytes chunks, e.g. response.iter_content(65536)
+    :param path: sequence of object keys leading to the array, e.g. ('items',)
+        (default is the top-level array)
+    :raises ValueError: if the document has no array at path (json.JSONDecodeError if it
+        is not valid JSON)
+    """
+    reader = JSONStreamReader(chunks)
+    for key in path:
+        if reader.peek() != '{' or not reader.find_key(key):
+            raise ValueError(f'akamai.edgegrid: no array at path {list(path)}')
+    if reader.peek() != '[':
+        raise ValueError(f'akamai.edgegrid: no array at path {list(path)}')
+    yield from reader.iter_array()
@@ -0,0 +1,288 @@
+# pylint: disable=too-many-arguments,missing-function-docstring
+"""In-process metrics of EdgeGrid traffic, exposed in the Prometheus text format"""
+
+import logging
+import re
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from urllib.parse import urlparse
+
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+__all__ = ['EdgeGridMetrics', 'MetricsRegistry']
+
+DURATION_BUCKETS = (.005, .01, .025, .05, .075, .1, .25, .5, .75, 1.0, 2.5, 5.0, 7.5, 10.0)
+SIGNING_BUCKETS = (.00001, .000025, .00005, .0001, .00025, .0005, .001, .0025, .005, .01)
+REJECTION_STATUSES = (401, 429)
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+# path segments with digits are identifiers, except API versions like v1
+ID_SEGMENT_RE = re.compile(r'(?!v\d+$).*\d')
+
+
+def default_endpoint(path):
+    """Returns the endpoint label of a request path: the path without query, with the
+    segments containing identifiers replaced by {id} to bound the number of endpoints"""
+    path = path.split('?', 1)[0]
+    return '/'.join('{id}' if ID_SEGMENT_RE.match(s) else s for s in path.split('/'))
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(labelnames, values, extra=''):
+    labels = [f'{name}="{escape_label(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        labels.append(extra)
+    return '{' + ','.join(labels) + '}' if labels else ''
+
+
+class Metric:
+    """A metric family: a counter, gauge or histogram with a value per label set"""
+
+    def __init__(self, name, kind, documentation, labelnames, *, buckets=()):
+        self.name = name
+        self.kind = kind
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.values = {}
+
+    def inc(self, labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def set(self, labels, value):
+        self.values[labels] = value
+
+    def clear(self):
+        self.values.clear()
+
+    def observe(self, labels, value):
+        counts = self.values.get(labels)
+        if counts is None:
+            # one count per bucket plus +Inf, and the sum of observed values
+            counts = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for labels, value in sorted(self.values.items()):
+            if self.kind != 'histogram':
+                lines.append(
+                    f'{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), value):
+                cumulative += count
+                le = f'le="{format_value(bound)}"'
+                lines.append(f'{self.name}_bucket'
+                             f'{format_labels(self.labelnames, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{format_labels(self.labelnames, labels)} '
+                         f'{format_value(value[-1])}')
+            lines.append(f'{self.name}_count{format_labels(self.labelnames, labels)} '
+                         f'{cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    """A thread-safe registry of metric families. Collectors registered with add_collector()
+    are called before rendering, e.g. to update gauges."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._collectors = []
+
+    def register(self, name, kind, documentation, labelnames=(), *, buckets=()):
+        """Adds a metric family, or returns the existing one with the same name"""
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Metric(name, kind, documentation, labelnames,
+                                             buckets=buckets)
+            return self._metrics[name]
+
+    def add_collector(self, collector):
+        """Registers a callable called with the registry before rendering"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def inc(self, name, labels, amount=1):
+        with self._lock:
+            self._metrics[name].inc(labels, amount)
+
+    def set(self, name, labels, value):
+        with self._lock:
+            self._metrics[name].set(labels, value)
+
+    def observe(self, name, labels, value):
+        with self._lock:
+            self._metrics[name].observe(labels, value)
+
+    def clear(self, name):
+        """Removes all values of a metric, e.g. of a gauge before collecting it again"""
+        with self._lock:
+            self._metrics[name].clear()
+
+    def get(self, name, labels):
+        """Returns the current value of a counter or gauge, or the list of bucket counts
+        followed by the sum of a histogram"""
+        with self._lock:
+            value = self._metrics[name].values.get(labels)
+            return list(value) if isinstance(value, list) else value
+
+    def render(self):
+        """Returns all metrics in the Prometheus text exposition format"""
+        for collector in list(self._collectors):
+            collector(self)
+        with self._lock:
+            lines = [line for metric in self._metrics.values() for line in metric.render()]
+        return '\n'.join(lines) + '\n'
+
+
+class EdgeGridMetrics:
+    """Records request counts, latencies, status classes, 401 and 429 rejections, bytes
+    sent and received, signing time and connection pool saturation of EdgeGrid sessions.
+
+    Usage::
+        >>> metrics = EdgeGridMetrics()
+        >>> session = EdgeGridSession.from_edgerc('~/.edgerc', metrics=metrics)
+        >>> text = metrics.render()  # serve this to the Prometheus scraper
+
+    """
+
+    def __init__(self, registry=None, *, endpoint=default_endpoint, prefix='edgegrid'):
+        """
+        :param registry: MetricsRegistry to record into (default is a new one)
+        :param endpoint: callable returning the endpoint label of a request path
+            (default replaces identifier segments with {id})
+        :param prefix: prefix of the metric names (default 'edgegrid')
+        """
+        self.registry = registry if registry is not None else MetricsRegistry()
+        self.endpoint = endpoint
+        self.sessions = weakref.WeakSet()
+        request_labels = ('host', 'endpoint', 'method')
+        self.names = {
+            'requests': self.register(
+                prefix + '_requests_total', 'counter', 'Responses received by status class',
+                request_labels + ('status_class',)),
+            'rejections': self.register(
+                prefix + '_rejections_total', 'counter',
+                'Requests rejected with 401 Unauthorized or 429 Too Many Requests',
+                request_labels + ('status',)),
+            'errors': self.register(
+                prefix + '_request_errors_total', 'counter',
+                'Requests which failed without a response', request_labels + ('error',)),
+            'duration': self.register(
+                prefix + '_request_duration_seconds', 'histogram',
+                'Time until the response was received', request_labels, buckets=DURATION_BUCKETS),
+            'sent': self.register(
+                prefix + '_request_bytes_total', 'counter',
+                'Request body bytes sent (with a known length)', ('host',)),
+            'received': self.register(
+                prefix + '_response_bytes_total', 'counter',
+                'Response body bytes received', ('host',)),
+            'signing': self.register(
+                prefix + '_signing_duration_seconds', 'histogram',
+                'Time spent signing requests', ('host',), buckets=SIGNING_BUCKETS),
+            'in_use': self.register(
+                prefix + '_pool_connections_in_use', 'gauge',
+                'Pooled connections currently checked out', ('host',)),
+            'saturation': self.register(
+                prefix + '_pool_saturation', 'gauge',
+                'Ratio of pooled connections checked out to the pool size', ('host',)),
+        }
+        self.registry.add_collector(self.collect_pools)
+
+    def register(self, name, kind, documentation, labelnames, *, buckets=()):
+        return self.registry.register(name, kind, documentation, labelnames,
+                                      buckets=buckets).name
+
+    def track(self, session):
+        """Includes the connection pools of session in the pool gauges"""
+        self.sessions.add(session)
+
+    def request_labels(self, request):
+        parsed = urlparse(request.url)
+        return parsed.netloc, self.endpoint(parsed.path), request.method
+
+    def record_signing(self, request, elapsed):
+        """Records the time spent signing a request"""
+        self.registry.observe(self.names['signing'], (urlparse(request.url).netloc,), elapsed)
+
+    def record_response(self, res, *_, **kwargs):
+        """Response hook recording a response. Reads the body unless the request is
+        streamed, so that its download counts towards the latency. Responses replaced by
+        a retry, e.g. a 401 rejecting the timestamp, are recorded from its history."""
+        for previous in res.history:
+            # redirects are recorded by the send() call which received them
+            if not previous.is_redirect:
+                self.record(previous, len(previous.content), previous.elapsed.total_seconds())
+
+        start = time.perf_counter()
+        if kwargs.get('stream'):
+            received = int(res.headers.get('Content-Length', 0))
+        else:
+            received = len(res.content)
+        self.record(res, received, res.elapsed.total_seconds() + time.perf_counter() - start)
+
+    def record(self, res, received, elapsed):
+        """Records a response of received body bytes which took elapsed seconds"""
+        labels = self.request_labels(res.request)
+        host = labels[:1]
+        registry = self.registry
+        registry.inc(self.names['requests'], labels + (f'{res.status_code // 100}xx',))
+        if res.status_code in REJECTION_STATUSES:
+            registry.inc(self.names['rejections'], labels + (str(res.status_code),))
+        registry.observe(self.names['duration'], labels, elapsed)
+        registry.inc(self.names['sent'], host,
+                     int(res.request.headers.get('Content-Length', 0)))
+        registry.inc(self.names['received'], host, received)
+
+    def record_error(self, request, exc):
+        """Records a request which failed without a response"""
+        self.registry.inc(self.names['errors'],
+                          self.request_labels(request) + (type(exc).__name__,))
+
+    def pool_usage(self):
+        """Returns the connections in use and the pool sizes per host, summed over the
+        connection pools of the tracked sessions"""
+        usage = {}
+        for session in list(self.sessions):
+            for adapter in list(session.adapters.values()):
+                if not isinstance(adapter, HTTPAdapter):
+                    continue
+                pools = adapter.poolmanager.pools
+                for key in pools.keys():
+                    pool = pools.get(key)
+                    if pool is None or pool.pool is None:
+                        continue
+                    host = pool.host if pool.port in (None, DEFAULT_PORTS.get(pool.scheme)) \
+                        else f'{pool.host}:{pool.port}'
+                    in_use, size = usage.get(host, (0, 0))
+                    usage[host] = (in_use + pool.pool.maxsize - pool.pool.qsize(),
+                                   size + pool.pool.maxsize)
+        return usage
+
+    def collect_pools(self, registry):
+        """Updates the pool gauges from the connection pools of the tracked sessions"""
+        usage = self.pool_usage()
+        registry.clear(self.names['in_use'])
+        registry.clear(self.names['saturation'])
+        for host, (in_use, size) in usage.items():
+            registry.set(self.names['in_use'], (host,), in_use)
+            registry.set(self.names['saturation'], (host,), in_use / size)
+
+    def render(self):
+        """Returns the metrics in the Prometheus text exposition format"""
+        return self.registry.render()
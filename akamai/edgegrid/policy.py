@@ -0,0 +1,136 @@
+"""Per-endpoint signing policies: the headers to sign and body bytes to hash of each API"""
+
+import logging
+from collections import namedtuple
+from os.path import expanduser
+
+logger = logging.getLogger(__name__)
+
+__all__ = ['SigningPolicy', 'SigningPolicyTable']
+
+ANY_HOST = '*'
+
+SigningPolicy = namedtuple('SigningPolicy', ['host', 'path', 'headers_to_sign', 'max_body'])
+SigningPolicy.__doc__ = """The signing parameters of the requests to a host (or '*' for any
+host) whose path starts with a prefix, on segment boundaries. A headers_to_sign or max_body
+of None keeps the value of the EdgeGridAuth."""
+
+
+def parse_policy(line):
+    """
+    Parses a policy line: a path prefix, optionally preceded by a host, followed by
+    headers_to_sign=<comma separated names> and/or max_body=<bytes>, e.g.
+    'akab-xxx.luna.akamaiapis.net/ccu/v3 max_body=50000'.
+
+    :raises ValueError: if the line is not a valid policy
+    """
+    target, *settings = line.split()
+    host, slash, path = target.partition('/')
+    if not slash:
+        raise ValueError(f'akamai.edgegrid: policy without path prefix: {line}')
+    options = {}
+    for setting in settings:
+        name, equals, value = setting.partition('=')
+        name = name.replace('-', '_')
+        if not equals or name not in ('headers_to_sign', 'max_body') or name in options:
+            raise ValueError(f'akamai.edgegrid: invalid policy setting {setting!r} in: {line}')
+        if name == 'max_body':
+            options[name] = int(value)
+        else:
+            options[name] = [h for h in value.split(',') if h]
+    return SigningPolicy(host.lower() or ANY_HOST, '/' + path,
+                         options.get('headers_to_sign'), options.get('max_body'))
+
+
+def normalize_policy(policy):
+    """Returns a policy with lowercase headers, as a hashable tuple, and a path prefix
+    without trailing slash, as looked up in the index"""
+    headers = policy.headers_to_sign
+    return policy._replace(
+        host=(policy.host or ANY_HOST).lower(),
+        path=policy.path.rstrip('/'),
+        headers_to_sign=None if headers is None else tuple(h.strip().lower() for h in headers))
+
+
+class SigningPolicyTable:
+    """Resolves the signing policy of a request from its host and path. Policies are
+    compiled into an index of path prefixes per host, so that resolving a path costs a
+    dict lookup per path segment whatever the number of policies. The longest matching
+    prefix wins, and a policy for the host of the request wins over one for any host.
+
+    Usage::
+        >>> policies = SigningPolicyTable.parse('''
+        ...     /ccu/v3 max_body=50000
+        ...     /papi/v1 headers_to_sign=X-Request-Id
+        ... ''')
+        >>> auth = EdgeGridAuth.from_edgerc('~/.edgerc', policies=policies)
+
+    """
+
+    def __init__(self, policies=()):
+        """
+        :param policies: iterable of SigningPolicy
+        """
+        self.policies = [normalize_policy(policy) for policy in policies]
+        self._index = {}
+        for policy in self.policies:
+            self._index.setdefault(policy.host, {})[policy.path] = policy
+
+    def __len__(self):
+        return len(self.policies)
+
+    @classmethod
+    def parse(cls, text):
+        """
+        Returns the table of the policies in text, one per line (see parse_policy).
+        Blank lines and lines starting with # are ignored.
+        """
+        return cls(parse_policy(line) for line in (raw.strip() for raw in text.splitlines())
+                   if line and not line.startswith('#'))
+
+    @classmethod
+    def from_file(cls, filename):
+        """Returns the table of the policies in a file, one per line"""
+        logger.debug("loading signing policies from %s", filename)
+        with open(expanduser(filename), encoding='utf-8') as f:
+            return cls.parse(f.read())
+
+    @classmethod
+    def from_edgerc(cls, edgerc, section='default'):
+        """
+        Returns the table of the policies of an edgerc section, from its signing_policies
+        option (one policy per line, continuation lines indented) and the file named by
+        its signing_policies_file option, or None if it has neither.
+
+        :param edgerc: EdgeRc instance
+        :param section: the section to use (default is 'default')
+        """
+        text = edgerc.get(section, 'signing_policies', fallback='')
+        filename = edgerc.get(section, 'signing_policies_file', fallback='')
+        if not text and not filename:
+            return None
+        table = cls.parse(text)
+        if filename:
+            table = cls(table.policies + cls.from_file(filename).policies)
+        return table
+
+    def resolve(self, host, path):
+        """
+        Returns the policy of the longest path prefix of path for host, or for any host,
+        or None if no policy applies.
+
+        :param host: host of the request, as in the Host header
+        :param path: path of the request, without query
+        """
+        for index in (self._index.get(host.lower()), self._index.get(ANY_HOST)):
+            if not index:
+                continue
+            prefix = path.rstrip('/')
+            while True:
+                policy = index.get(prefix)
+                if policy is not None:
+                    return policy
+                if not prefix:
+                    break
+                prefix = prefix[:max(prefix.rfind('/'), 0)]
+        return None
@@ -0,0 +1,412 @@
+# pylint: disable=too-many-arguments,too-many-instance-attributes
+"""A requests Session preconfigured for Akamai {OPEN} EdgeGrid APIs"""
+
+import copy
+import logging
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from urllib.parse import urljoin, urlparse
+
+import requests
+from requests.auth import AuthBase
+
+from .batching import BatchingClient
+from .breaker import CircuitBreaker, CircuitOpenError
+from .compression import RequestCompressor
+from .deadline import Deadline, DeadlineExceeded, current_deadline
+from .download import RangedDownload
+from .edgegrid import EdgeGridAuth
+from .edgerc import EdgeRc
+from .hedging import Hedging
+from .http2 import HTTP2Adapter
+from .jsonstream import iter_json_items
+from .metrics import EdgeGridMetrics
+from .singleflight import SingleFlight, coalescing_key, is_coalescable, share_response
+from .tracing import sending, trace_connections
+from .upload import FileUploadAdapter
+from .warmup import edgerc_base_url, edgerc_base_urls, warm
+
+logger = logging.getLogger(__name__)
+
+__all__ = ['EdgeGridSession']
+
+
+class StagedAuth(AuthBase):  # pylint: disable=too-few-public-methods
+    """Runs the session's request stages on a prepared request before signing it
+    with the wrapped auth handler, recording the signing time if metrics are set and
+    tracing it with the session's tracer if the handler has no tracer of its own"""
+
+    def __init__(self, stages, auth, metrics=None, tracer=None):
+        self.stages = stages
+        self.auth = auth
+        self.metrics = metrics
+        self.tracer = tracer
+
+    def __call__(self, r):
+        for stage in self.stages:
+            r = stage(r)
+        if self.auth is not None:
+            start = time.perf_counter()
+            if self.tracer is not None and getattr(self.auth, 'tracer', False) is None:
+                r = self.auth.sign_traced(r, self.tracer)
+            else:
+                r = self.auth(r)
+            if self.metrics is not None:
+                self.metrics.record_signing(r, time.perf_counter() - start)
+        return r
+
+
+class EdgeGridSession(requests.Session):
+    """A requests Session signing all requests with EdgeGridAuth.
+
+    Basic Usage::
+        >>> from akamai.edgegrid import EdgeGridSession
+        >>> s = EdgeGridSession.from_edgerc('~/.edgerc', 'default')
+        >>> s.get('/identity-management/v3/user-profile')
+
+    """
+
+    def __init__(self, auth=None, *, base_url=None, section=None, edgerc=None,
+                 compression=None, tracer=None, http2=False, coalesce=False, metrics=None,
+                 breaker=None, hedging=None, file_uploads=False):
+        """
+        :param auth: EdgeGridAuth instance used to sign requests
+        :param base_url: URL that relative request URLs are resolved against
+        :param section: name of the edgerc section the credentials come from
+        :param edgerc: EdgeRc the credentials come from, its hosts are warmed by warm()
+        :param compression: opt-in request body compression, either 'gzip', 'deflate'
+            or a RequestCompressor instance (default None)
+        :param tracer: optional tracer (see akamai.edgegrid.tracing) receiving spans for
+            request preparation, signing by an auth handler without its own tracer,
+            and transport, including connection timings (default None)
+        :param http2: send https requests over multiplexed HTTP/2 connections, either True
+            or an HTTP2Adapter instance; requires the httpx[http2] package (default False)
+        :param coalesce: send identical concurrent GET and HEAD requests only once and
+            share the response with all callers (default False)
+        :param metrics: record request metrics, either True or an EdgeGridMetrics instance
+            shared by several sessions (default None)
+        :param breaker: fail fast with CircuitOpenError on hosts and endpoints with high
+            error rates or latency, either True or a CircuitBreaker instance (default None)
+        :param hedging: send an independently signed copy of GET requests not answered
+            within a percentile of recent latencies and use the first response, either
+            True or a Hedging instance (default None)
+        :param file_uploads: send request bodies which are binary regular files with
+            os.sendfile() over cleartext connections, or else with large buffered reads,
+            either True or a FileUploadAdapter instance (default False)
+        """
+        super().__init__()
+        self.auth = auth
+        self.base_url = base_url
+        self.section = section
+        self.edgerc = edgerc
+        if isinstance(compression, str):
+            compression = RequestCompressor(compression)
+        self.compression = compression
+        self.tracer = tracer
+        if file_uploads:
+            adapter = FileUploadAdapter() if file_uploads is True else file_uploads
+            self.mount('http://', adapter)
+            self.mount('https://', adapter)
+        if http2:
+            self.mount('https://', HTTP2Adapter() if http2 is True else http2)
+        self.single_flight = SingleFlight() if coalesce else None
+        if metrics is True:
+            metrics = EdgeGridMetrics()
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.track(self)
+        self.breaker = CircuitBreaker() if breaker is True else breaker
+        self.hedging = Hedging() if hedging is True else hedging
+
+    @classmethod
+    def from_edgerc(cls, rcinput, section='default', **kwargs):
+        """
+        Returns an EdgeGridSession signing requests with the credentials from the given
+        section of the given edgerc file and resolving relative URLs against its host.
+
+        :param rcinput: EdgeRc instance or path to the edgerc file
+        :param section: the section to use (default is 'default')
+        :param kwargs: passed to the EdgeGridSession constructor
+        """
+        edgerc = rcinput if isinstance(rcinput, EdgeRc) else EdgeRc(rcinput)
+        kwargs.setdefault('base_url', edgerc_base_url(edgerc, section))
+        kwargs.setdefault('section', section)
+        kwargs.setdefault('edgerc', edgerc)
+        return cls(EdgeGridAuth.from_edgerc(edgerc, section), **kwargs)
+
+    def request(self, method, url, *args, deadline=None, **kwargs):
+        """
+        Sends a request like requests.Session.request().
+
+        :param deadline: seconds, or a Deadline, within which the request including its
+            redirects, retries and hedged copies must complete, else DeadlineExceeded is
+            raised (default None, only the deadline of the enclosing context applies)
+        """
+        if deadline is None:
+            return super().request(method, url, *args, **kwargs)
+        if not isinstance(deadline, Deadline):
+            deadline = Deadline(deadline)
+        with deadline:
+            return super().request(method, url, *args, **kwargs)
+
+    def stream_json(self, url, path=(), *, method='GET', chunk_size=65536, **kwargs):
+        """
+        Sends a request and parses its JSON response incrementally, yielding the items of
+        the array at path as the response body arrives. Peak memory is bounded by the size
+        of one item and one chunk instead of the whole document.
+
+        Usage::
+            >>> for credential in session.stream_json(
+            ...         '/identity-management/v3/api-clients/self/credentials'):
+            ...     print(credential['credentialId'])
+
+        :param url: request URL, relative to base_url if set
+        :param path: sequence of object keys leading to the array, e.g. ('items',)
+            (default is the top-level array)
+        :param method: HTTP method (default 'GET')
+        :param chunk_size: number of bytes to read at a time (default 65536)
+        :param kwargs: passed to request(), e.g. params or headers
+        :raises requests.HTTPError: if the response status is 4xx or 5xx
+        """
+        with self.request(method, url, stream=True, **kwargs) as res:
+            res.raise_for_status()
+            yield from iter_json_items(res.iter_content(chunk_size), path)
+
+    def batch(self, url, **kwargs):
+        """
+        Returns a BatchingClient sending many small items, e.g. purge objects, in batched
+        JSON POST requests to url. Close it, or use it as a context manager, to send the
+        last batch.
+
+        Usage::
+            >>> with session.batch('/ccu/v3/invalidate/url/production') as purges:
+            ...     futures = [purges.submit(url) for url in urls]
+
+        :param url: request URL, relative to base_url if set
+        :param kwargs: BatchingClient options, e.g. max_items, max_delay or workers
+        """
+        return BatchingClient(self, url, **kwargs)
+
+    def download(self, url, path, *, part_size=8 * 1024 * 1024, workers=4, retries=2,
+                 chunk_size=65536, **kwargs):
+        """
+        Downloads a large file, e.g. a report or a log archive, with parallel Range GET
+        requests each signed on its own, writing the parts in place into a preallocated
+        file. If the download fails, the parts written so far are kept and calling
+        download() again with the same url and path resumes it, unless the file changed.
+        Servers which do not support ranges send the whole file in one response.
+
+        :param url: request URL, relative to base_url if set
+        :param path: path of the downloaded file, written once it is complete
+        :param part_size: number of bytes requested at a time (default 8 MiB)
+        :param workers: number of parts downloaded concurrently (default 4)
+        :param retries: number of times a part is retried, from the last byte received,
+            after a connection error, a timeout or a server error (default 2)
+        :param chunk_size: number of bytes read and written at a time (default 65536)
+        :param kwargs: passed to every request, e.g. timeout or params
+        :returns: a Download with the size of the file and the bytes which were resumed
+        :raises IncompleteDownload: if a part could not be downloaded
+        """
+        return RangedDownload(self, url, path, part_size=part_size, workers=workers,
+                              retries=retries, chunk_size=chunk_size).run(**kwargs)
+
+    def warm(self, base_urls=None, *, connections=1, timeout=10.0):
+        """
+        Opens pooled connections to the given hosts in parallel, so that the first requests
+        do not pay for DNS resolution, TCP and TLS setup. Connections are kept in the
+        session's connection pool, which holds up to pool_maxsize (default 10) connections
+        per host.
+
+        :param base_urls: URLs of the hosts to connect to (default is the hosts of all
+            sections of the edgerc, or base_url)
+        :param connections: number of connections to open per host (default 1)
+        :param timeout: connect timeout in seconds (default 10.0)
+        :returns: a Warmup with the time the warm-up took and a HostWarmup per host
+        """
+        if base_urls is None:
+            if self.edgerc is not None:
+                base_urls = edgerc_base_urls(self.edgerc)
+            else:
+                base_urls = [self.base_url] if self.base_url else []
+        return warm(self, base_urls, connections, timeout)
+
+    def request_stages(self):
+        """Returns the callables applied to every prepared request before it is signed"""
+        stages = []
+        if self.compression is not None:
+            stages.append(self.compression)
+        return stages
+
+    def span_attributes(self, request):
+        """Returns the tracing attributes describing a request"""
+        attributes = {
+            'http.request.method': request.method,
+            'server.address': urlparse(request.url).hostname,
+        }
+        if self.section is not None:
+            attributes['edgegrid.section'] = self.section
+        return attributes
+
+    def prepare_request(self, request):
+        if self.tracer is None:
+            return self._prepare_request(request)
+        with self.tracer.start_span('edgegrid.prepare') as span:
+            prepared = self._prepare_request(request)
+            for key, value in self.span_attributes(prepared).items():
+                span.set_attribute(key, value)
+            return prepared
+
+    def send(self, request, **kwargs):
+        if self.metrics is None:
+            return self._send_within_deadline(request, **kwargs)
+        if self.metrics.record_response not in request.hooks['response']:
+            request.register_hook('response', self.metrics.record_response)
+        try:
+            return self._send_within_deadline(request, **kwargs)
+        except requests.RequestException as exc:
+            # a failed redirect is recorded by the send() call of the redirected request
+            if getattr(exc, 'request', None) in (request, None):
+                self.metrics.record_error(request, exc)
+            raise
+
+    def _send_within_deadline(self, request, **kwargs):
+        deadline = current_deadline()
+        if deadline is None:
+            return self._send_coalesced(request, **kwargs)
+        # every redirect and retry is sent with the time left
+        kwargs['timeout'] = deadline.timeout(kwargs.get('timeout'), request)
+        # the body is read within the time left too, before any other hook reads it
+        hooks = request.hooks['response']
+        guarded = deadline.guard_body not in hooks
+        if guarded:
+            hooks.insert(0, deadline.guard_body)
+        try:
+            return self._send_coalesced(request, **kwargs)
+        except requests.Timeout as exc:
+            if deadline.expired() and not isinstance(exc, DeadlineExceeded):
+                raise DeadlineExceeded(f'akamai.edgegrid: deadline exceeded: {exc}',
+                                       request=request) from exc
+            raise
+        finally:
+            if guarded:
+                hooks.remove(deadline.guard_body)
+
+    def _own_hooks(self):
+        """Returns the response hooks which the session adds to every request"""
+        hooks = list(self.hooks['response'])
+        if hasattr(self.auth, 'handle_redirect'):
+            hooks.append(self.auth.handle_redirect)
+        if self.metrics is not None:
+            hooks.append(self.metrics.record_response)
+        deadline = current_deadline()
+        if deadline is not None:
+            hooks.append(deadline.guard_body)
+        return hooks
+
+    def _send_coalesced(self, request, **kwargs):
+        if self.single_flight is None or not is_coalescable(request, kwargs.get('stream'),
+                                                            self._own_hooks()):
+            return self._send_hedged(request, **kwargs)
+
+        key = coalescing_key(request, self.section, kwargs)
+
+        def send_and_read():
+            res = self._send_hedged(request, **kwargs)
+            _ = res.content
+            return res
+
+        deadline = current_deadline()
+        try:
+            res, shared = self.single_flight.do(
+                key, send_and_read, timeout=None if deadline is None else deadline.remaining())
+        except FutureTimeoutError as exc:
+            raise DeadlineExceeded('akamai.edgegrid: deadline exceeded waiting for an '
+                                   'identical request', request=request) from exc
+        if shared:
+            logger.debug("sharing the response to %s %s", request.method, request.url)
+            return share_response(res, request)
+        return res
+
+    def _send_hedged(self, request, **kwargs):
+        if self.hedging is None or not self.hedging.applies(request):
+            return self._send(request, **kwargs)
+        return self.hedging.send(self._send, request, self._hedge_copy, **kwargs)
+
+    def _hedge_copy(self, request):
+        hedge = request.copy()
+        if hasattr(self.auth, 'resign') and 'Authorization' in hedge.headers:
+            # a fresh nonce, so that the copy is not rejected as a replay of the original
+            self.auth.resign(hedge)
+        return hedge
+
+    def _send(self, request, **kwargs):
+        if self.breaker is None:
+            return self._send_traced(request, **kwargs)
+
+        circuit = self.breaker.circuit(request.url)
+        probe = circuit.acquire()
+        if probe and hasattr(self.auth, 'resign') and 'Authorization' in request.headers:
+            # the probe may have been signed long before the circuit let it through
+            self.auth.resign(request)
+        failure = None
+        start = self.breaker.clock()
+        try:
+            res = self._send_traced(request, **kwargs)
+            failure = self.breaker.is_failure(res)
+            return res
+        except CircuitOpenError:
+            # the circuit of a redirect location is open
+            raise
+        except (requests.ConnectionError, requests.Timeout):
+            failure = True
+            raise
+        finally:
+            circuit.record(failure, self.breaker.clock() - start, probe)
+
+    def _send_traced(self, request, **kwargs):
+        if self.tracer is None:
+            return super().send(request, **kwargs)
+        with self.tracer.start_span('edgegrid.send', self.span_attributes(request)) as span:
+            trace_connections(self.get_adapter(request.url))
+            with sending(span):
+                res = super().send(request, **kwargs)
+            span.add_event('response', {'http.response.status_code': res.status_code})
+            span.set_attribute('http.response.status_code', res.status_code)
+            span.set_attribute('edgegrid.time_to_headers', res.elapsed.total_seconds())
+            span.set_attribute('edgegrid.retry_count',
+                               sum(1 for r in res.history if not r.is_redirect))
+            return res
+
+    def _prepare_request(self, request):
+        request = copy.copy(request)
+        if self.base_url:
+            request.url = urljoin(self.base_url, request.url)
+        stages = self.request_stages()
+        if stages or self.metrics is not None or self.tracer is not None:
+            request.auth = StagedAuth(stages, request.auth or self.auth, self.metrics,
+                                      self.tracer)
+        return super().prepare_request(request)
+
+    def compile(self, method, url, **kwargs):
+        """
+        Returns a RequestTemplate for a request sent repeatedly with identical headers
+        and body, e.g. by a poller. Send it with send_template().
+
+        :param method: HTTP method
+        :param url: request URL, relative to base_url if set
+        :param kwargs: passed to requests.Request, e.g. headers, params or data
+        """
+        return self.auth.compile(self.prepare_request(requests.Request(method, url, **kwargs)))
+
+    def send_template(self, template, **kwargs):
+        """Signs the template request with a fresh timestamp and nonce and sends it.
+
+        :param template: RequestTemplate returned by compile()
+        :param kwargs: passed to send(), e.g. timeout or allow_redirects
+        """
+        prepared = template.prepare()
+        kwargs.update(self.merge_environment_settings(
+            prepared.url, kwargs.pop('proxies', {}), kwargs.pop('stream', None),
+            kwargs.pop('verify', None), kwargs.pop('cert', None)))
+        kwargs.setdefault('allow_redirects', True)
+        return self.send(prepared, **kwargs)
@@ -0,0 +1,110 @@
+"""Single-flight coalescing of identical concurrent requests"""
+
+import copy
+import logging
+import threading
+from concurrent.futures import Future
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+__all__ = ['SingleFlight']
+
+COALESCED_METHODS = ('GET', 'HEAD')
+
+
+class Flight:  # pylint: disable=too-few-public-methods
+    """A call in progress: its outcome and the thread running it"""
+
+    def __init__(self):
+        self.future = Future()
+        self.leader = threading.get_ident()
+
+
+class SingleFlight:  # pylint: disable=too-few-public-methods
+    """Runs at most one call per key at a time. Callers arriving with the key of a call in
+    progress wait for it and share its outcome instead of running their own."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.coalesced = 0
+
+    def do(self, key, fn, timeout=None):
+        """
+        Runs fn, or waits for the call in progress with the same key.
+
+        :param timeout: seconds to wait for the call in progress (default None, no limit)
+
+        :returns: (result, shared) where shared tells whether result came from another caller
+        :raises: the exception raised by fn, or concurrent.futures.TimeoutError if the
+            call in progress did not complete within timeout
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            # a call made by the leader itself, e.g. a redirect to the same URL, runs on its own
+            if flight is not None and flight.leader != threading.get_ident():
+                self.coalesced += 1
+                leader = False
+            else:
+                flight = Flight()
+                self._flights.setdefault(key, flight)
+                leader = True
+        if not leader:
+            return flight.future.result(timeout), True
+
+        try:
+            result = fn()
+        except BaseException as exc:
+            self._land(key, flight)
+            flight.future.set_exception(exc)
+            raise
+        self._land(key, flight)
+        flight.future.set_result(result)
+        return result, False
+
+    def _land(self, key, flight):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+
+def is_coalescable(request, stream=False, own_hooks=()):
+    """Tells whether a prepared request may share the response of an identical one.
+    Requests with response hooks other than own_hooks, e.g. those of the session, are
+    always sent, as the hooks of a request sharing a response would not run."""
+    return (request.method in COALESCED_METHODS and not request.body and not stream
+            and all(hook in own_hooks for hook in request.hooks.get('response', ())))
+
+
+def coalescing_key(request, section=None, send_kwargs=None):
+    """Returns the key identifying identical requests: method, host, path with query,
+    header values, credentials and the send() settings changing the response, i.e.
+    allow_redirects, verify, proxies and cert. Every header counts, signed or not, as e.g.
+    Range, Accept or If-None-Match change the response."""
+    send_kwargs = send_kwargs or {}
+    credentials = request.headers.get('Authorization', '').split('timestamp=')[0]
+    cert = send_kwargs.get('cert')
+    return (
+        request.method,
+        request.headers.get('Host') or urlparse(request.url).netloc,
+        request.path_url,
+        tuple(sorted((name.lower(), value) for name, value in request.headers.items()
+                     if name.lower() not in ('authorization', 'host'))),
+        section,
+        credentials,
+        send_kwargs.get('allow_redirects', True),
+        send_kwargs.get('verify', True),
+        tuple(sorted((send_kwargs.get('proxies') or {}).items())),
+        tuple(cert) if isinstance(cert, list) else cert,
+    )
+
+
+def share_response(res, request):
+    """Returns a copy of a fully read response for another waiter of the same request"""
+    shared = copy.copy(res)
+    shared.headers = res.headers.copy()
+    shared.cookies = res.cookies.copy()
+    shared.history = list(res.history)
+    shared.request = request
+    return shared
@@ -1,10 +1,19 @@
-# pylint: disable=missing-function-docstring
+# pylint: disable=missing-function-docstring,redefined-outer-name
 """Unit tests helpers"""
 
+import base64
+import hashlib
+import hmac
 import json
 import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
 import pytest
 
+from akamai.edgegrid import EdgeGridAuth
+
 test_dir = os.path.abspath(os.path.dirname(__file__))
 
 
@@ -28,6 +37,22 @@ def names(tests):
     return result
 
 
+@pytest.fixture
+def make_auth(testdata):
+    """Returns a factory of EdgeGridAuth instances with the test credentials and max_body,
+    taking other EdgeGridAuth options and overrides as keyword arguments"""
+    def make(**kwargs):
+        options = {key: testdata[key]
+                   for key in ('client_token', 'client_secret', 'access_token', 'max_body')}
+        return EdgeGridAuth(**{**options, **kwargs})
+    return make
+
+
+@pytest.fixture
+def edgegrid_auth(make_auth):
+    return make_auth()
+
+
 @pytest.fixture
 def multipart_fields():
     with open(f'{test_dir}/sample_file.txt', "rb") as f:
@@ -42,3 +67,145 @@ def multipart_fields():
 def sample_file():
     with open(f'{test_dir}/sample_file.txt', "rb") as f:
         yield f
+
+
+class FakeClock:  # pylint: disable=too-few-public-methods
+    """A clock which only moves when told to"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def fake_clock():
+    return FakeClock()
+
+
+class ReceivedRequest:  # pylint: disable=too-few-public-methods
+    """A request as seen on the wire by the LocalServer"""
+    def __init__(self, method, path, headers, body):
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.body = body
+
+
+class LocalHandler(BaseHTTPRequestHandler):
+    """Records received requests and answers them with the server's responder"""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *_):
+        pass
+
+    def read_body(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            body = bytearray()
+            while True:
+                size = int(self.rfile.readline().split(b';')[0], 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return bytes(body)
+                body += self.rfile.read(size)
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def handle_request(self):
+        received = ReceivedRequest(self.command, self.path, self.headers, self.read_body())
+        self.server.received.append(received)
+        status, headers, payload = self.server.responder(received)
+        if 'Date' in headers:
+            self.send_response_only(status)
+        else:
+            self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        if not isinstance(payload, bytes):
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for chunk in payload:
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+            self.wfile.write(b'0\r\n\r\n')
+            return
+        if 'Content-Length' not in headers:
+            self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = do_HEAD = do_DELETE = handle_request
+
+
+class LocalServer(ThreadingHTTPServer):
+    """A local HTTP server running in a background thread"""
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), LocalHandler)
+        self.received = []
+        self.connections = 0
+        self.responder = lambda _: (200, {'Content-Type': 'application/json'}, b'{}')
+        self.thread = threading.Thread(target=self.serve_forever, args=(0.05,), daemon=True)
+
+    def process_request(self, request, client_address):
+        self.connections += 1
+        super().process_request(request, client_address)
+
+    def handle_error(self, request, client_address):
+        # clients hang up on slow responses, e.g. once their deadline passed
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+
+@pytest.fixture
+def local_server():
+    server = LocalServer()
+    server.thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def range_responder(content, etag='"1"', ranges=True):
+    """Returns a LocalServer responder serving content with support for Range and
+    If-Range requests, like the servers of large downloads"""
+    def respond(received):
+        requested = received.headers.get('Range')
+        if_range = received.headers.get('If-Range')
+        if not ranges or requested is None or if_range not in (None, etag):
+            return 200, {'ETag': etag}, content
+        first, last = requested[len('bytes='):].split('-')
+        first, last = int(first), min(int(last or len(content) - 1), len(content) - 1)
+        if first >= len(content):
+            return 416, {'Content-Range': f'bytes */{len(content)}'}, b''
+        return 206, {'ETag': etag, 'Content-Range': f'bytes {first}-{last}/{len(content)}'}, \
+            content[first:last + 1]
+    return respond
+
+
+def verify_signature(received, client_secret, max_body, headers_to_sign=()):
+    """Independently recomputes the EG1-HMAC-SHA256 signature of a request received by
+    the LocalServer and tells whether it matches the Authorization header"""
+    auth = received.headers['Authorization']
+    unsigned, signature = auth.split('signature=')
+    timestamp = dict(kv.split('=', 1) for kv in unsigned.split(' ', 1)[1].split(';') if kv)[
+        'timestamp']
+    content_hash = ''
+    if received.method == 'POST' and received.body:
+        content_hash = base64.b64encode(
+            hashlib.sha256(received.body[:max_body]).digest()).decode()
+    canonical = '\t'.join(
+        f"{h.lower()}:{' '.join(received.headers[h].split())}"
+        for h in headers_to_sign if h in received.headers)
+    data = '\t'.join([received.method, 'http', received.headers['Host'], received.path,
+                      canonical, content_hash, unsigned])
+    key = base64.b64encode(hmac.new(client_secret.encode(), timestamp.encode(),
+                                    hashlib.sha256).digest())
+    expected = base64.b64encode(hmac.new(key, data.encode(), hashlib.sha256).digest())
+    return signature == expected.decode()
@@ -0,0 +1,81 @@
+# pylint: disable=missing-function-docstring,too-many-arguments,too-many-positional-arguments
+"""A minimal local cleartext HTTP/2 server (prior knowledge) for tests and benchmarks.
+Requires the h2 package."""
+
+import asyncio
+import threading
+
+import h2.config
+import h2.connection
+import h2.events
+from requests.structures import CaseInsensitiveDict
+
+from akamai.edgegrid.test.conftest import ReceivedRequest
+
+
+class H2Server:
+    """Answers every request with 200 and a small JSON body after an optional delay,
+    counting the connections and streams it served"""
+
+    def __init__(self, delay=0.0, payload=b'{}'):
+        self.delay = delay
+        self.payload = payload
+        self.received = []
+        self.connections = 0
+        self.loop = asyncio.new_event_loop()
+        self.server = None
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}'
+
+    def start(self):
+        self.server = self.loop.run_until_complete(
+            asyncio.start_server(self.handle, '127.0.0.1', 0))
+        self.thread.start()
+        return self
+
+    def stop(self):
+        async def close():
+            self.server.close()
+            await self.server.wait_closed()
+        asyncio.run_coroutine_threadsafe(close(), self.loop).result(timeout=5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        conn = h2.connection.H2Connection(
+            h2.config.H2Configuration(client_side=False, header_encoding='utf-8'))
+        conn.initiate_connection()
+        writer.write(conn.data_to_send())
+        requests = {}
+        while not reader.at_eof():
+            data = await reader.read(65535)
+            if not data:
+                break
+            for event in conn.receive_data(data):
+                if isinstance(event, h2.events.RequestReceived):
+                    requests[event.stream_id] = (CaseInsensitiveDict(event.headers), bytearray())
+                elif isinstance(event, h2.events.DataReceived):
+                    requests[event.stream_id][1].extend(event.data)
+                    conn.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+                elif isinstance(event, h2.events.StreamEnded):
+                    headers, body = requests.pop(event.stream_id)
+                    asyncio.ensure_future(
+                        self.respond(conn, writer, event.stream_id, headers, bytes(body)))
+            writer.write(conn.data_to_send())
+            await writer.drain()
+        writer.close()
+
+    async def respond(self, conn, writer, stream_id, headers, body):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        headers['Host'] = headers[':authority']
+        self.received.append(ReceivedRequest(headers[':method'], headers[':path'], headers, body))
+        conn.send_headers(stream_id, [(':status', '200'),
+                                      ('content-type', 'application/json'),
+                                      ('content-length', str(len(self.payload)))])
+        conn.send_data(stream_id, self.payload, end_stream=True)
+        writer.write(conn.data_to_send())
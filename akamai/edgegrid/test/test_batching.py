@@ -0,0 +1,119 @@
+# pylint: disable=missing-function-docstring
+"""unit tests for batching small POST requests"""
+
+import json
+import socket
+import threading
+
+import pytest
+import requests
+
+from akamai.edgegrid import EdgeGridSession
+from akamai.edgegrid.test.conftest import verify_signature
+
+PURGE_URL = '/ccu/v3/invalidate/url/production'
+
+
+def purge_responder(received):
+    if received.path != PURGE_URL:
+        return 404, {}, b'{}'
+    return 201, {'Content-Type': 'application/json'}, b'{"httpStatus": 201}'
+
+
+def received_objects(server):
+    return [json.loads(received.body)['objects'] for received in server.received]
+
+
+def test_flush_on_count(local_server, edgegrid_auth, testdata):
+    local_server.responder = purge_responder
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url)
+    with session.batch(PURGE_URL, max_items=3, max_delay=60) as purges:
+        futures = [purges.submit(f'https://www.example.com/{i}') for i in range(7)]
+
+    assert sorted(len(objects) for objects in received_objects(local_server)) == [1, 3, 3]
+    assert sorted(sum(received_objects(local_server), [])) == \
+        sorted(f'https://www.example.com/{i}' for i in range(7))
+    assert {f.result().status_code for f in futures} == {201}
+    for received in local_server.received:
+        assert received.method == 'POST'
+        assert received.headers['Content-Type'] == 'application/json'
+        assert verify_signature(received, testdata['client_secret'], testdata['max_body'])
+
+
+def test_flush_on_size(local_server, edgegrid_auth):
+    local_server.responder = purge_responder
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url)
+    urls = [f'https://www.example.com/{"x" * (i % 7)}' for i in range(40)]
+    with session.batch(PURGE_URL, max_bytes=120, max_delay=60, workers=1,
+                       fields={'hostname': 'www.example.com'}) as purges:
+        for url in urls:
+            purges.submit(url)
+
+    assert sum(received_objects(local_server), []) == urls
+    for received in local_server.received:
+        assert len(received.body) <= 120
+        assert json.loads(received.body)['hostname'] == 'www.example.com'
+    # each batch is full: the next item would not have fitted
+    sizes = [len(received.body) for received in local_server.received]
+    assert all(size + len('"https://www.example.com/",') > 120 for size in sizes[:-1])
+
+
+def test_default_max_bytes_is_hashing_window(edgegrid_auth, testdata):
+    session = EdgeGridSession(edgegrid_auth)
+    with session.batch(PURGE_URL) as purges:
+        assert purges.max_bytes == testdata['max_body']
+        with pytest.raises(ValueError, match='item of 2052 bytes does not fit'):
+            purges.submit('x' * 2050)
+    with EdgeGridSession().batch(PURGE_URL) as purges:
+        assert purges.max_bytes == 50000
+
+
+def test_flush_on_delay(local_server, edgegrid_auth):
+    local_server.responder = purge_responder
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url)
+    with session.batch(PURGE_URL, max_delay=0.01) as purges:
+        assert purges.submit('https://www.example.com/').result(timeout=5).status_code == 201
+        assert purges.submit('https://www.example.com/2').result(timeout=5).status_code == 201
+    assert received_objects(local_server) == [['https://www.example.com/'],
+                                              ['https://www.example.com/2']]
+
+
+def test_errors_fail_the_futures_of_the_batch(edgegrid_auth):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        base_url = f'http://127.0.0.1:{sock.getsockname()[1]}'
+    session = EdgeGridSession(edgegrid_auth, base_url=base_url)
+    with session.batch(PURGE_URL) as purges:
+        futures = [purges.submit('https://www.example.com/'), purges.submit('/a')]
+    for future in futures:
+        with pytest.raises(requests.ConnectionError):
+            future.result()
+
+
+def test_backpressure(local_server, edgegrid_auth):
+    release = threading.Event()
+    local_server.responder = lambda received: (release.wait(5), purge_responder(received))[1]
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url)
+    with session.batch(PURGE_URL, max_items=1, max_pending=2, workers=1) as purges:
+        first = [purges.submit('/a'), purges.submit('/b')]
+        with pytest.raises(TimeoutError):
+            purges.submit('/c', timeout=0.05)
+        release.set()
+        assert purges.submit('/c', timeout=5).result(timeout=5).status_code == 201
+    assert [f.result().status_code for f in first] == [201, 201]
+    assert received_objects(local_server) == [['/a'], ['/b'], ['/c']]
+
+
+def test_cancelled_items_are_not_sent(local_server, edgegrid_auth):
+    local_server.responder = purge_responder
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url)
+    with session.batch(PURGE_URL, max_delay=60) as purges:
+        kept = purges.submit('/a')
+        assert purges.submit('/b').cancel()
+        purges.flush()
+        assert kept.result(timeout=5).status_code == 201
+        assert purges.submit('/c').cancel()
+    assert received_objects(local_server) == [['/a']]
+
+    with pytest.raises(RuntimeError, match='closed'):
+        purges.submit('/d')
@@ -0,0 +1,158 @@
+# pylint: disable=missing-function-docstring
+"""unit tests for circuit breaking"""
+
+import socket
+
+import pytest
+import requests
+
+from akamai.edgegrid import EdgeGridSession
+from akamai.edgegrid.breaker import CircuitBreaker, CircuitOpenError, RollingWindow
+from akamai.edgegrid.test.conftest import verify_signature
+
+
+def failing_responder(failing_paths, fake_clock=None, delay=0.0):
+    def respond(received):
+        if fake_clock is not None:
+            fake_clock.now += delay
+        if any(received.path.startswith(path) for path in failing_paths):
+            return 503, {}, b'{"title": "Service Unavailable"}'
+        return 200, {}, b'{}'
+    return respond
+
+
+def breaker_session(server, auth, fake_clock, **kwargs):
+    kwargs.setdefault('min_requests', 4)
+    breaker = CircuitBreaker(window=10.0, buckets=5, open_duration=30.0, clock=fake_clock, **kwargs)
+    return EdgeGridSession(auth, base_url=server.url, breaker=breaker)
+
+
+def test_rolling_window_expires_buckets(fake_clock):
+    window = RollingWindow(10.0, 5, fake_clock)
+    window.add(True, False)
+    fake_clock.now += 4
+    window.add(False, True)
+    assert window.totals() == (2, 1, 1)
+    fake_clock.now += 7
+    assert window.totals() == (1, 0, 1)
+    fake_clock.now += 4
+    assert window.totals() == (0, 0, 0)
+
+
+def test_opens_on_failure_rate_and_fails_fast(local_server, edgegrid_auth, fake_clock):
+    local_server.responder = failing_responder(['/papi'])
+    session = breaker_session(local_server, edgegrid_auth, fake_clock)
+
+    statuses = [session.get('/papi/v1/groups').status_code for _ in range(4)]
+    assert statuses == [503] * 4
+    assert session.breaker.state(local_server.url + '/papi/v1/groups') == 'open'
+
+    with pytest.raises(CircuitOpenError, match='circuit open for .+/papi/v1/groups, retry in 30'):
+        session.get('/papi/v1/groups')
+    assert len(local_server.received) == 4
+
+    # other endpoints of the host have their own circuit
+    assert session.get('/identity-management/v3/user-profile').status_code == 200
+
+
+def test_per_host_circuit(local_server, edgegrid_auth, fake_clock):
+    local_server.responder = failing_responder(['/papi'])
+    session = breaker_session(local_server, edgegrid_auth, fake_clock, per_endpoint=False)
+    for _ in range(4):
+        session.get('/papi/v1/groups')
+    with pytest.raises(CircuitOpenError):
+        session.get('/identity-management/v3/user-profile')
+
+
+def test_stays_closed_below_thresholds(local_server, edgegrid_auth, fake_clock):
+    local_server.responder = lambda received: (
+        (404, {}, b'{}') if received.path.endswith('missing') else (200, {}, b'{}'))
+    session = breaker_session(local_server, edgegrid_auth, fake_clock)
+    for _ in range(10):
+        session.get('/papi/v1/missing')
+    assert session.breaker.state(local_server.url + '/papi/v1/missing') == 'closed'
+
+    local_server.responder = failing_responder(['/papi'])
+    for _ in range(3):
+        session.get('/papi/v1/groups')
+    # the failures are older than the window
+    fake_clock.now += 11
+    session.get('/papi/v1/groups')
+    assert session.breaker.state(local_server.url + '/papi/v1/groups') == 'closed'
+
+
+def test_half_open_probe_is_freshly_signed_and_closes(local_server, edgegrid_auth, fake_clock,
+                                                     testdata):
+    local_server.responder = failing_responder(['/papi'])
+    session = breaker_session(local_server, edgegrid_auth, fake_clock)
+    for _ in range(4):
+        session.get('/papi/v1/groups')
+    prepared = session.prepare_request(requests.Request('GET', '/papi/v1/groups'))
+    authorization = prepared.headers['Authorization']
+
+    fake_clock.now += 30
+    local_server.responder = failing_responder([])
+    assert session.send(prepared).status_code == 200
+
+    probe = local_server.received[-1]
+    assert probe.headers['Authorization'] != authorization
+    assert verify_signature(probe, testdata['client_secret'], testdata['max_body'])
+    assert session.breaker.state(local_server.url + '/papi/v1/groups') == 'closed'
+    assert session.get('/papi/v1/groups').status_code == 200
+
+
+def test_failed_probe_reopens(local_server, edgegrid_auth, fake_clock):
+    local_server.responder = failing_responder(['/papi'])
+    session = breaker_session(local_server, edgegrid_auth, fake_clock)
+    for _ in range(4):
+        session.get('/papi/v1/groups')
+
+    fake_clock.now += 30
+    assert session.get('/papi/v1/groups').status_code == 503
+    assert session.breaker.state(local_server.url + '/papi/v1/groups') == 'open'
+    fake_clock.now += 29
+    with pytest.raises(CircuitOpenError):
+        session.get('/papi/v1/groups')
+    assert len(local_server.received) == 5
+
+
+def test_half_open_admits_limited_probes(fake_clock):
+    breaker = CircuitBreaker(min_requests=1, half_open_requests=2, clock=fake_clock)
+    circuit = breaker.circuit('https://example.com/papi/v1/groups')
+    assert circuit.acquire() is False
+    circuit.record(True, 0.1, False)
+    fake_clock.now += 30
+
+    assert circuit.acquire() is True
+    assert circuit.acquire() is True
+    with pytest.raises(CircuitOpenError):
+        circuit.acquire()
+
+    circuit.record(False, 0.1, True)
+    assert circuit.state == 'half-open'
+    circuit.record(False, 0.1, True)
+    assert circuit.state == 'closed'
+
+
+def test_opens_on_slow_requests(local_server, edgegrid_auth, fake_clock):
+    local_server.responder = failing_responder([], fake_clock, delay=2.0)
+    session = breaker_session(local_server, edgegrid_auth, fake_clock, slow_call_duration=1.0)
+    for _ in range(4):
+        assert session.get('/papi/v1/groups').status_code == 200
+    with pytest.raises(CircuitOpenError):
+        session.get('/papi/v1/groups')
+
+
+def test_connection_errors_are_failures(edgegrid_auth, fake_clock):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        base_url = f'http://127.0.0.1:{sock.getsockname()[1]}'
+    breaker = CircuitBreaker(min_requests=2, clock=fake_clock)
+    session = EdgeGridSession(edgegrid_auth, base_url=base_url, breaker=breaker)
+
+    for _ in range(2):
+        with pytest.raises(requests.ConnectionError) as exc_info:
+            session.get('/papi/v1/groups')
+        assert not isinstance(exc_info.value, CircuitOpenError)
+    with pytest.raises(CircuitOpenError):
+        session.get('/papi/v1/groups')
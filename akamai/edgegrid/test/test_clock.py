@@ -0,0 +1,101 @@
+# pylint: disable=missing-function-docstring
+"""unit tests for clock skew compensation"""
+
+import calendar
+import time
+from datetime import timedelta
+from email.utils import formatdate
+
+import pytest
+import requests
+
+from akamai.edgegrid import ClockSkew, EdgeGridSession
+from akamai.edgegrid.test.conftest import verify_signature
+
+SKEW = 300
+
+
+def response(date, elapsed=0.0):
+    res = requests.Response()
+    res.status_code = 200
+    if date is not None:
+        res.headers['Date'] = date
+    res.elapsed = timedelta(seconds=elapsed)
+    return res
+
+
+class TestClockSkew:
+    """Test ClockSkew"""
+    def test_learns_offset_from_date(self, fake_clock):
+        skew = ClockSkew(clock=fake_clock)
+        assert skew.observe(response(formatdate(1300, usegmt=True), elapsed=0.2))
+        assert skew.offset == pytest.approx(300.6)
+        assert skew.now() == pytest.approx(1300.6)
+
+    def test_smooths_samples(self, fake_clock):
+        skew = ClockSkew(clock=fake_clock, smoothing=0.5)
+        skew.observe(response(formatdate(1100, usegmt=True)))
+        skew.observe(response(formatdate(1000, usegmt=True)))
+        assert skew.offset == pytest.approx(50.5)
+        skew.observe(response(formatdate(1000, usegmt=True)), reset=True)
+        assert skew.offset == pytest.approx(0.5)
+
+    @pytest.mark.parametrize('date', [None, 'yesterday'])
+    def test_ignores_missing_or_invalid_date(self, date):
+        skew = ClockSkew()
+        assert not skew.observe(response(date))
+        assert skew.offset == 0.0
+
+    def test_timestamp(self, fake_clock):
+        fake_clock.now = 1395430461.0
+        skew = ClockSkew(clock=fake_clock)
+        assert skew.timestamp() == '20140321T19:34:21+0000'
+
+
+def skewed_server(local_server):
+    """Makes local_server run SKEW seconds ahead of the local clock and reject
+    timestamps which are more than 30 seconds off like the {OPEN} API gateway"""
+    def respond(received):
+        now = time.time() + SKEW
+        auth = received.headers['Authorization']
+        timestamp = auth.split('timestamp=')[1].split(';')[0]
+        sent = calendar.timegm(time.strptime(timestamp, '%Y%m%dT%H:%M:%S+0000'))
+        headers = {'Date': formatdate(now, usegmt=True)}
+        if abs(now - sent) > 30:
+            return 401, headers, b'{"title": "Unauthorized", "detail": "Invalid timestamp"}'
+        return 200, headers, b'{}'
+    local_server.responder = respond
+    return local_server
+
+
+def test_retries_once_with_server_time(local_server, make_auth, testdata):
+    server = skewed_server(local_server)
+    auth = make_auth(clock_skew=ClockSkew())
+    session = EdgeGridSession(auth, base_url=server.url)
+
+    res = session.get('/papi/v1/groups')
+    assert res.status_code == 200
+    assert [r.status_code for r in res.history] == [401]
+    assert auth.clock_skew.offset == pytest.approx(SKEW, abs=2)
+    assert verify_signature(server.received[1], testdata['client_secret'],
+                            testdata['max_body'])
+
+    assert session.get('/papi/v1/groups').status_code == 200
+    assert len(server.received) == 3
+
+
+def test_retries_post_with_bytes_body(local_server, make_auth, testdata):
+    server = skewed_server(local_server)
+    auth = make_auth(clock_skew=ClockSkew())
+    res = EdgeGridSession(auth, base_url=server.url).post('/ccu/v3/invalidate/url', data=b'{}')
+    assert res.status_code == 200
+    assert server.received[1].body == b'{}'
+    assert verify_signature(server.received[1], testdata['client_secret'],
+                            testdata['max_body'])
+
+
+def test_no_retry_without_estimator(local_server, edgegrid_auth):
+    server = skewed_server(local_server)
+    res = EdgeGridSession(edgegrid_auth, base_url=server.url).get('/papi/v1/groups')
+    assert res.status_code == 401
+    assert len(server.received) == 1
@@ -0,0 +1,74 @@
+# pylint: disable=missing-function-docstring
+"""unit tests for request body compression"""
+
+import gzip
+import zlib
+
+import pytest
+
+from akamai.edgegrid import EdgeGridSession
+from akamai.edgegrid.compression import RequestCompressor
+from akamai.edgegrid.test.conftest import verify_signature
+
+PAYLOAD = b'{"objects": ["https://www.example.com/index.html"]}' * 1000
+
+
+def test_gzip_bytes_body_is_signed_over_wire_bytes(local_server, edgegrid_auth, testdata):
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url, compression='gzip')
+    assert session.post('/ccu/v3/invalidate/url', data=PAYLOAD).status_code == 200
+
+    received = local_server.received[0]
+    assert received.headers['Content-Encoding'] == 'gzip'
+    assert int(received.headers['Content-Length']) == len(received.body) < len(PAYLOAD)
+    assert gzip.decompress(received.body) == PAYLOAD
+    assert verify_signature(received, testdata['client_secret'], testdata['max_body'])
+
+
+def test_deflate_streamed_body_is_signed_over_wire_bytes(local_server, edgegrid_auth, testdata):
+    def generate():
+        for start in range(0, len(PAYLOAD), 1000):
+            yield PAYLOAD[start:start + 1000]
+
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url,
+                              compression=RequestCompressor('deflate', min_size=0))
+    assert session.post('/ccu/v3/invalidate/url', data=generate()).status_code == 200
+
+    received = local_server.received[0]
+    assert received.headers['Content-Encoding'] == 'deflate'
+    assert received.headers['Transfer-Encoding'] == 'chunked'
+    assert zlib.decompress(received.body) == PAYLOAD
+    assert verify_signature(received, testdata['client_secret'], testdata['max_body'])
+
+
+def test_file_body_is_compressed_as_stream(local_server, edgegrid_auth, testdata, tmp_path):
+    path = tmp_path / 'rules.json'
+    path.write_bytes(PAYLOAD)
+
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url, compression='gzip')
+    with open(path, 'rb') as f:
+        session.post('/papi/v1/rules', data=f)
+
+    received = local_server.received[0]
+    assert gzip.decompress(received.body) == PAYLOAD
+    assert verify_signature(received, testdata['client_secret'], testdata['max_body'])
+
+
+def test_small_body_is_not_compressed(local_server, edgegrid_auth, testdata):
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url, compression='gzip')
+    session.post('/ccu/v3/invalidate/url', data=b'{}')
+
+    received = local_server.received[0]
+    assert 'Content-Encoding' not in received.headers
+    assert received.body == b'{}'
+    assert verify_signature(received, testdata['client_secret'], testdata['max_body'])
+
+
+def test_get_is_not_compressed(local_server, edgegrid_auth):
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url, compression='gzip')
+    session.get('/ccu/v3/queues/default')
+    assert 'Content-Encoding' not in local_server.received[0].headers
+
+
+def test_unsupported_encoding():
+    with pytest.raises(ValueError):
+        RequestCompressor('br')
@@ -0,0 +1,120 @@
+# pylint: disable=missing-function-docstring
+"""unit tests for request deadlines"""
+
+import threading
+import time
+
+import pytest
+import requests
+
+from akamai.edgegrid import EdgeGridSession
+from akamai.edgegrid.clock import ClockSkew
+from akamai.edgegrid.deadline import Deadline, DeadlineExceeded, current_deadline
+
+
+def test_timeout_is_capped_at_the_time_left(fake_clock):
+    deadline = Deadline(2.0, clock=fake_clock)
+    assert deadline.timeout() == 2.0
+    assert deadline.timeout(0.5) == 0.5
+    assert deadline.timeout((1.0, None)) == (1.0, 2.0)
+    fake_clock.now += 1.5
+    assert deadline.timeout((1.0, 30)) == (0.5, 0.5)
+    fake_clock.now += 0.75
+    assert deadline.expired()
+    with pytest.raises(DeadlineExceeded, match='deadline exceeded by 0.250s'):
+        deadline.timeout(10)
+
+
+def test_nested_deadlines_only_shorten(fake_clock):
+    outer = Deadline(1.0, clock=fake_clock)
+    assert current_deadline() is None
+    with outer:
+        with Deadline(5.0, clock=fake_clock):
+            assert current_deadline() is outer
+        inner = Deadline(0.5, clock=fake_clock)
+        with inner:
+            assert current_deadline() is inner
+        assert current_deadline() is outer
+    assert current_deadline() is None
+
+
+def slow_responder(delay, release):
+    def respond(received):
+        if received.path.startswith('/slow'):
+            release.wait(delay)
+        if received.path == '/slow/redirect':
+            return 302, {'Location': '/slow/groups'}, b''
+        return 200, {}, b'{}'
+    return respond
+
+
+def test_request_deadline(local_server, edgegrid_auth):
+    release = threading.Event()
+    local_server.responder = slow_responder(5, release)
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url)
+
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded) as exc_info:
+        session.get('/slow/groups', deadline=0.2)
+    release.set()
+    assert time.monotonic() - start < 1
+    assert isinstance(exc_info.value, requests.Timeout)
+    assert exc_info.value.request.path_url == '/slow/groups'
+    assert session.get('/papi/v1/groups', deadline=1).status_code == 200
+
+
+def test_deadline_caps_redirects(local_server, edgegrid_auth):
+    local_server.responder = slow_responder(0.15, threading.Event())
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url)
+
+    # each hop is well within its timeout, but not both within the deadline
+    with pytest.raises(DeadlineExceeded):
+        session.get('/slow/redirect', timeout=1, deadline=0.25)
+    assert session.get('/slow/redirect', timeout=1, deadline=2).status_code == 200
+
+
+def test_expired_deadline_sends_nothing(local_server, edgegrid_auth, fake_clock):
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url)
+    deadline = Deadline(1.0, clock=fake_clock)
+    with deadline:
+        assert session.get('/papi/v1/groups').status_code == 200
+        fake_clock.now += 1
+        with pytest.raises(DeadlineExceeded):
+            session.get('/papi/v1/contracts')
+        with pytest.raises(DeadlineExceeded):
+            session.get('/papi/v1/contracts', deadline=10)
+    assert len(local_server.received) == 1
+
+
+def test_deadline_caps_clock_skew_retry(local_server, make_auth, fake_clock):
+    responses = iter([(401, {'Date': 'Mon, 19 Oct 2026 00:00:00 GMT'},
+                       b'{"detail": "Invalid timestamp"}')])
+
+    def respond(_):
+        fake_clock.now += 1
+        return next(responses, (200, {}, b'{}'))
+
+    local_server.responder = respond
+    session = EdgeGridSession(make_auth(clock_skew=ClockSkew()), base_url=local_server.url)
+    with pytest.raises(DeadlineExceeded):
+        with Deadline(1.0, clock=fake_clock):
+            session.get('/papi/v1/groups')
+    assert len(local_server.received) == 1
+
+
+def test_deadline_caps_reading_the_body(local_server, edgegrid_auth):
+    def trickle():
+        for byte in b'{"items": []}':
+            time.sleep(0.15)
+            yield bytes([byte])
+
+    local_server.responder = lambda _: (200, {}, trickle())
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url)
+
+    # every byte arrives well within the timeout, but not the whole body within the deadline
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded) as exc_info:
+        session.get('/papi/v1/groups', timeout=1, deadline=0.5)
+    assert time.monotonic() - start < 0.75
+    assert exc_info.value.request.path_url == '/papi/v1/groups'
+    assert session.get('/papi/v1/groups', deadline=5).json() == {'items': []}
@@ -0,0 +1,189 @@
+# pylint: disable=missing-function-docstring
+"""unit tests for parallel ranged downloads"""
+
+import gzip
+import json
+import os
+import random
+
+import pytest
+
+from akamai.edgegrid import EdgeGridSession
+from akamai.edgegrid.download import IncompleteDownload, parse_content_range
+from akamai.edgegrid.test.conftest import range_responder, verify_signature
+
+CONTENT = random.Random(40).randbytes(100000)
+URL = '/reporting-api/v1/reports/traffic/archive.gz'
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('bytes 0-0/100', (0, 0, 100)),
+    ('bytes 10-19/*', (10, 19, None)),
+    ('bytes */0', (None, None, 0)),
+    ('bytes 1-2', None),
+    (None, None),
+])
+def test_parse_content_range(value, expected):
+    assert parse_content_range(value) == expected
+
+
+def ranges_of(server):
+    return [received.headers['Range'] for received in server.received]
+
+
+def test_parallel_download(local_server, edgegrid_auth, testdata, tmp_path):
+    local_server.responder = range_responder(CONTENT)
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url)
+
+    result = session.download(URL, tmp_path / 'archive.gz', part_size=16384, workers=3)
+    assert (tmp_path / 'archive.gz').read_bytes() == CONTENT
+    assert result.size == len(CONTENT)
+    assert result.parts == 7
+    assert result.resumed == 0
+    assert os.listdir(tmp_path) == ['archive.gz']
+
+    assert ranges_of(local_server)[0] == 'bytes=0-0'
+    assert sorted(ranges_of(local_server)[1:]) == sorted(
+        f'bytes={i}-{min(i + 16384, len(CONTENT)) - 1}' for i in range(0, len(CONTENT), 16384))
+    for received in local_server.received:
+        assert received.path == URL
+        assert verify_signature(received, testdata['client_secret'], testdata['max_body'])
+    # each part is signed with its own nonce
+    assert len({received.headers['Authorization'] for received in local_server.received}) == 8
+
+
+def test_server_without_ranges(local_server, edgegrid_auth, tmp_path):
+    local_server.responder = range_responder(CONTENT, ranges=False)
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url)
+    result = session.download(URL, tmp_path / 'archive.gz', part_size=16384)
+    assert (tmp_path / 'archive.gz').read_bytes() == CONTENT
+    assert result.parts == 1
+    assert len(local_server.received) == 1
+
+
+def test_server_compressing_the_file(local_server, edgegrid_auth, tmp_path):
+    # ranges of a compressed encoding are ranges of the compressed bytes
+    content = b'{"hits": 1}\n' * 10000
+    identity, compressed = range_responder(content), range_responder(gzip.compress(content))
+
+    def respond(received):
+        if 'gzip' not in received.headers.get('Accept-Encoding', ''):
+            return identity(received)
+        status, headers, payload = compressed(received)
+        return status, {**headers, 'Content-Encoding': 'gzip'}, payload
+
+    local_server.responder = respond
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url)
+    result = session.download(URL, tmp_path / 'hits.json', part_size=16384)
+    assert (tmp_path / 'hits.json').read_bytes() == content
+    assert result.parts == 8
+    for received in local_server.received:
+        assert received.headers['Accept-Encoding'] == 'identity'
+
+
+def test_headers_are_sent_with_every_part(local_server, edgegrid_auth, tmp_path):
+    local_server.responder = range_responder(CONTENT)
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url)
+    headers = {'Accept': 'application/gzip', 'accept-encoding': 'gzip', 'Range': 'bytes=5-'}
+
+    result = session.download(URL, tmp_path / 'archive.gz', part_size=16384, headers=headers,
+                              stream=False)
+    assert (tmp_path / 'archive.gz').read_bytes() == CONTENT
+    assert result.parts == 7
+    assert ranges_of(local_server)[0] == 'bytes=0-0'
+    for received in local_server.received:
+        assert received.headers['Accept'] == 'application/gzip'
+        assert received.headers['Accept-Encoding'] == 'identity'
+    assert headers == {'Accept': 'application/gzip', 'accept-encoding': 'gzip', 'Range': 'bytes=5-'}
+
+
+def test_empty_file(local_server, edgegrid_auth, tmp_path):
+    local_server.responder = range_responder(b'')
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url)
+    assert session.download(URL, tmp_path / 'empty').size == 0
+    assert (tmp_path / 'empty').read_bytes() == b''
+
+
+def truncating(responder, truncated):
+    """Cuts the connection halfway through the responses to the requested ranges"""
+    def respond(received):
+        status, headers, payload = responder(received)
+        if received.headers.get('Range') in truncated:
+            truncated.remove(received.headers['Range'])
+            headers = dict(headers, **{'Content-Length': str(len(payload)),
+                                       'Connection': 'close'})
+            payload = payload[:len(payload) // 2]
+        return status, headers, payload
+    return respond
+
+
+def test_part_is_retried_from_the_last_byte_received(local_server, edgegrid_auth, tmp_path):
+    local_server.responder = truncating(range_responder(CONTENT), ['bytes=32768-49151'])
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url)
+
+    session.download(URL, tmp_path / 'archive.gz', part_size=16384, chunk_size=1024)
+    assert (tmp_path / 'archive.gz').read_bytes() == CONTENT
+    retried = [r for r in ranges_of(local_server) if r.endswith('-49151')]
+    assert retried[0] == 'bytes=32768-49151'
+    assert int(retried[1][len('bytes='):].split('-')[0]) > 32768
+
+
+def test_resume_after_failure(local_server, edgegrid_auth, tmp_path):
+    failing = {'bytes=65536-81919'}
+
+    def respond(received):
+        if received.headers.get('Range') in failing:
+            return 503, {}, b'{"title": "Service Unavailable"}'
+        return range_responder(CONTENT)(received)
+
+    local_server.responder = respond
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url)
+    path = tmp_path / 'archive.gz'
+
+    with pytest.raises(IncompleteDownload, match='downloaded 4 of 7 parts'):
+        session.download(URL, path, part_size=16384, workers=1, retries=1)
+    assert not path.exists()
+    with open(f'{path}.partial.json', encoding='utf-8') as f:
+        assert json.load(f)['done'] == [0, 1, 2, 3]
+    # retried once, then the parts after it were not requested
+    assert ranges_of(local_server)[-2:] == ['bytes=65536-81919'] * 2
+
+    failing.clear()
+    local_server.received.clear()
+    result = session.download(URL, path, part_size=16384, workers=1)
+    assert path.read_bytes() == CONTENT
+    assert result.resumed == 4 * 16384
+    assert ranges_of(local_server) == [
+        'bytes=0-0', 'bytes=65536-81919', 'bytes=81920-98303', 'bytes=98304-99999']
+    assert sorted(os.listdir(tmp_path)) == ['archive.gz']
+
+
+def test_changed_file_is_downloaded_again(local_server, edgegrid_auth, tmp_path):
+    local_server.responder = truncating(range_responder(CONTENT), ['bytes=16384-32767'] * 3)
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url)
+    path = tmp_path / 'archive.gz'
+    with pytest.raises(IncompleteDownload):
+        session.download(URL, path, part_size=16384, workers=1)
+
+    changed = CONTENT[::-1]
+    local_server.responder = range_responder(changed, etag='"2"')
+    local_server.received.clear()
+    assert session.download(URL, path, part_size=16384).resumed == 0
+    assert path.read_bytes() == changed
+    assert len(local_server.received) == 8
+
+
+def test_file_changing_during_the_download(local_server, edgegrid_auth, tmp_path):
+    original = range_responder(CONTENT)
+    changed = range_responder(CONTENT[::-1], etag='"2"')
+
+    def respond(received):
+        return (original if len(local_server.received) < 3 else changed)(received)
+
+    local_server.responder = respond
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url)
+
+    with pytest.raises(IncompleteDownload, match='the file may have changed'):
+        session.download(URL, tmp_path / 'archive.gz', part_size=16384, workers=1)
+    assert local_server.received[-1].headers['If-Range'] == '"1"'
+    assert not (tmp_path / 'archive.gz').exists()
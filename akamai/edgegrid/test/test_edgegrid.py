@@ -1,11 +1,15 @@
 # pylint: disable=missing-function-docstring
 """unit tests for edgegrid. It runs tests from testcases.json"""
 
+import asyncio
+import functools
 import io
 import logging
 import os
 import re
+import threading
 import unittest.mock
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urljoin
 
 import requests
@@ -63,14 +67,16 @@ def test_make_content_hash_logs_warning_for_unknown_body_len(testdata, caplog):
                         caplog.text)
 
 
+@pytest.mark.parametrize("engine", ['optimized', 'reference', 'differential'])
 @pytest.mark.parametrize("testcase", cases(), ids=names(cases()))
-def test_edge_grid(testdata, testcase):
+def test_edge_grid(testdata, testcase, engine):
     auth = EdgeGridAuth(
         client_token=testdata['client_token'],
         client_secret=testdata['client_secret'],
         access_token=testdata['access_token'],
         headers_to_sign=testdata['headers_to_sign'],
-        max_body=testdata['max_body']
+        max_body=testdata['max_body'],
+        engine=engine
     )
 
     headers = {}
@@ -97,6 +103,9 @@ def test_edge_grid(testdata, testcase):
         auth_header = auth.ah.make_auth_header(req, testdata['timestamp'], testdata['nonce'])
         assert auth_header == testcase['expectedAuthorization']
         assert data_to_sign == testcase['expectedDataToSign']
+        template_header = auth.compile(req).make_auth_header(
+            testdata['timestamp'], testdata['nonce'])
+        assert template_header == testcase['expectedAuthorization']
     else:
         with pytest.raises(Exception) as exc_info:
             req.prepare()
@@ -388,3 +397,193 @@ def test_multipart_encoder(testdata, multipart_fields):
     auth_header = auth.ah.make_auth_header(req, testdata["timestamp"], testdata["nonce"])
 
     assert auth_header == testdata["multipart_hash_test"]
+
+
+class TestStreamingBody:
+    """Test StreamingBody"""
+    @staticmethod
+    def generator(*chunks):
+        yield from chunks
+
+    def test_hashes_prefix_like_bytes(self):
+        body = eg.StreamingBody(self.generator(b'foo', 'bar', b'', b'baz'), 5)
+        assert body.content_hash == eg.base64_sha256(b'fooba')
+        assert body.hashed == 5
+        assert body.truncated
+        assert body.prefix == b'foobar'
+        assert b''.join(body) == b'foobarbaz'
+
+    def test_not_truncated_when_stream_fits(self):
+        body = eg.StreamingBody(self.generator(b'foo', b'bar'), 6)
+        assert not body.truncated
+        assert body.content_hash == eg.base64_sha256(b'foobar')
+
+    def test_empty_stream(self):
+        body = eg.StreamingBody(self.generator(), 1024)
+        assert body.content_hash == ''
+        assert not list(body)
+
+    def test_does_not_read_beyond_max_body(self):
+        consumed = []
+
+        def counting():
+            for i in range(100):
+                consumed.append(i)
+                yield b'x' * 10
+
+        body = eg.StreamingBody(counting(), 25)
+        assert len(consumed) == 3
+        assert len(b''.join(body)) == 1000
+
+    def test_multipart_encoder_is_not_rewound(self, multipart_fields):
+        encoder = requests_toolbelt.MultipartEncoder(multipart_fields, "multipart_boundary")
+        expected = requests_toolbelt.MultipartEncoder(
+            multipart_fields, "multipart_boundary").to_string()
+        multipart_fields['baz'][1].seek(0)
+
+        body = eg.StreamingBody(encoder, 20, chunk_size=7)
+        assert body.len == len(expected)
+        assert body.content_hash == eg.base64_sha256(expected[:20])
+        assert b''.join(body) == expected
+
+    def test_hashes_prefix_of_another_max_body(self, testdata):
+        body = eg.StreamingBody(self.generator(b'foo', b'bar', b'baz', b'qux'), 4)
+        assert body.content_hash_for(2) == eg.base64_sha256(b'fo')
+        # more of the stream is buffered until it is sent
+        assert body.content_hash_for(7) == eg.base64_sha256(b'foobarb')
+        auth_headers = eg.EdgeGridAuthHeaders(
+            client_token=testdata['client_token'],
+            client_secret=testdata['client_secret'],
+            access_token=testdata['access_token'],
+            max_body=testdata['max_body']
+        )
+        assert auth_headers.make_content_hash(body, 'POST') == eg.base64_sha256(b'foobarbazqux')
+        assert b''.join(body) == b'foobarbazqux'
+        assert body.content_hash_for(4) == eg.base64_sha256(b'foob')
+
+    def test_generator_body_is_signed_like_bytes(self, testdata):
+        auth = EdgeGridAuth(
+            client_token=testdata['client_token'],
+            client_secret=testdata['client_secret'],
+            access_token=testdata['access_token'],
+            max_body=16
+        )
+        url = urljoin(testdata['base_url'], '/testapi/v1/t3')
+        content = b'datadatadatadatadatadatadatadata'
+
+        with unittest.mock.patch.object(eg, 'eg_timestamp', return_value=testdata['timestamp']), \
+                unittest.mock.patch.object(eg, 'new_nonce', return_value=testdata['nonce']):
+            expected = auth(requests.Request('POST', url, data=content).prepare())
+            streamed = auth(requests.Request(
+                'POST', url, data=self.generator(content[:10], content[10:])).prepare())
+
+        assert isinstance(streamed.body, eg.StreamingBody)
+        assert streamed.headers['Authorization'] == expected.headers['Authorization']
+        assert b''.join(streamed.body) == content
+
+    def test_file_body_is_not_wrapped(self, testdata, sample_file):
+        auth = EdgeGridAuth(
+            client_token=testdata['client_token'],
+            client_secret=testdata['client_secret'],
+            access_token=testdata['access_token'],
+        )
+        req = auth(requests.Request('POST', testdata['base_url'], data=sample_file).prepare())
+        assert req.body is sample_file
+
+
+class TestSignFuture:
+    """Test EdgeGridAuth.sign_future and sign_async"""
+
+    @pytest.fixture
+    def make_auth(self, make_auth):
+        """Makes auth handlers hashing large bodies in a single test-hashing thread"""
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='test-hashing') as executor:
+            yield functools.partial(make_auth, executor=executor)
+
+    @staticmethod
+    def signing_threads(auth):
+        threads = []
+        make_content_hash = auth.ah.make_content_hash
+
+        def recording(body, method):
+            threads.append(threading.current_thread().name)
+            return make_content_hash(body, method)
+
+        auth.ah.make_content_hash = recording
+        return threads
+
+    @pytest.mark.parametrize('case', [
+        ('GET', None, 2048),
+        ('POST', b'x' * 1023, 2048),
+        ('POST', 'x' * 1023, 2048),
+        # fewer bytes than the threshold are hashed
+        ('POST', b'x' * 4096, 1000),
+    ])
+    def test_small_bodies_are_signed_inline(self, testdata, make_auth, case):
+        method, data, max_body = case
+        auth = make_auth(max_body=max_body, inline_threshold=1024)
+        threads = self.signing_threads(auth)
+
+        future = auth.sign_future(
+            requests.Request(method, testdata['base_url'], data=data).prepare())
+        assert future.done()
+        assert 'Authorization' in future.result().headers
+        assert threads == [threading.current_thread().name]
+
+    @pytest.mark.parametrize('data', ['bytes', 'str', 'file', 'generator'])
+    def test_large_bodies_are_signed_in_the_executor(self, testdata, make_auth, data, tmp_path):
+        auth = make_auth(inline_threshold=1024)
+        threads = self.signing_threads(auth)
+        content = os.urandom(testdata['max_body'] * 2)
+        (tmp_path / 'body').write_bytes(content)
+        bodies = {
+            'bytes': lambda: content,
+            'str': content.hex,
+            'file': lambda: open(tmp_path / 'body', 'rb'),  # pylint: disable=consider-using-with
+            'generator': lambda: iter([content[:1000], content[1000:]]),
+        }
+        url = urljoin(testdata['base_url'], '/testapi/v1/t3')
+
+        with unittest.mock.patch.object(eg, 'eg_timestamp', return_value=testdata['timestamp']), \
+                unittest.mock.patch.object(eg, 'new_nonce', return_value=testdata['nonce']):
+            expected = auth(requests.Request('POST', url, data=bodies[data]()).prepare())
+            signed = auth.sign_future(requests.Request('POST', url, data=bodies[data]()).prepare())
+            assert signed.result(timeout=5).headers['Authorization'] == \
+                expected.headers['Authorization']
+        assert threads[1].startswith('test-hashing')
+        if data == 'file':
+            expected.body.close()
+            assert signed.result().body.tell() == 0
+            signed.result().body.close()
+
+    def test_errors_are_set_on_the_future(self, testdata, make_auth):
+        auth = make_auth()
+        req = requests.Request('POST', testdata['base_url'], data=b'x').prepare()
+        req.body = object()
+        with pytest.raises(TypeError):
+            auth.sign_future(req).result(timeout=5)
+
+    def test_shared_executor(self, testdata, make_auth):
+        auth = make_auth(executor=None, inline_threshold=0)
+        req = requests.Request('POST', testdata['base_url'], data=b'x').prepare()
+        assert 'Authorization' in auth.sign_future(req).result(timeout=5).headers
+        assert eg.hashing_executor() is eg.hashing_executor()
+
+    def test_sign_async(self, testdata, make_auth):
+        auth = make_auth(inline_threshold=0)
+        threads = self.signing_threads(auth)
+        content = os.urandom(testdata['max_body'])
+
+        async def sign_while_ticking():
+            ticks = 0
+            signing = asyncio.ensure_future(auth.sign_async(
+                requests.Request('POST', testdata['base_url'], data=content).prepare()))
+            while not signing.done():
+                ticks += 1
+                await asyncio.sleep(0)
+            return await signing, ticks
+
+        signed, ticks = asyncio.run(sign_while_ticking())
+        assert signed.headers['Authorization'].startswith('EG1-HMAC-SHA256 ')
+        assert ticks > 0
+        assert threads[0].startswith('test-hashing')
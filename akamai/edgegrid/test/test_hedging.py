@@ -0,0 +1,153 @@
+# pylint: disable=missing-function-docstring
+"""unit tests for hedged requests"""
+
+import threading
+
+import pytest
+import requests
+
+from akamai.edgegrid import EdgeGridSession
+from akamai.edgegrid.deadline import DeadlineExceeded
+from akamai.edgegrid.hedging import Hedging
+from akamai.edgegrid.test.conftest import verify_signature
+
+
+def first_is_slow(release, server):
+    """Holds the first request until release is set, answers the others at once"""
+    def respond(_):
+        if len(server.received) == 1:
+            release.wait(5)
+            return 200, {}, b'{"attempt": "first"}'
+        return 200, {}, b'{"attempt": "hedge"}'
+    return respond
+
+
+def hedged_session(server, auth, **kwargs):
+    kwargs.setdefault('initial_delay', 0.05)
+    kwargs.setdefault('budget', 1.0)
+    return EdgeGridSession(auth, base_url=server.url, hedging=Hedging(**kwargs))
+
+
+def test_hedged_request_wins(local_server, edgegrid_auth, testdata):
+    release = threading.Event()
+    local_server.responder = first_is_slow(release, local_server)
+    session = hedged_session(local_server, edgegrid_auth)
+
+    res = session.get('/papi/v1/groups')
+    release.set()
+    assert res.json() == {'attempt': 'hedge'}
+    assert session.hedging.hedged == session.hedging.hedge_wins == 1
+
+    first, hedge = local_server.received
+    assert first.path == hedge.path == '/papi/v1/groups'
+    # independently signed, with its own nonce
+    assert first.headers['Authorization'] != hedge.headers['Authorization']
+    nonces = [dict(kv.split('=', 1) for kv in r.headers['Authorization'].split(';') if '=' in kv)
+              ['nonce'] for r in (first, hedge)]
+    assert nonces[0] != nonces[1]
+    for received in (first, hedge):
+        assert verify_signature(received, testdata['client_secret'], testdata['max_body'])
+
+
+def test_fast_response_is_not_hedged(local_server, edgegrid_auth):
+    session = hedged_session(local_server, edgegrid_auth, initial_delay=5)
+    assert session.get('/papi/v1/groups').status_code == 200
+    assert len(local_server.received) == 1
+    assert session.hedging.hedged == 0
+
+
+def test_delay_runs_once_the_request_is_sent(local_server, edgegrid_auth):
+    session = hedged_session(local_server, edgegrid_auth, initial_delay=0.1, workers=1)
+    release = threading.Event()
+    # the only worker is busy, e.g. with other requests
+    session.hedging._executor.submit(release.wait, 5)  # pylint: disable=protected-access
+    threading.Timer(0.3, release.set).start()
+
+    assert session.get('/papi/v1/groups').status_code == 200
+    assert len(local_server.received) == 1
+    assert session.hedging.hedged == 0
+    # the latency observed leaves out the wait for a worker
+    key = session.hedging.key(local_server.url + '/papi/v1/groups')
+    assert session.hedging.latencies[key][0] < 0.1
+
+
+@pytest.mark.parametrize('method', ['POST', 'PUT', 'DELETE'])
+def test_only_idempotent_methods_are_hedged(local_server, edgegrid_auth, method):
+    release = threading.Event()
+    local_server.responder = lambda _: (release.wait(0.2), (200, {}, b'{}'))[1]
+    session = hedged_session(local_server, edgegrid_auth)
+    assert session.request(method, '/papi/v1/groups', data=b'{}').status_code == 200
+    assert len(local_server.received) == 1
+
+
+def test_budget_limits_hedges(local_server, edgegrid_auth):
+    release = threading.Event()
+    local_server.responder = lambda _: (release.wait(0.1), (200, {}, b'{}'))[1]
+    session = hedged_session(local_server, edgegrid_auth, budget=0.5)
+    for _ in range(4):
+        session.get('/papi/v1/groups')
+    assert session.hedging.requests == 4
+    assert session.hedging.hedged == 2
+    assert len(local_server.received) == 6
+
+
+def test_delay_is_a_percentile_of_recent_latencies():
+    hedging = Hedging(percentile=0.9, initial_delay=1.0, min_samples=10, window=100)
+    url = 'https://example.com/papi/v1/properties/prp_1'
+    for i in range(9):
+        hedging.observe(url, i / 100)
+    assert hedging.delay(url) == 1.0
+    for i in range(9, 200):
+        hedging.observe(url, i / 100)
+    # the window holds the latencies from 1.00 to 1.99
+    assert hedging.delay(url) == 1.9
+    assert hedging.delay('https://example.com/papi/v1/properties/prp_2') == 1.9
+    assert hedging.delay('https://example.com/papi/v1/groups') == 1.0
+
+    hedging = Hedging(min_samples=1, min_delay=0.05)
+    hedging.observe(url, 0.001)
+    assert hedging.delay(url) == 0.05
+
+
+@pytest.mark.parametrize('hedge_fails', [False, True])
+def test_failed_attempt_waits_for_the_other(edgegrid_auth, hedge_fails):
+    release = threading.Event()
+    calls = []
+
+    def send(request, **_):
+        calls.append(request)
+        if len(calls) == 1:
+            release.wait(5)
+            raise requests.ConnectionError('first attempt failed')
+        release.set()
+        if hedge_fails:
+            raise requests.ConnectionError('hedged attempt failed')
+        return 'hedged response'
+
+    hedging = Hedging(initial_delay=0.01, budget=1.0)
+    request = EdgeGridSession(edgegrid_auth).prepare_request(
+        requests.Request('GET', 'https://example.com/papi/v1/groups'))
+    if hedge_fails:
+        # the error of the first attempt is raised
+        with pytest.raises(requests.ConnectionError, match='first attempt failed'):
+            hedging.send(send, request, lambda r: r.copy())
+    else:
+        assert hedging.send(send, request, lambda r: r.copy()) == 'hedged response'
+    assert len(calls) == 2
+
+
+def test_hedging_within_deadline(local_server, edgegrid_auth):
+    release = threading.Event()
+    local_server.responder = lambda _: (release.wait(5), (200, {}, b'{}'))[1]
+    session = hedged_session(local_server, edgegrid_auth, initial_delay=0.05)
+
+    with pytest.raises(DeadlineExceeded):
+        session.get('/papi/v1/groups', deadline=0.3)
+    # both attempts were cut short by the deadline
+    assert len(local_server.received) == 2
+
+    # no hedge is sent when the deadline expires before the hedging delay
+    with pytest.raises(DeadlineExceeded):
+        session.get('/papi/v1/groups', deadline=0.03)
+    release.set()
+    assert len(local_server.received) == 3
@@ -0,0 +1,96 @@
+# pylint: disable=missing-function-docstring,redefined-outer-name
+"""unit tests for the HTTP/2 transport adapter"""
+
+import ssl
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from akamai.edgegrid import EdgeGridSession
+from akamai.edgegrid.http2 import HTTP2Adapter, make_ssl_context
+from akamai.edgegrid.test.conftest import verify_signature
+from akamai.edgegrid.test.h2_server import H2Server
+
+
+@pytest.fixture
+def h2_server():
+    server = H2Server(delay=0.05).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def h2_session(h2_server, edgegrid_auth):
+    session = EdgeGridSession(edgegrid_auth, base_url=h2_server.url)
+    session.mount('http://', HTTP2Adapter(http1=False, max_connections=2))
+    yield session
+    session.close()
+
+
+def test_requests_are_signed_individually(h2_server, h2_session, testdata):
+    res = h2_session.post('/ccu/v3/invalidate/url', json={'objects': ['/index.html']},
+                          params={'a': 1})
+    assert res.status_code == 200
+    assert res.json() == {}
+    assert res.headers['Content-Type'] == 'application/json'
+
+    received, = h2_server.received
+    assert received.path == '/ccu/v3/invalidate/url?a=1'
+    assert received.body == b'{"objects": ["/index.html"]}'
+    assert verify_signature(received, testdata['client_secret'], testdata['max_body'])
+
+
+def test_concurrent_requests_are_multiplexed(h2_server, h2_session, testdata):
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        statuses = list(pool.map(
+            lambda i: h2_session.get(f'/papi/v1/properties/{i}').status_code, range(40)))
+
+    assert statuses == [200] * 40
+    assert h2_server.connections <= 2
+    nonces = {r.headers['Authorization'].split('nonce=')[1] for r in h2_server.received}
+    assert len(nonces) == 40
+    assert all(verify_signature(r, testdata['client_secret'], testdata['max_body'])
+               for r in h2_server.received)
+
+
+def test_streamed_body(h2_server, h2_session, testdata):
+    res = h2_session.post('/ccu/v3/invalidate/url', data=iter([b'foo', b'bar']))
+    assert res.status_code == 200
+    assert h2_server.received[0].body == b'foobar'
+    assert verify_signature(h2_server.received[0], testdata['client_secret'],
+                            testdata['max_body'])
+
+
+def test_session_option_mounts_adapter(edgegrid_auth):
+    session = EdgeGridSession(edgegrid_auth, http2=True)
+    assert isinstance(session.get_adapter('https://example.com/'), HTTP2Adapter)
+    assert not isinstance(session.get_adapter('http://example.com/'), HTTP2Adapter)
+    session.close()
+
+
+def test_proxies_are_honoured(h2_session):
+    # nothing listens on the proxy port, so the request fails instead of reaching the server
+    h2_session.proxies = {'http': 'http://127.0.0.1:9'}
+    with pytest.raises(requests.ConnectionError):
+        h2_session.get('/papi/v1/groups')
+
+
+def test_a_client_per_tls_settings_and_proxy(h2_server, h2_session):
+    adapter = h2_session.get_adapter(h2_server.url)
+    assert h2_session.get('/papi/v1/groups').status_code == 200
+    clients = len(adapter.clients)
+    assert h2_session.get('/papi/v1/groups', verify=False).status_code == 200
+    assert h2_session.get('/papi/v1/groups', verify=False).status_code == 200
+    assert len(adapter.clients) == clients + 1
+    assert (False, None, None) in adapter.clients
+
+
+def test_ssl_context_of_requests_settings():
+    assert make_ssl_context(True, None) is True
+    assert make_ssl_context(False, None) is False
+    context = make_ssl_context(requests.certs.where(), None)
+    assert context.verify_mode == ssl.CERT_REQUIRED
+    assert context.cert_store_stats()['x509_ca'] > 0
+    with pytest.raises(FileNotFoundError):
+        make_ssl_context(False, ('/nonexistent/client.pem', '/nonexistent/client.key'))
@@ -0,0 +1,120 @@
+# pylint: disable=missing-function-docstring
+"""unit tests for incremental JSON parsing"""
+
+import json
+import tracemalloc
+
+import pytest
+import requests
+
+from akamai.edgegrid import EdgeGridSession
+from akamai.edgegrid.jsonstream import iter_json_items
+
+DOCUMENT = {
+    'accountId': 'A-CCT1234',
+    'skipped': {'nested': [1, [2, {'x': '[{"]}'}]], 'escaped': 'quote \\" and \\\\'},
+    'empty': [],
+    'items': [
+        {'credentialId': 1, 'description': 'zażółć gęślą jaźń ✓'},
+        12345678901234567890,
+        -1.5e-3,
+        'string with ] and }',
+        True,
+        None,
+        [],
+        {},
+    ],
+    'after': 'ignored',
+}
+
+
+def chunked(data, size):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 1024])
+def test_items_at_path(chunk_size):
+    data = json.dumps(DOCUMENT, ensure_ascii=False, indent=1).encode('utf8')
+    assert list(iter_json_items(chunked(data, chunk_size), ['items'])) == DOCUMENT['items']
+
+
+@pytest.mark.parametrize('chunk_size', [1, 5])
+def test_top_level_array(chunk_size):
+    document = [{'a': 1}, 2, 'three', [4]]
+    data = json.dumps(document).encode('utf8')
+    assert list(iter_json_items(chunked(data, chunk_size))) == document
+
+
+def test_nested_path_and_empty_array():
+    data = json.dumps({'data': {'list': [1, 2]}, 'empty': []}).encode('utf8')
+    assert list(iter_json_items(chunked(data, 3), ('data', 'list'))) == [1, 2]
+    assert not list(iter_json_items(chunked(data, 3), ('empty',)))
+
+
+@pytest.mark.parametrize('path', [('missing',), ('accountId',), ('skipped', 'nested', 'x')])
+def test_no_array_at_path(path):
+    data = json.dumps(DOCUMENT).encode('utf8')
+    with pytest.raises(ValueError) as excinfo:
+        list(iter_json_items(chunked(data, 4), path))
+    assert excinfo.match('akamai.edgegrid: no array at path')
+
+
+@pytest.mark.parametrize('data', [
+    b'[1, 2', b'{"items": [1 2]}', b'[{"a": }]', b'{"items": [1, "abc'])
+def test_invalid_json(data):
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_items(chunked(data, 2), ('items',) if data.startswith(b'{') else ()))
+
+
+def test_items_spanning_chunks_are_decoded_once(monkeypatch):
+    calls = []
+    raw_decode = json.JSONDecoder.raw_decode
+    monkeypatch.setattr(json.JSONDecoder, 'raw_decode',
+                        lambda self, s, idx=0: calls.append(idx) or raw_decode(self, s, idx))
+    items = [{'id': i, 'pad': 'x' * 100000, 'tags': ['a]', 'b}']} for i in range(3)]
+    data = json.dumps({'items': items}).encode('utf8')
+
+    assert list(iter_json_items(chunked(data, 1024), ['items'])) == items
+    # once for the key and once for each item
+    assert len(calls) == 4
+
+
+def test_memory_is_bounded():
+    def generate(count):
+        yield b'{"skipped": ['
+        for i in range(count):
+            yield (b',' if i else b'') + b'"%0128d"' % i
+        yield b'], "items": ['
+        for i in range(count):
+            yield (b',' if i else b'') + json.dumps({'id': i, 'pad': 'x' * 200}).encode()
+        yield b']}'
+
+    tracemalloc.start()
+    try:
+        count = sum(1 for _ in iter_json_items(generate(5000), ['items']))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert count == 5000
+    # the skipped array alone is 650 kB
+    assert peak < 200 * 1024
+
+
+def test_session_stream_json(local_server, edgegrid_auth):
+    payload = json.dumps(DOCUMENT).encode()
+    # sent with chunked Transfer-Encoding, in pieces splitting tokens
+    chunks = (payload[i:i + 7] for i in range(0, len(payload), 7))
+    local_server.responder = lambda _: (200, {}, chunks)
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url)
+    items = session.stream_json('/identity-management/v3/api-clients/self/credentials',
+                                ['items'], params={'actions': True}, chunk_size=16)
+    assert list(items) == DOCUMENT['items']
+    assert local_server.received[0].path.endswith('?actions=True')
+
+
+def test_session_stream_json_raises_for_status(local_server, edgegrid_auth):
+    local_server.responder = lambda _: (404, {}, b'{"title": "Not Found"}')
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url)
+    with pytest.raises(requests.HTTPError):
+        list(session.stream_json('/papi/v1/missing'))
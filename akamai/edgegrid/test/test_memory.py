@@ -0,0 +1,129 @@
+# pylint: disable=missing-function-docstring,redefined-outer-name
+"""Memory allocation budgets of request signing: whatever the size of a body, signing it
+must allocate memory in proportion to max_body only"""
+
+import io
+import tracemalloc
+
+import pytest
+import requests
+import requests_toolbelt
+
+from akamai.edgegrid import EdgeGridAuth, StreamingBody
+from akamai.edgegrid.edgegrid import determine_body_len, read_body_content
+
+MAX_BODY = 65536
+SIZES = [0, 1000, MAX_BODY, 64 * MAX_BODY]
+# allocations unrelated to the body, e.g. of the authorization header and nonce
+OVERHEAD = 64 * 1024
+# determining the length of a body allocates at most a chunk of its text
+LENGTH_BUDGET = 128 * 1024
+# budgets in bytes per hashed body byte
+BUDGETS = {
+    'bytes': 2,
+    'ascii': 3,
+    # up to 4 bytes per character in memory, and as many in UTF-8
+    'unicode': 9,
+    'bytesio': 2,
+    'file': 2,
+    'multipart': 4,
+    'stream': 3,
+}
+UNICODE = 'aé日😀'
+# the length of in-memory files and streams cannot be determined
+NO_LENGTH = {'bytesio': OSError, 'stream': TypeError}
+
+
+def traced_peak(func, *args):
+    """Returns the peak of memory allocated by func above what was allocated before"""
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        func(*args)
+        return tracemalloc.get_traced_memory()[1] - before
+    finally:
+        if started:
+            tracemalloc.stop()
+
+
+@pytest.fixture(scope='module')
+def content_files(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('memory')
+    for size in SIZES:
+        (directory / str(size)).write_bytes(b'x' * size)
+    return directory
+
+
+@pytest.fixture
+def make_body(content_files):
+    files = []
+
+    def open_file(size):
+        f = open(content_files / str(size), 'rb')  # pylint: disable=consider-using-with
+        files.append(f)
+        return f
+
+    factories = {
+        'bytes': lambda size: b'x' * size,
+        'ascii': lambda size: 'x' * size,
+        'unicode': lambda size: (UNICODE * (size // len(UNICODE) + 1))[:size],
+        'bytesio': lambda size: io.BytesIO(b'x' * size),
+        'stream': lambda size: (b'x' * 8192 for _ in range(size // 8192 + 1)),
+        'file': open_file,
+        'multipart': lambda size: requests_toolbelt.MultipartEncoder(
+            {'name': 'archive', 'file': ('archive.zip', open_file(size))}, boundary='boundary'),
+    }
+    yield lambda body_type, size: factories[body_type](size)
+    for f in files:
+        f.close()
+
+
+def assert_within_budget(peak, body_type):
+    budget = BUDGETS[body_type] * MAX_BODY + OVERHEAD
+    assert peak <= budget, f'{body_type} body: {peak} bytes allocated, budget {budget}'
+
+
+@pytest.mark.parametrize('size', SIZES)
+@pytest.mark.parametrize('body_type', sorted(BUDGETS))
+def test_read_body_content(make_body, body_type, size):
+    body = make_body(body_type, size)
+    if body_type == 'stream':
+        body = StreamingBody(body, MAX_BODY)
+    assert_within_budget(traced_peak(read_body_content, body, MAX_BODY), body_type)
+
+
+@pytest.mark.parametrize('size', SIZES)
+@pytest.mark.parametrize('body_type', sorted(BUDGETS))
+def test_determine_body_len(make_body, body_type, size):
+    body = make_body(body_type, size)
+    if body_type in NO_LENGTH:
+        with pytest.raises(NO_LENGTH[body_type]):
+            determine_body_len(body)
+        return
+    # no copy of the body is needed to measure it
+    assert traced_peak(determine_body_len, body) <= LENGTH_BUDGET
+    if isinstance(body, str):
+        assert determine_body_len(body) == len(body.encode('utf8'))
+    if body_type in ('bytes', 'ascii', 'file'):
+        assert determine_body_len(body) == size
+
+
+@pytest.mark.parametrize('engine', ['optimized', 'reference'])
+@pytest.mark.parametrize('size', SIZES)
+@pytest.mark.parametrize('body_type', sorted(BUDGETS))
+def test_signing(make_body, body_type, size, engine):
+    auth = EdgeGridAuth('akab-client-token', 'c2VjcmV0', 'akab-access-token',
+                        max_body=MAX_BODY, engine=engine)
+    request = requests.Request('POST', 'https://example.com/papi/v1/properties',
+                               data=make_body(body_type, size)).prepare()
+    assert_within_budget(traced_peak(auth, request), body_type)
+
+
+def test_budgets_catch_copies_of_the_body():
+    # a regression copying the whole body exceeds the budget
+    body = 'x' * (64 * MAX_BODY)
+    with pytest.raises(AssertionError, match='ascii body'):
+        assert_within_budget(traced_peak(lambda: body.encode('utf8')), 'ascii')
@@ -0,0 +1,171 @@
+# pylint: disable=missing-function-docstring
+"""unit tests for EdgeGrid traffic metrics"""
+
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+
+import pytest
+import requests
+
+from akamai.edgegrid import ClockSkew, EdgeGridSession
+from akamai.edgegrid.metrics import EdgeGridMetrics, MetricsRegistry, default_endpoint
+
+
+@pytest.mark.parametrize('path, endpoint', [
+    ('/papi/v1/properties', '/papi/v1/properties'),
+    ('/papi/v1/properties/prp_123/versions/4?contractId=ctr_1',
+     '/papi/v1/properties/{id}/versions/{id}'),
+    ('/identity-management/v3/api-clients/self', '/identity-management/v3/api-clients/self'),
+    ('/', '/'),
+])
+def test_default_endpoint(path, endpoint):
+    assert default_endpoint(path) == endpoint
+
+
+class TestMetricsRegistry:
+    """Test MetricsRegistry"""
+
+    def test_render_counter_and_gauge(self):
+        registry = MetricsRegistry()
+        registry.register('requests_total', 'counter', 'Requests', ('host', 'path'))
+        registry.register('in_use', 'gauge', 'In use')
+        registry.inc('requests_total', ('a.example', '/"x"\\\n'))
+        registry.inc('requests_total', ('a.example', '/"x"\\\n'), 2)
+        registry.set('in_use', (), 0.5)
+
+        assert registry.render() == (
+            '# HELP requests_total Requests\n'
+            '# TYPE requests_total counter\n'
+            'requests_total{host="a.example",path="/\\"x\\"\\\\\\n"} 3\n'
+            '# HELP in_use In use\n'
+            '# TYPE in_use gauge\n'
+            'in_use 0.5\n')
+
+    def test_render_histogram(self):
+        registry = MetricsRegistry()
+        registry.register('duration_seconds', 'histogram', 'Duration', ('host',),
+                          buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            registry.observe('duration_seconds', ('a',), value)
+
+        assert registry.get('duration_seconds', ('a',)) == [2, 1, 1, 2.65]
+        assert registry.render().splitlines()[2:] == [
+            'duration_seconds_bucket{host="a",le="0.1"} 2',
+            'duration_seconds_bucket{host="a",le="1.0"} 3',
+            'duration_seconds_bucket{host="a",le="+Inf"} 4',
+            'duration_seconds_sum{host="a"} 2.65',
+            'duration_seconds_count{host="a"} 4',
+        ]
+
+
+def host_of(server):
+    return server.url.split('//')[1]
+
+
+def test_session_metrics(local_server, edgegrid_auth):
+    def respond(received):
+        if received.path.startswith('/ccu'):
+            return 429, {}, b'{"title": "Too Many Requests"}'
+        if received.path.endswith('/self'):
+            return 401, {}, b'{}'
+        return 200, {}, b'{"items": []}'
+
+    local_server.responder = respond
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url, metrics=True)
+    session.get('/papi/v1/properties/prp_1')
+    session.get('/papi/v1/properties/prp_2')
+    session.post('/ccu/v3/invalidate/url', json={'objects': ['/a']})
+    session.get('/identity-management/v3/api-clients/self')
+
+    registry, host = session.metrics.registry, host_of(local_server)
+    properties = (host, '/papi/v1/properties/{id}', 'GET')
+    assert registry.get('edgegrid_requests_total', properties + ('2xx',)) == 2
+    assert registry.get('edgegrid_requests_total',
+                        (host, '/ccu/v3/invalidate/url', 'POST', '4xx')) == 1
+    assert registry.get('edgegrid_rejections_total',
+                        (host, '/ccu/v3/invalidate/url', 'POST', '429')) == 1
+    assert registry.get('edgegrid_rejections_total',
+                        (host, '/identity-management/v3/api-clients/self', 'GET', '401')) == 1
+    assert registry.get('edgegrid_request_duration_seconds', properties)[-2] == 0  # none slow
+    assert sum(registry.get('edgegrid_request_duration_seconds', properties)[:-1]) == 2
+    assert registry.get('edgegrid_request_bytes_total', (host,)) == len(b'{"objects": ["/a"]}')
+    assert registry.get('edgegrid_response_bytes_total', (host,)) == 2 * 13 + 30 + 2
+    assert sum(registry.get('edgegrid_signing_duration_seconds', (host,))[:-1]) == 4
+
+    text = session.metrics.render()
+    assert f'edgegrid_pool_connections_in_use{{host="{host}"}} 0\n' in text
+    assert f'edgegrid_requests_total{{host="{host}",endpoint="/papi/v1/properties/{{id}}",' \
+           f'method="GET",status_class="2xx"}} 2\n' in text
+
+
+def test_redirects_are_recorded_once(local_server, edgegrid_auth):
+    local_server.responder = lambda received: (
+        (302, {'Location': '/papi/v1/groups'}, b'') if received.path == '/papi/v1/old'
+        else (200, {}, b'{}'))
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url, metrics=True)
+    assert session.get('/papi/v1/old').status_code == 200
+
+    registry, host = session.metrics.registry, host_of(local_server)
+    assert registry.get('edgegrid_requests_total', (host, '/papi/v1/old', 'GET', '3xx')) == 1
+    assert registry.get('edgegrid_requests_total', (host, '/papi/v1/groups', 'GET', '2xx')) == 1
+    assert len(session.metrics.registry.render().split('edgegrid_requests_total{')) == 3
+
+
+def test_clock_skew_rejections_are_recorded(local_server, make_auth):
+    def respond(_):
+        headers = {'Date': formatdate(time.time() + 300, usegmt=True)}
+        if len(local_server.received) == 1:
+            return 401, headers, b'{"title": "Unauthorized", "detail": "Invalid timestamp"}'
+        return 200, headers, b'{}'
+
+    local_server.responder = respond
+    session = EdgeGridSession(make_auth(clock_skew=ClockSkew()), base_url=local_server.url,
+                              metrics=True)
+    assert session.get('/papi/v1/groups').status_code == 200
+
+    registry, host = session.metrics.registry, host_of(local_server)
+    assert registry.get('edgegrid_rejections_total', (host, '/papi/v1/groups', 'GET', '401')) == 1
+    assert registry.get('edgegrid_requests_total', (host, '/papi/v1/groups', 'GET', '4xx')) == 1
+    assert registry.get('edgegrid_requests_total', (host, '/papi/v1/groups', 'GET', '2xx')) == 1
+
+
+def test_connection_errors(edgegrid_auth):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        base_url = f'http://127.0.0.1:{sock.getsockname()[1]}'
+    session = EdgeGridSession(edgegrid_auth, base_url=base_url, metrics=True)
+
+    with pytest.raises(requests.ConnectionError):
+        session.get('/papi/v1/groups')
+    assert session.metrics.registry.get(
+        'edgegrid_request_errors_total',
+        (base_url.split('//')[1], '/papi/v1/groups', 'GET', 'ConnectionError')) == 1
+
+
+def test_pool_saturation(local_server, edgegrid_auth):
+    release = threading.Event()
+    local_server.responder = lambda _: (release.wait(5), (200, {}, b'{}'))[1]
+    metrics = EdgeGridMetrics()
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url, metrics=metrics)
+    other = EdgeGridSession(edgegrid_auth, base_url=local_server.url, metrics=metrics)
+    host = host_of(local_server)
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [pool.submit(session.get, '/papi/v1/groups') for _ in range(2)]
+        futures.append(pool.submit(other.get, '/papi/v1/groups'))
+        while len(local_server.received) < 3:
+            release.wait(0.001)
+        metrics.render()
+        in_use = metrics.registry.get('edgegrid_pool_connections_in_use', (host,))
+        saturation = metrics.registry.get('edgegrid_pool_saturation', (host,))
+        release.set()
+    assert [f.result().status_code for f in futures] == [200] * 3
+
+    # summed over the pools of both sessions, of 10 connections each
+    assert in_use == 3
+    assert saturation == 3 / 20
+    metrics.render()
+    assert metrics.registry.get('edgegrid_pool_connections_in_use', (host,)) == 0
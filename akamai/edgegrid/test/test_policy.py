@@ -0,0 +1,159 @@
+# pylint: disable=missing-function-docstring
+"""unit tests for per-endpoint signing policies"""
+
+import os
+
+import pytest
+import requests
+
+from akamai.edgegrid import EdgeGridAuth, EdgeGridSession, EdgeRc
+from akamai.edgegrid.policy import SigningPolicy, SigningPolicyTable, parse_policy
+from akamai.edgegrid.test.conftest import test_dir, verify_signature
+
+HOST = 'akab-xxx.luna.akamaiapis.net'
+
+
+class TestParsePolicy:
+    """Test parse_policy"""
+
+    def test_path_and_settings(self):
+        assert parse_policy('/ccu/v3 max_body=50000') == \
+            SigningPolicy('*', '/ccu/v3', None, 50000)
+        assert parse_policy(f'{HOST.upper()}/papi/v1/ headers-to-sign=X-A,X-B') == \
+            SigningPolicy(HOST, '/papi/v1/', ['X-A', 'X-B'], None)
+        assert parse_policy('/ headers_to_sign=') == SigningPolicy('*', '/', [], None)
+
+    @pytest.mark.parametrize('line', [
+        'ccu max_body=1',
+        '/ccu max_body',
+        '/ccu max_body=x',
+        '/ccu max_body=1 max_body=2',
+        '/ccu hash_body=1',
+    ])
+    def test_invalid(self, line):
+        with pytest.raises(ValueError):
+            parse_policy(line)
+
+
+class TestSigningPolicyTable:
+    """Test SigningPolicyTable"""
+
+    table = SigningPolicyTable.parse(f'''
+        # comment
+        / max_body=1000
+        /papi/v1 max_body=2000
+        /papi/v1/properties headers_to_sign=X-A
+        {HOST}/papi max_body=3000
+        {HOST}/ccu/ max_body=4000
+    ''')
+
+    @pytest.mark.parametrize('host, path, max_body', [
+        ('other', '/papi/v1/groups', 2000),
+        ('other', '/papi/v1', 2000),
+        ('other', '/papi/v1/', 2000),
+        # prefixes match whole segments only
+        ('other', '/papi/v10/groups', 1000),
+        ('other', '/identity-management/v3', 1000),
+        ('other', '', 1000),
+        # a policy for the host wins over a longer one for any host
+        (HOST, '/papi/v1/groups', 3000),
+        (HOST.upper(), '/ccu/v3/invalidate/url', 4000),
+        (HOST, '/identity-management/v3', 1000),
+    ])
+    def test_resolve(self, host, path, max_body):
+        assert self.table.resolve(host, path).max_body == max_body
+
+    def test_resolve_normalizes_policies(self):
+        policy = self.table.resolve('other', '/papi/v1/properties/prp_1')
+        assert policy == SigningPolicy('*', '/papi/v1/properties', ('x-a',), None)
+        assert len(self.table) == 5
+        assert SigningPolicyTable().resolve(HOST, '/') is None
+
+    def test_from_edgerc(self, tmp_path):
+        edgerc = EdgeRc(os.path.join(test_dir, 'sample_edgerc'))
+        assert SigningPolicyTable.from_edgerc(edgerc, 'default') is None
+        table = SigningPolicyTable.from_edgerc(edgerc, 'policies')
+        host = 'xxxx-xxxxxxxxxxxxxxxx-xxxxxxxxxxxxxxxx.luna.akamaiapis.net'
+        assert table.resolve('other', '/ccu/v3/delete').max_body == 50000
+        assert table.resolve(host, '/papi/v1/groups') == \
+            SigningPolicy(host, '/papi/v1', ('x-mything1',), 8192)
+
+        (tmp_path / 'policies').write_text('/ccu/v3 max_body=1\n/papi/v0 max_body=2\n')
+        edgerc.set('policies', 'signing_policies_file', str(tmp_path / 'policies'))
+        table = SigningPolicyTable.from_edgerc(edgerc, 'policies')
+        # policies of the file come last and win
+        assert table.resolve('other', '/ccu/v3/delete').max_body == 1
+        assert table.resolve('other', '/papi/v0').max_body == 2
+
+
+def test_auth_from_edgerc_with_policies():
+    auth = EdgeGridAuth.from_edgerc(os.path.join(test_dir, 'sample_edgerc'), 'policies')
+    base_url = 'https://xxxx-xxxxxxxxxxxxxxxx-xxxxxxxxxxxxxxxx.luna.akamaiapis.net'
+    assert auth.engine_for(base_url + '/identity-management/v3') is auth.ah
+    ccu = auth.engine_for(base_url + '/ccu/v3/invalidate/url')
+    assert (ccu.max_body, ccu.headers_to_sign) == (50000, auth.ah.headers_to_sign)
+    papi = auth.engine_for(base_url + '/papi/v1/groups?contractId=1')
+    assert (papi.max_body, papi.headers_to_sign) == (8192, ['x-mything1'])
+    # engines are created once per policy
+    assert auth.engine_for(base_url + '/papi/v1/properties') is papi
+    assert auth.engine_for('https://other/papi/v1', {'Host': base_url[8:]}) is papi
+
+
+def test_requests_are_signed_with_their_policy(local_server, testdata, make_auth):
+    policies = SigningPolicyTable.parse('''
+        /ccu max_body=16
+        /papi headers_to_sign=X-Papi
+    ''')
+    auth = make_auth(max_body=64, headers_to_sign=['X-Default'], policies=policies)
+    session = EdgeGridSession(auth, base_url=local_server.url)
+    body = b'x' * 100
+    headers = {'X-Papi': 'papi', 'X-Default': 'default'}
+    for path in ('/ccu/v3/invalidate', '/papi/v1/properties', '/other'):
+        session.post(path, data=body, headers=headers)
+
+    ccu, papi, other = local_server.received
+    secret = testdata['client_secret']
+    assert verify_signature(ccu, secret, 16, ['X-Default'])
+    assert not verify_signature(ccu, secret, 64, ['X-Default'])
+    assert verify_signature(papi, secret, 64, ['X-Papi'])
+    assert not verify_signature(papi, secret, 64, ['X-Default'])
+    assert verify_signature(other, secret, 64, ['X-Default'])
+
+    # streamed bodies are buffered up to the max_body of their policy
+    session.post('/ccu/v3/invalidate', data=iter([body[:10], body[10:]]))
+    assert verify_signature(local_server.received[-1], secret, 16, ['X-Default'])
+
+    template = session.compile('POST', '/ccu/v3/invalidate', data=body)
+    session.send(template.prepare())
+    assert verify_signature(local_server.received[-1], secret, 16, ['X-Default'])
+
+
+def test_streamed_bodies_are_signed_again_with_another_policy(local_server, testdata,
+                                                            make_auth):
+    local_server.responder = lambda received: (
+        (307, {'Location': '/papi/v1/properties'}, b'') if received.path == '/ccu/v3/old'
+        else (200, {}, b'{}'))
+    auth = make_auth(max_body=64, policies=SigningPolicyTable.parse('/ccu max_body=16'))
+    session = EdgeGridSession(auth, base_url=local_server.url)
+    body = b'x' * 100
+
+    # a redirect to a path of another policy
+    res = session.post('/ccu/v3/old', data=iter([body[:10], body[10:]]))
+    assert res.status_code == 200
+    assert [r.status_code for r in res.history] == [307]
+
+    # a request signed again for another path before it is sent
+    request = session.prepare_request(requests.Request(
+        'POST', local_server.url + '/ccu/v3/invalidate', data=iter([body[:10], body[10:]])))
+    request.url = local_server.url + '/papi/v1/properties'
+    session.send(auth.resign(request))
+    assert verify_signature(local_server.received[-1], testdata['client_secret'], 64)
+
+
+def test_batches_fit_the_policy_of_their_url(make_auth):
+    auth = make_auth(max_body=131072, policies=SigningPolicyTable.parse('/ccu max_body=10000'))
+    session = EdgeGridSession(auth, base_url=f'https://{HOST}')
+    with session.batch('/ccu/v3/invalidate/url/production') as purges:
+        assert purges.max_bytes == 10000
+    with session.batch('/papi/v1/properties') as other:
+        assert other.max_bytes == 50000
@@ -0,0 +1,62 @@
+# pylint: disable=missing-function-docstring
+"""unit tests for EdgeGridSession"""
+
+import os
+import unittest.mock
+
+import pytest
+import requests
+
+from akamai.edgegrid import EdgeGridSession
+from akamai.edgegrid.test.conftest import test_dir, verify_signature
+
+
+def test_from_edgerc():
+    session = EdgeGridSession.from_edgerc(os.path.join(test_dir, 'sample_edgerc'), 'headers')
+    assert session.base_url == 'https://xxxx-xxxxxxxxxxxxxxxx-xxxxxxxxxxxxxxxx.luna.akamaiapis.net'
+    assert session.section == 'headers'
+    assert session.auth.ah.headers_to_sign == ['x-mything1', 'x-mything2']
+
+
+def test_relative_urls_are_resolved_against_base_url(local_server, edgegrid_auth, testdata):
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url)
+    assert session.get('/papi/v1/groups', params={'a': 1}).status_code == 200
+    assert local_server.received[0].path == '/papi/v1/groups?a=1'
+    assert verify_signature(local_server.received[0], testdata['client_secret'],
+                            testdata['max_body'])
+
+
+class TestRequestTemplate:
+    """Test RequestTemplate"""
+    def test_rejects_streaming_body(self, edgegrid_auth, testdata):
+        req = requests.Request('POST', testdata['base_url'], data=iter([b'foo'])).prepare()
+        with pytest.raises(TypeError):
+            edgegrid_auth.compile(req)
+
+    def test_prepare_does_not_accumulate_hooks(self, edgegrid_auth, testdata):
+        template = edgegrid_auth.compile(requests.Request('GET', testdata['base_url']).prepare())
+        for _ in range(3):
+            prepared = template.prepare()
+        assert prepared.hooks['response'] == [edgegrid_auth.handle_redirect]
+        assert template.request.hooks['response'] == []
+
+    def test_reuses_signing_key_within_a_second(self, edgegrid_auth, testdata):
+        template = edgegrid_auth.compile(requests.Request('GET', testdata['base_url']).prepare())
+        with unittest.mock.patch.object(edgegrid_auth.ah, 'make_signing_key',
+                                        wraps=edgegrid_auth.ah.make_signing_key) as key:
+            template.make_auth_header(testdata['timestamp'], 'nonce1')
+            template.make_auth_header(testdata['timestamp'], 'nonce2')
+        assert key.call_count == 1
+
+    def test_send_template(self, local_server, edgegrid_auth, testdata):
+        session = EdgeGridSession(edgegrid_auth, base_url=local_server.url)
+        template = session.compile('GET', '/ccu/v3/queues/default',
+                                   headers={'Accept': 'application/json'})
+        for _ in range(2):
+            assert session.send_template(template).status_code == 200
+
+        first, second = local_server.received
+        assert first.headers['Authorization'] != second.headers['Authorization']
+        for received in (first, second):
+            assert received.path == '/ccu/v3/queues/default'
+            assert verify_signature(received, testdata['client_secret'], testdata['max_body'])
@@ -0,0 +1,205 @@
+# pylint: disable=missing-function-docstring
+"""Differential and property-based tests of the signing engines: randomly generated requests
+must be signed identically by the reference and the optimized engine"""
+
+import functools
+import io
+import logging
+import random
+
+import pytest
+import requests
+
+from akamai.edgegrid import EdgeGridSession, StreamingBody
+from akamai.edgegrid.edgegrid import (DifferentialAuthHeaders, EdgeGridAuthHeaders,
+                                      OptimizedAuthHeaders)
+from akamai.edgegrid.test.conftest import verify_signature
+
+BASE_URL = 'https://akaa-baseurl-xxxxxxxxxxx-xxxxxxxxxxxxx.luna.akamaiapis.net'
+METHODS = ['GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'HEAD', 'OPTIONS']
+ALPHABET = 'abcXYZ019-._~!$&\'()*+,;=:@%/?é日本語✓\U0001f600 '
+WHITESPACE = [' ', '  ', '\t', ' \t ', '\t\t']
+HEADERS = ['X-Test1', 'X-Test2', 'X-Test3', 'User-Agent', 'Content-Type']
+TIMESTAMPS = ['20140321T19:34:21+0000', '20140321T19:34:22+0000', '20260101T00:00:00+0000']
+CASES_PER_SEED = 50
+
+
+def random_text(rng, max_len, alphabet=ALPHABET):
+    return ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, max_len)))
+
+
+def random_header_value(rng):
+    words = [random_text(rng, 8, 'abcXYZ019-"é') or 'x' for _ in range(rng.randint(1, 4))]
+    value = words[0]
+    for word in words[1:]:
+        value += rng.choice(WHITESPACE) + word
+    return value + rng.choice(['', ' ', '\t', '  \t'])
+
+
+def random_headers(rng):
+    headers = {}
+    for name in rng.sample(HEADERS, rng.randint(0, len(HEADERS))):
+        headers[rng.choice([name, name.lower(), name.upper()])] = random_header_value(rng)
+    if rng.random() < 0.2:
+        headers['Host'] = rng.choice(['example.com', 'example.com:8443'])
+    return headers
+
+
+def random_params(rng):
+    params = [(random_text(rng, 6) or 'k', random_text(rng, 10)) for _ in range(rng.randint(0, 4))]
+    if params and rng.random() < 0.3:
+        # repeated parameter names
+        params.append((params[0][0], random_text(rng, 10)))
+    return params
+
+
+def random_body(rng, max_body):
+    size = rng.choice([0, 1, max_body - 1, max_body, max_body + 1, rng.randint(0, 3 * max_body)])
+    content = rng.randbytes(size)
+    cuts = sorted(rng.randint(0, size) for _ in range(rng.randint(0, 5)))
+    bounds = [0] + cuts + [size]
+    return rng.choice([
+        {},
+        {'data': content},
+        {'data': random_text(rng, size)},
+        {'data': io.BytesIO(content)},
+        {'data': (content[a:b] for a, b in zip(bounds, bounds[1:]))},
+        {'data': dict(random_params(rng))},
+        {'json': {random_text(rng, 6): random_text(rng, size % 64)}},
+    ])
+
+
+def random_request(rng, max_body):
+    path = '/' + random_text(rng, 30).replace('?', '').replace('#', '')
+    if rng.random() < 0.1:
+        path += '#' + random_text(rng, 5, 'abc')
+    request = requests.Request(rng.choice(METHODS), BASE_URL + path,
+                               headers=random_headers(rng), params=random_params(rng),
+                               **random_body(rng, max_body))
+    try:
+        prepared = request.prepare()
+    except (ValueError, UnicodeError):
+        # e.g. a value requests rejects as header content
+        return None
+    if prepared.method == 'POST' and not isinstance(prepared.body, (bytes, str, type(None))) \
+            and not hasattr(prepared.body, 'seek'):
+        prepared.body = StreamingBody(prepared.body, max_body)
+    return prepared
+
+
+@pytest.mark.parametrize('seed', range(12))
+def test_engines_sign_identically(seed, caplog):
+    rng = random.Random(seed)
+    if seed % 4 == 3:
+        # the optimized engine takes the reference code paths when logging debug output
+        caplog.set_level(logging.DEBUG, logger='akamai.edgegrid.edgegrid')
+    max_body = rng.choice([1, 7, 64, 2048, 131072])
+    kwargs = {'headers_to_sign': rng.sample(HEADERS, rng.randint(0, len(HEADERS))),
+              'max_body': max_body}
+    reference = EdgeGridAuthHeaders('akab-client-token', 'c2VjcmV0', 'akab-access-token', **kwargs)
+    optimized = OptimizedAuthHeaders('akab-client-token', 'c2VjcmV0', 'akab-access-token', **kwargs)
+
+    for case in range(CASES_PER_SEED):
+        request = random_request(rng, max_body)
+        if request is None:
+            continue
+        timestamp = rng.choice(TIMESTAMPS)
+        nonce = f'nonce-{seed}-{case}'
+        context = f'seed {seed} case {case}: {request.method} {request.url} {request.headers}'
+        assert optimized.make_data_to_sign(request.copy(), '') == \
+            reference.make_data_to_sign(request.copy(), ''), context
+        assert optimized.make_auth_header(request.copy(), timestamp, nonce) == \
+            reference.make_auth_header(request.copy(), timestamp, nonce), context
+        assert optimized.make_signing_key(timestamp) == reference.make_signing_key(timestamp)
+
+
+@pytest.mark.parametrize('size, position, max_body', [
+    (0, 0, 2048),
+    (100, 0, 2048),
+    (100000, 0, 2048),
+    (100000, 70000, 2048),
+    (100000, 99999, 131072),
+    (100000, 100000, 1),
+    (100000, 200000, 1),
+])
+def test_file_bodies_hash_identically(tmp_path, size, position, max_body):
+    # the optimized engine hashes regular files from a memory map
+    content = random.Random(size).randbytes(size)
+    (tmp_path / 'body').write_bytes(content)
+    reference = EdgeGridAuthHeaders('akab-client-token', 'c2VjcmV0', 'akab-access-token',
+                                    max_body=max_body)
+    optimized = OptimizedAuthHeaders('akab-client-token', 'c2VjcmV0', 'akab-access-token',
+                                     max_body=max_body)
+    for mode in ('rb', 'r+b'):
+        with open(tmp_path / 'body', mode) as f:
+            f.seek(position)
+            expected = reference.make_content_hash(f, 'POST')
+            assert f.tell() == 0
+            f.seek(position)
+            assert optimized.make_content_hash(f, 'POST') == expected
+            assert f.tell() == 0
+
+
+def test_engine_selection(make_auth):
+    assert isinstance(make_auth().ah, OptimizedAuthHeaders)
+    reference = make_auth(engine='reference').ah
+    assert isinstance(reference, EdgeGridAuthHeaders)
+    assert not isinstance(reference, OptimizedAuthHeaders)
+    assert isinstance(make_auth(engine='differential').ah, DifferentialAuthHeaders)
+    with pytest.raises(ValueError, match='unknown signing engine: fastest'):
+        make_auth(engine='fastest')
+
+
+class BrokenAuthHeaders(OptimizedAuthHeaders):
+    """An engine which forgets to hash the body"""
+    def make_content_hash(self, body, method):
+        return ''
+
+
+def test_differential_reports_mismatch(testdata, make_auth, caplog):
+    mismatches = []
+    auth = make_auth(
+        engine=functools.partial(DifferentialAuthHeaders, candidate=BrokenAuthHeaders,
+                                 on_mismatch=lambda *args: mismatches.append(args)))
+    request = requests.Request('POST', BASE_URL + '/ccu/v3/invalidate/url', data=b'{}').prepare()
+    reference = EdgeGridAuthHeaders(
+        testdata['client_token'], testdata['client_secret'], testdata['access_token'])
+
+    header = auth.ah.make_auth_header(request, testdata['timestamp'], testdata['nonce'])
+
+    assert header == reference.make_auth_header(request, testdata['timestamp'], testdata['nonce'])
+    assert auth.ah.mismatches == 1
+    method, mismatched_request, expected, actual = mismatches[0]
+    assert (method, mismatched_request, expected) == ('make_auth_header', request, header)
+    assert actual != header
+    assert 'signing engine mismatch in make_auth_header for POST' in caplog.text
+
+    # requests without a body are signed identically
+    auth.ah.make_auth_header(requests.Request('GET', BASE_URL).prepare(),
+                             testdata['timestamp'], testdata['nonce'])
+    assert auth.ah.mismatches == 1
+
+
+def test_differential_with_cli_user_agent(make_auth, monkeypatch):
+    monkeypatch.setenv('AKAMAI_CLI', 'yes')
+    monkeypatch.setenv('AKAMAI_CLI_VERSION', '1.0')
+    auth = make_auth(headers_to_sign=['User-Agent'], engine='differential')
+    request = requests.Request('GET', BASE_URL, headers={'User-Agent': 'test'}).prepare()
+
+    auth(request)
+
+    assert auth.ah.mismatches == 0
+    assert request.headers['User-Agent'] == 'test AkamaiCLI/1.0'
+
+
+def test_differential_session(local_server, testdata, make_auth):
+    auth = make_auth(engine='differential')
+    session = EdgeGridSession(auth, base_url=local_server.url)
+
+    session.post('/ccu/v3/invalidate/url', data=(b'x' * 1000 for _ in range(3)))
+    template = session.compile('GET', '/ccu/v3/queues/default')
+    session.send_template(template)
+
+    assert auth.ah.mismatches == 0
+    for received in local_server.received:
+        assert verify_signature(received, testdata['client_secret'], testdata['max_body'])
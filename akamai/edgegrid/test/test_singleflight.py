@@ -0,0 +1,155 @@
+# pylint: disable=missing-function-docstring,redefined-outer-name
+"""unit tests for single-flight request coalescing"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from akamai.edgegrid import EdgeGridAuth, EdgeGridSession
+from akamai.edgegrid.singleflight import SingleFlight
+
+WAITERS = 8
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.001)
+
+
+def run_concurrently(fn, ready, release, count=WAITERS):
+    """Calls fn from count threads, and sets release once ready() is true"""
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        futures = [pool.submit(fn) for _ in range(count)]
+        wait_for(ready)
+        release.set()
+    return futures
+
+
+class TestSingleFlight:
+    """Test SingleFlight"""
+
+    def test_concurrent_calls_share_one_result(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def call():
+            calls.append(1)
+            release.wait(5)
+            return 'result'
+
+        futures = run_concurrently(lambda: flight.do('key', call),
+                                   lambda: flight.coalesced == WAITERS - 1, release)
+
+        results = [f.result() for f in futures]
+        assert len(calls) == 1
+        assert sorted(shared for _, shared in results) == [False] + [True] * (WAITERS - 1)
+        assert {result for result, _ in results} == {'result'}
+
+    def test_exception_is_shared(self):
+        flight = SingleFlight()
+        release = threading.Event()
+
+        def call():
+            release.wait(5)
+            raise OSError('boom')
+
+        futures = run_concurrently(lambda: flight.do('key', call),
+                                   lambda: flight.coalesced == WAITERS - 1, release)
+
+        for future in futures:
+            with pytest.raises(OSError, match='boom'):
+                future.result()
+
+    def test_calls_after_completion_run_again(self):
+        flight = SingleFlight()
+        assert flight.do('key', lambda: 1) == (1, False)
+        assert flight.do('key', lambda: 2) == (2, False)
+        assert flight.coalesced == 0
+
+    def test_nested_call_with_same_key_runs(self):
+        flight = SingleFlight()
+        assert flight.do('key', lambda: flight.do('key', lambda: 'inner')) == \
+            (('inner', False), False)
+
+
+@pytest.fixture
+def blocking_server(local_server):
+    release = threading.Event()
+
+    def respond(received):
+        release.wait(5)
+        return 200, {'Content-Type': 'application/json'}, \
+            f'{{"path": "{received.path}"}}'.encode()
+
+    local_server.responder = respond
+    local_server.release = release
+    return local_server
+
+
+def coalescing_session(server, testdata):
+    auth = EdgeGridAuth(testdata['client_token'], testdata['client_secret'],
+                        testdata['access_token'], headers_to_sign=['X-Test1'])
+    return EdgeGridSession(auth, base_url=server.url, section='default', coalesce=True)
+
+
+def test_identical_gets_are_sent_once(blocking_server, testdata):
+    session = coalescing_session(blocking_server, testdata)
+
+    futures = run_concurrently(lambda: session.get('/papi/v1/properties?contractId=1'),
+                               lambda: session.single_flight.coalesced == WAITERS - 1,
+                               blocking_server.release)
+
+    responses = [f.result() for f in futures]
+    assert len(blocking_server.received) == 1
+    assert len({id(r) for r in responses}) == WAITERS
+    for res in responses:
+        assert res.status_code == 200
+        assert res.json() == {'path': '/papi/v1/properties?contractId=1'}
+        assert res.headers['Content-Type'] == 'application/json'
+    assert len({id(r.request) for r in responses}) == WAITERS
+
+
+@pytest.mark.parametrize('vary', [
+    {'params': {'contractId': '2'}},
+    {'headers': {'X-Test1': 'other'}},
+    # unsigned headers changing the response
+    {'headers': {'X-Test1': 'one', 'Range': 'bytes=10-19'}},
+    {'headers': {'X-Test1': 'one', 'Accept': 'text/csv'}},
+    {'headers': {'X-Test1': 'one', 'If-None-Match': '"1"'}},
+    {'method': 'POST', 'data': b'{}'},
+    # send() settings changing the response
+    {'allow_redirects': False},
+    {'verify': False},
+    {'proxies': {'https': 'http://127.0.0.1:9'}},
+    # hooks which would not run on a shared response
+    {'hooks': {'response': [lambda res, **kwargs: None]}},
+    {'stream': True},
+])
+def test_different_requests_are_not_coalesced(blocking_server, testdata, vary):
+    session = coalescing_session(blocking_server, testdata)
+    kwargs = {'method': 'GET', 'url': '/papi/v1/properties', 'params': {'contractId': '1'},
+              'headers': {'X-Test1': 'one'}}
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        first = pool.submit(session.request, **kwargs)
+        wait_for(lambda: len(blocking_server.received) == 1)
+        second = pool.submit(session.request, **{**kwargs, **vary})
+        wait_for(lambda: len(blocking_server.received) == 2)
+        blocking_server.release.set()
+        assert first.result().status_code == second.result().status_code == 200
+    assert session.single_flight.coalesced == 0
+
+
+def test_coalescing_is_opt_in(blocking_server, edgegrid_auth):
+    session = EdgeGridSession(edgegrid_auth, base_url=blocking_server.url)
+    assert session.single_flight is None
+
+    futures = run_concurrently(lambda: session.get('/papi/v1/properties'),
+                               lambda: len(blocking_server.received) == 2,
+                               blocking_server.release, count=2)
+    assert [f.result().status_code for f in futures] == [200, 200]
@@ -0,0 +1,113 @@
+# pylint: disable=missing-function-docstring
+"""unit tests for tracing"""
+
+import ssl
+
+import pytest
+import requests
+
+from akamai.edgegrid import EdgeGridSession
+from akamai.edgegrid.test.conftest import test_dir
+from akamai.edgegrid.tracing import OpenTelemetryTracer, RecordingTracer
+
+
+def test_spans_for_signed_request(local_server, edgegrid_auth, testdata):
+    tracer = RecordingTracer()
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url, section='default',
+                              tracer=tracer)
+    session.post('/ccu/v3/invalidate/url', data=b'x' * (testdata['max_body'] + 1))
+
+    prepare, = tracer.find('edgegrid.prepare')
+    sign, = tracer.find('edgegrid.sign')
+    send, = tracer.find('edgegrid.send')
+
+    assert sign.parent is prepare
+    assert sign.attributes == {
+        'http.request.method': 'POST',
+        'server.address': '127.0.0.1',
+        'edgegrid.body.hashed_bytes': testdata['max_body'],
+        'edgegrid.body.truncated': True,
+    }
+    assert prepare.attributes['edgegrid.section'] == 'default'
+    assert send.attributes['http.response.status_code'] == 200
+    assert send.attributes['edgegrid.retry_count'] == 0
+    assert send.events[0][0] == 'response'
+    assert all(span.duration >= 0 for span in tracer.spans)
+
+
+def test_auth_handler_is_not_changed(local_server, edgegrid_auth):
+    tracer = RecordingTracer()
+    traced = EdgeGridSession(edgegrid_auth, base_url=local_server.url, tracer=tracer)
+    untraced = EdgeGridSession(edgegrid_auth, base_url=local_server.url)
+    traced.get('/papi/v1/groups')
+    untraced.get('/papi/v1/groups')
+
+    assert edgegrid_auth.tracer is None
+    assert len(tracer.find('edgegrid.sign')) == len(tracer.find('edgegrid.send')) == 1
+
+
+def test_connection_timings(local_server, edgegrid_auth):
+    tracer = RecordingTracer()
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url, tracer=tracer)
+    session.get('/papi/v1/groups')
+    session.get('/papi/v1/groups')
+
+    first, second = (span.attributes for span in tracer.find('edgegrid.send'))
+    assert not first['edgegrid.connection.reused']
+    assert first['edgegrid.connection.acquire_time'] >= 0
+    assert first['edgegrid.connection.tcp_time'] >= 0
+    assert 'edgegrid.connection.tls_time' not in first
+    assert second['edgegrid.connection.reused']
+    assert 'edgegrid.connection.tcp_time' not in second
+
+
+def test_tls_handshake_timing(local_server, edgegrid_auth):
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(f'{test_dir}/localhost.pem')
+    local_server.socket = context.wrap_socket(local_server.socket, server_side=True)
+    tracer = RecordingTracer()
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url.replace('http:', 'https:'),
+                              tracer=tracer)
+
+    assert session.get('/papi/v1/groups', verify=f'{test_dir}/localhost.pem').status_code == 200
+    send, = tracer.find('edgegrid.send')
+    assert send.attributes['edgegrid.connection.tls_time'] > 0
+    assert send.attributes['edgegrid.connection.tcp_time'] >= 0
+
+
+def test_streaming_body_attributes(local_server, edgegrid_auth):
+    tracer = RecordingTracer()
+    edgegrid_auth.tracer = tracer
+    EdgeGridSession(edgegrid_auth, base_url=local_server.url).post(
+        '/ccu/v3/invalidate/url', data=iter([b'foo', b'bar']))
+
+    sign, = tracer.find('edgegrid.sign')
+    assert sign.attributes['edgegrid.body.hashed_bytes'] == 6
+    assert not sign.attributes['edgegrid.body.truncated']
+    assert not tracer.find('edgegrid.send')
+
+
+def test_records_transport_errors(local_server, edgegrid_auth):
+    tracer = RecordingTracer()
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url, tracer=tracer)
+    local_server.shutdown()
+    local_server.server_close()
+
+    with pytest.raises(requests.ConnectionError):
+        session.get('/papi/v1/groups')
+    send, = tracer.find('edgegrid.send')
+    assert send.attributes['error.type'] == 'ConnectionError'
+
+
+def test_disabled_by_default(local_server, edgegrid_auth):
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url)
+    assert session.tracer is None
+    assert edgegrid_auth.tracer is None
+    assert session.get('/papi/v1/groups').status_code == 200
+
+
+def test_opentelemetry_adapter(local_server, edgegrid_auth):
+    pytest.importorskip('opentelemetry')
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url,
+                              tracer=OpenTelemetryTracer())
+    assert session.get('/papi/v1/groups').status_code == 200
@@ -0,0 +1,105 @@
+# pylint: disable=missing-function-docstring,redefined-outer-name
+"""unit tests for zero-copy file uploads"""
+
+import io
+import os
+import random
+
+import pytest
+import requests
+
+from akamai.edgegrid import EdgeGridSession, upload
+from akamai.edgegrid.test.conftest import verify_signature
+from akamai.edgegrid.upload import FileUploadAdapter
+
+CONTENT = random.Random(43).randbytes(300000)
+URL = '/config-media-live/v2/msl-origin/origins/1/upload'
+
+
+@pytest.fixture
+def upload_file(tmp_path):
+    (tmp_path / 'body').write_bytes(CONTENT)
+    with open(tmp_path / 'body', 'rb') as f:
+        yield f
+
+
+@pytest.fixture
+def sendfile_calls(monkeypatch):
+    calls = []
+
+    def sendfile(out_fd, in_fd, offset, count):
+        calls.append((offset, count))
+        return real_sendfile(out_fd, in_fd, offset, count)
+
+    real_sendfile = os.sendfile
+    monkeypatch.setattr(os, 'sendfile', sendfile)
+    return calls
+
+
+@pytest.mark.skipif(not hasattr(os, 'sendfile'), reason='os.sendfile() is not available')
+def test_file_is_sent_with_sendfile(local_server, edgegrid_auth, testdata, upload_file,
+                                    sendfile_calls):
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url, file_uploads=True)
+    assert session.post(URL, data=upload_file).status_code == 200
+    upload_file.seek(0)
+    assert session.put(URL, data=upload_file).status_code == 200
+
+    for received in local_server.received:
+        assert received.body == CONTENT
+        assert received.headers['Content-Length'] == str(len(CONTENT))
+        assert verify_signature(received, testdata['client_secret'], testdata['max_body'])
+    assert sendfile_calls[0][0] == 0
+    assert sum(count for _, count in sendfile_calls) >= 2 * len(CONTENT)
+
+
+def test_file_is_sent_with_buffered_reads(local_server, edgegrid_auth, testdata, upload_file,
+                                          monkeypatch):
+    # as over TLS connections
+    monkeypatch.setattr(upload, 'can_sendfile', lambda sock: False)
+    reads = []
+    readinto = upload_file.readinto
+    monkeypatch.setattr(upload_file, 'readinto', lambda b: reads.append(len(b)) or readinto(b),
+                        raising=False)
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url)
+    session.mount('http://', FileUploadAdapter(buffer_size=131072))
+
+    assert session.post(URL, data=upload_file).status_code == 200
+    received = local_server.received[0]
+    assert received.body == CONTENT
+    assert verify_signature(received, testdata['client_secret'], testdata['max_body'])
+    assert reads == [131072, 131072, len(CONTENT) - 2 * 131072]
+
+
+def test_file_is_sent_from_its_position(local_server, edgegrid_auth, upload_file):
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url, file_uploads=True)
+    upload_file.seek(1000)
+    session.put(URL, data=upload_file)
+    assert local_server.received[0].body == CONTENT[1000:]
+
+
+@pytest.mark.parametrize('data', [CONTENT, io.BytesIO(CONTENT), (CONTENT[i:i + 65536] for i in
+                                                                 range(0, len(CONTENT), 65536))])
+def test_other_bodies_are_sent_as_usual(local_server, edgegrid_auth, sendfile_calls, data):
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url, file_uploads=True)
+    assert session.post(URL, data=data).status_code == 200
+    assert local_server.received[0].body == CONTENT
+    assert not sendfile_calls
+
+
+def test_file_shorter_than_its_content_length(local_server, edgegrid_auth, upload_file):
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url, file_uploads=True)
+    request = session.prepare_request(requests.Request('PUT', local_server.url + URL,
+                                                       data=upload_file))
+    request.headers['Content-Length'] = str(len(CONTENT) + 10)
+    with pytest.raises(requests.ConnectionError, match='ended after 300000 of 300010 bytes'):
+        session.send(request)
+
+
+def test_adapter_mounting(edgegrid_auth):
+    session = EdgeGridSession(edgegrid_auth, file_uploads=True)
+    assert isinstance(session.get_adapter('http://example.com'), FileUploadAdapter)
+    assert isinstance(session.get_adapter('https://example.com'), FileUploadAdapter)
+    adapter = FileUploadAdapter(buffer_size=4096)
+    session = EdgeGridSession(edgegrid_auth, file_uploads=adapter)
+    assert session.get_adapter('https://example.com') is adapter
+    assert adapter.poolmanager.connection_pool_kw['blocksize'] == 4096
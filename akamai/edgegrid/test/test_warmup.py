@@ -0,0 +1,71 @@
+# pylint: disable=missing-function-docstring
+"""unit tests for connection pre-warming"""
+
+import socket
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from akamai.edgegrid import EdgeGridSession, EdgeRc
+from akamai.edgegrid.warmup import edgerc_base_urls
+
+
+def closed_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def write_edgerc(path, *hosts):
+    with open(path, 'w', encoding='utf-8') as f:
+        for i, host in enumerate(hosts):
+            f.write(f'[section{i}]\nhost = {host}\nclient_token = ct\n'
+                    f'client_secret = cs\naccess_token = at\n')
+    return EdgeRc(str(path))
+
+
+def test_edgerc_base_urls(tmp_path):
+    edgerc = write_edgerc(tmp_path / 'edgerc', 'akab-a.luna.akamaiapis.net/',
+                          '"https://akab-b.luna.akamaiapis.net/"', 'akab-a.luna.akamaiapis.net',
+                          'http://127.0.0.1:8080')
+    assert edgerc_base_urls(edgerc) == [
+        'https://akab-a.luna.akamaiapis.net',
+        'https://akab-b.luna.akamaiapis.net',
+        'http://127.0.0.1:8080',
+    ]
+    # sessions use the same base URLs
+    assert [EdgeGridSession.from_edgerc(edgerc, f'section{i}').base_url for i in range(4)] == [
+        'https://akab-a.luna.akamaiapis.net',
+        'https://akab-b.luna.akamaiapis.net',
+        'https://akab-a.luna.akamaiapis.net',
+        'http://127.0.0.1:8080',
+    ]
+
+
+def test_warm_opens_pooled_connections(local_server, edgegrid_auth):
+    session = EdgeGridSession(edgegrid_auth, base_url=local_server.url)
+    result = session.warm(connections=3)
+
+    assert result.ok
+    assert result.hosts[local_server.url].connections == 3
+    assert result.elapsed >= result.hosts[local_server.url].elapsed > 0
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        statuses = list(pool.map(lambda _: session.get('/papi/v1/groups').status_code, range(3)))
+    assert statuses == [200] * 3
+    # counted once served, as the server may accept warmed connections only later
+    assert local_server.connections == 3
+
+
+def test_warm_all_edgerc_hosts(local_server, tmp_path):
+    unreachable_url = f'http://127.0.0.1:{closed_port()}'
+    edgerc = write_edgerc(tmp_path / 'edgerc', local_server.url, unreachable_url)
+    session = EdgeGridSession.from_edgerc(edgerc, 'section0')
+    assert session.base_url == local_server.url
+    result = session.warm(connections=2, timeout=1.0)
+
+    assert not result.ok
+    assert result.hosts[local_server.url].connections == 2
+    unreachable = result.hosts[unreachable_url]
+    assert unreachable.connections == 0
+    assert isinstance(unreachable.error, requests.ConnectionError)
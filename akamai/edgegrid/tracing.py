@@ -0,0 +1,168 @@
+# pylint: disable=missing-function-docstring
+"""Optional tracing of EdgeGrid request signing and transport.
+
+A tracer is any object with a start_span(name, attributes=None) method returning a context
+manager which yields a span with set_attribute(key, value) and add_event(name, attributes=None)
+methods. This is a subset of the OpenTelemetry tracing API, so OpenTelemetryTracer simply
+delegates to an OpenTelemetry tracer when the opentelemetry-api package is installed.
+"""
+
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+__all__ = ['OpenTelemetryTracer', 'RecordingTracer', 'Span']
+
+
+class Span:
+    """A finished or in-progress span recorded by RecordingTracer"""
+
+    def __init__(self, name, attributes=None, parent=None):
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.events = []
+        self.parent = parent
+        self.start_time = time.perf_counter()
+        self.end_time = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def add_event(self, name, attributes=None):
+        self.events.append((name, time.perf_counter(), dict(attributes or {})))
+
+    @property
+    def duration(self):
+        """Span duration in seconds, None while the span is in progress"""
+        if self.end_time is None:
+            return None
+        return self.end_time - self.start_time
+
+
+class RecordingTracer:
+    """A tracer keeping finished spans in memory, e.g. for tests or ad-hoc latency analysis"""
+
+    def __init__(self):
+        self.spans = []
+        self._local = threading.local()
+
+    @contextmanager
+    def start_span(self, name, attributes=None):
+        parent = getattr(self._local, 'span', None)
+        span = Span(name, attributes, parent)
+        self._local.span = span
+        try:
+            yield span
+        except BaseException as exc:
+            span.set_attribute('error.type', type(exc).__name__)
+            raise
+        finally:
+            span.end_time = time.perf_counter()
+            self._local.span = parent
+            self.spans.append(span)
+
+    def find(self, name):
+        """Returns the finished spans with the given name"""
+        return [span for span in self.spans if span.name == name]
+
+
+class OpenTelemetryTracer:  # pylint: disable=too-few-public-methods
+    """Adapts an OpenTelemetry tracer. Requires the opentelemetry-api package."""
+
+    def __init__(self, tracer=None):
+        """
+        :param tracer: opentelemetry.trace.Tracer (default is the tracer named
+            akamai.edgegrid from the global tracer provider)
+        """
+        if tracer is None:
+            try:
+                # pylint: disable=import-outside-toplevel
+                from opentelemetry import trace
+            except ImportError as exc:
+                raise ImportError('akamai.edgegrid: OpenTelemetryTracer requires the '
+                                  'opentelemetry-api package') from exc
+            tracer = trace.get_tracer('akamai.edgegrid')
+        self.tracer = tracer
+
+    def start_span(self, name, attributes=None):
+        return self.tracer.start_as_current_span(name, attributes=attributes)
+
+
+# the span of the request being sent by each thread
+_sending = threading.local()
+
+
+@contextmanager
+def sending(span):
+    """Makes span receive the connection timings of the requests sent in the context"""
+    previous = getattr(_sending, 'span', None)
+    _sending.span = span
+    try:
+        yield span
+    finally:
+        _sending.span = previous
+
+
+def set_sending_attribute(key, value):
+    span = getattr(_sending, 'span', None)
+    if span is not None:
+        span.set_attribute(key, value)
+
+
+@functools.lru_cache(maxsize=None)
+def traced_pool_class(pool_class):
+    """Returns a subclass of a urllib3 connection pool class recording on the span of the
+    request being sent how long getting a connection from the pool, opening its TCP
+    connection and its TLS handshake took"""
+
+    class TracedConnection(pool_class.ConnectionCls):  # pylint: disable=too-few-public-methods
+        """A connection of the pool timing its TCP connection and TLS handshake"""
+        tcp_time = 0.0
+
+        def _new_conn(self):
+            start = time.perf_counter()
+            sock = super()._new_conn()
+            self.tcp_time = time.perf_counter() - start
+            set_sending_attribute('edgegrid.connection.tcp_time', self.tcp_time)
+            return sock
+
+        def connect(self):
+            start = time.perf_counter()
+            super().connect()
+            if hasattr(self.sock, 'version'):
+                # an ssl.SSLSocket, the rest of connect() was the TLS handshake
+                set_sending_attribute('edgegrid.connection.tls_time',
+                                      time.perf_counter() - start - self.tcp_time)
+
+    class TracedPool(pool_class):  # pylint: disable=too-few-public-methods
+        """The pool timing how long getting a connection takes"""
+        ConnectionCls = TracedConnection
+
+        def _get_conn(self, timeout=None):
+            start = time.perf_counter()
+            conn = super()._get_conn(timeout)
+            set_sending_attribute('edgegrid.connection.acquire_time',
+                                  time.perf_counter() - start)
+            set_sending_attribute('edgegrid.connection.reused',
+                                  getattr(conn, 'sock', None) is not None)
+            return conn
+
+    TracedConnection.__name__ = 'Traced' + pool_class.ConnectionCls.__name__
+    TracedPool.__name__ = 'Traced' + pool_class.__name__
+    return TracedPool
+
+
+def trace_connections(adapter):
+    """Makes the connection pools which a requests HTTPAdapter creates from now on record
+    connection timings on the span of the request being sent. Adapters without a urllib3
+    pool manager, e.g. HTTP2Adapter, are left as they are."""
+    manager = getattr(adapter, 'poolmanager', None)
+    if manager is None or getattr(manager, 'traced', False):
+        return
+    manager.pool_classes_by_scheme = {scheme: traced_pool_class(pool_class) for scheme, pool_class
+                                      in manager.pool_classes_by_scheme.items()}
+    manager.traced = True
@@ -0,0 +1,156 @@
+# pylint: disable=missing-function-docstring
+"""Zero-copy uploads of file request bodies"""
+
+import io
+import logging
+import os
+import ssl
+import stat
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+logger = logging.getLogger(__name__)
+
+__all__ = ['FileUploadAdapter']
+
+UPLOAD_BUFFER_SIZE = 1024 * 1024
+
+
+class FileRegion:
+    """The bytes of a regular file sent as a request body. It is passed through urllib3
+    as the single chunk of the body, so that the connection sends it from the file."""
+
+    def __init__(self, file, offset, count):
+        self.file = file
+        self.offset = offset
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        yield self
+
+
+def file_region(body, content_length):
+    """Returns the FileRegion of a body which is a binary regular file sent with a
+    Content-Length, from its current position, or None for any other body"""
+    if content_length is None or not isinstance(
+            body, (io.BufferedReader, io.BufferedRandom, io.FileIO)):
+        return None
+    try:
+        offset = body.tell()
+        if not stat.S_ISREG(os.fstat(body.fileno()).st_mode):
+            return None
+    except (OSError, ValueError):
+        return None
+    return FileRegion(body, offset, int(content_length))
+
+
+def can_sendfile(sock):
+    """Tells whether the kernel can copy a file to sock: os.sendfile() bypasses the TLS
+    layer of Python, so only cleartext sockets qualify"""
+    return hasattr(os, 'sendfile') and not isinstance(sock, ssl.SSLSocket)
+
+
+class FileSendingConnection(HTTPConnection):
+    """An HTTP connection sending file bodies with os.sendfile(), so that the kernel
+    copies them from the page cache to the socket, or else with reads of blocksize bytes
+    into a single reused buffer"""
+
+    def request(self, method, url, body=None, headers=None, *, chunked=False, **kwargs):
+        # pylint: disable=arguments-differ,too-many-arguments
+        if not chunked and headers is not None:
+            content_length = next((value for key, value in headers.items()
+                                   if key.lower() == 'content-length'), None)
+            region = file_region(body, content_length)
+            if region is not None:
+                body = region
+        super().request(method, url, body, headers, chunked=chunked, **kwargs)
+
+    def send(self, data):
+        if isinstance(data, FileRegion):
+            self.send_file(data)
+        else:
+            super().send(data)
+
+    def send_file(self, region):
+        if can_sendfile(self.sock):
+            logger.debug("sending %d bytes of a file with sendfile", region.count)
+            sent = self.sock.sendfile(region.file, region.offset, region.count)
+        else:
+            sent = self.send_buffered(region)
+        if sent != region.count:
+            # the server still waits for the rest of the body
+            raise OSError(f'akamai.edgegrid: file body ended after {sent} of '
+                          f'{region.count} bytes')
+
+    def send_buffered(self, region):
+        buffer = memoryview(bytearray(min(self.blocksize, region.count)))
+        region.file.seek(region.offset)
+        sent = 0
+        while sent < region.count:
+            read = region.file.readinto(buffer[:region.count - sent])
+            if not read:
+                break
+            self.sock.sendall(buffer[:read])
+            sent += read
+        return sent
+
+
+class FileSendingHTTPSConnection(FileSendingConnection, HTTPSConnection):
+    """An HTTPS connection sending file bodies with reads of blocksize bytes into a single
+    reused buffer, as they must pass through the TLS layer"""
+
+
+class FileSendingConnectionPool(HTTPConnectionPool):
+    """A connection pool of FileSendingConnection"""
+    ConnectionCls = FileSendingConnection
+
+
+class FileSendingHTTPSConnectionPool(HTTPSConnectionPool):
+    """A connection pool of FileSendingHTTPSConnection"""
+    ConnectionCls = FileSendingHTTPSConnection
+
+
+class FileUploadAdapter(HTTPAdapter):
+    """A requests transport adapter sending request bodies which are binary regular files,
+    e.g. open(path, 'rb'), without copying them through Python buffers.
+
+    Over cleartext http:// connections the file is sent with os.sendfile(). TLS records
+    are encrypted by Python's ssl module, which does not expose kernel TLS, so over
+    https:// the file is read into a single reused buffer of buffer_size bytes and sent
+    from it, instead of in the 16 KiB blocks of the default adapter. Other bodies are sent
+    as usual. The default signing engine hashes the first max_body bytes of such files
+    from a memory map.
+
+    Usage::
+        >>> session = EdgeGridSession.from_edgerc('~/.edgerc', file_uploads=True)
+        >>> with open('rules.json', 'rb') as f:
+        ...     session.put(url, data=f, headers={'Content-Type': 'application/json'})
+
+    or, to mount it explicitly::
+        >>> session.mount('https://', FileUploadAdapter(buffer_size=4 * 1024 * 1024))
+
+    """
+
+    __attrs__ = HTTPAdapter.__attrs__ + ['buffer_size']
+
+    def __init__(self, *, buffer_size=UPLOAD_BUFFER_SIZE, **kwargs):
+        """
+        :param buffer_size: number of bytes read from the file at a time when it cannot
+            be sent with os.sendfile() (default 1 MiB)
+        :param kwargs: HTTPAdapter options, e.g. pool_maxsize or max_retries
+        """
+        self.buffer_size = buffer_size
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs.setdefault('blocksize', self.buffer_size)
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': FileSendingConnectionPool,
+            'https': FileSendingHTTPSConnectionPool,
+        }
@@ -0,0 +1,121 @@
+"""Connection pre-warming for EdgeGrid sessions"""
+
+import logging
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError
+
+logger = logging.getLogger(__name__)
+
+__all__ = ['HostWarmup', 'Warmup']
+
+HostWarmup = namedtuple('HostWarmup', ['base_url', 'connections', 'elapsed', 'error'])
+HostWarmup.__doc__ = """Outcome of warming up the connections to one host: the number of
+connections opened, the seconds it took and the exception which stopped it, if any"""
+
+
+class Warmup(namedtuple('Warmup', ['hosts', 'elapsed'])):
+    """Outcome of EdgeGridSession.warm(): a HostWarmup per base URL and the total
+    seconds the warm-up took"""
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        """True if all connections to all hosts were opened"""
+        return all(host.error is None for host in self.hosts.values())
+
+
+def edgerc_base_url(edgerc, section):
+    """Returns the base URL of the host of an EdgeRc section, without quotes or trailing
+    slash, https:// unless the host has an explicit scheme, or None if it has no host"""
+    host = edgerc.get(section, 'host').strip('"\'').rstrip('/')
+    if not host:
+        return None
+    return host if '://' in host else f'https://{host}'
+
+
+def edgerc_base_urls(edgerc):
+    """Returns the distinct base URLs of the hosts configured in all sections of an EdgeRc"""
+    base_urls = []
+    for section in edgerc.sections():
+        base_url = edgerc_base_url(edgerc, section)
+        if base_url is not None and base_url not in base_urls:
+            base_urls.append(base_url)
+    return base_urls
+
+
+def open_connection(pool, timeout):
+    """Takes a connection from a urllib3 pool and connects it (resolving DNS, opening TCP
+    and doing the TLS handshake) unless it is connected already"""
+    # pylint: disable=protected-access
+    conn = pool._get_conn()
+    try:
+        if conn.sock is None:
+            conn.timeout = timeout
+            conn.connect()
+    except (HTTPError, OSError) as exc:
+        conn.close()
+        pool._put_conn(conn)
+        raise requests.ConnectionError(exc) from exc
+    return conn
+
+
+def open_connections(pool, connections, timeout):
+    """Opens connections of a urllib3 pool in parallel and returns them to the pool.
+    Returns the number of connections opened and the last error"""
+    opened = []
+    error = None
+    with ThreadPoolExecutor(max_workers=connections) as executor:
+        futures = [executor.submit(open_connection, pool, timeout) for _ in range(connections)]
+        for future in futures:
+            try:
+                opened.append(future.result())
+            except requests.ConnectionError as exc:
+                error = exc
+    for conn in opened:
+        pool._put_conn(conn)  # pylint: disable=protected-access
+    return len(opened), error
+
+
+def warm_host(session, base_url, connections, timeout):
+    """Opens up to the given number of pooled connections to base_url in parallel and
+    returns them to the session's connection pool"""
+    start = time.perf_counter()
+    adapter = session.get_adapter(base_url)
+    if not isinstance(adapter, HTTPAdapter):
+        error = TypeError(f'akamai.edgegrid: cannot warm connections of '
+                          f'{type(adapter).__name__}')
+        return HostWarmup(base_url, 0, 0.0, error)
+
+    request = requests.Request('GET', base_url).prepare()
+    settings = session.merge_environment_settings(base_url, {}, None, None, None)
+    try:
+        pool = adapter.get_connection_with_tls_context(
+            request, settings['verify'], settings['proxies'], settings['cert'])
+        opened, error = open_connections(pool, connections, timeout)
+    except (requests.RequestException, HTTPError, OSError, ValueError) as exc:
+        opened, error = 0, exc
+
+    elapsed = time.perf_counter() - start
+    if error is not None:
+        logger.warning("warming connections to %s failed: %s", base_url, error)
+    return HostWarmup(base_url, opened, elapsed, error)
+
+
+def warm(session, base_urls, connections=1, timeout=10.0):
+    """Warms the connections to all base URLs in parallel, see EdgeGridSession.warm()"""
+    start = time.perf_counter()
+    hosts = {}
+    if base_urls:
+        with ThreadPoolExecutor(max_workers=len(base_urls)) as executor:
+            results = executor.map(
+                lambda base_url: warm_host(session, base_url, connections, timeout), base_urls)
+            hosts = {result.base_url: result for result in results}
+    result = Warmup(hosts, time.perf_counter() - start)
+    logger.debug("warmed %d connections to %d hosts in %.3fs",
+                 sum(host.connections for host in hosts.values()), len(hosts), result.elapsed)
+    return result
@@ -0,0 +1,110 @@
+# This benchmark compares uploading local files with the default requests transport
+# adapter and with the FileUploadAdapter, and hashing file bodies with the reference
+# signing engine, which reads them, and with the default engine, which maps them.
+#
+# To run this benchmark:
+#
+# 1. Install the package with "pip install -e .".
+#
+# 2. Open a Terminal or shell instance and run "python benchmarks/file_uploads.py".
+#
+# The uploads go to a local cleartext server in another process which discards the bodies.
+# The output shows the throughput of each transport and the CPU time its calling thread
+# spent per GiB, once with os.sendfile() and once with the buffered reads used over TLS.
+# Signing is timed with a max_body of 128 KiB and of 8 MiB.
+
+import multiprocessing
+import os
+import tempfile
+import time
+import timeit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from akamai.edgegrid import EdgeGridAuth, EdgeGridSession, upload
+from akamai.edgegrid.upload import FileUploadAdapter
+
+FILE_SIZE = 256 * 1024 * 1024
+UPLOADS = 8
+SIGNATURES = 200
+
+
+class SinkHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *_):
+        pass
+
+    def do_PUT(self):
+        buffer = memoryview(bytearray(1024 * 1024))
+        remaining = int(self.headers['Content-Length'])
+        while remaining:
+            remaining -= self.rfile.readinto(buffer[:remaining])
+        self.send_response(204)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+def serve(ports):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SinkHandler)
+    ports.put(server.server_address[1])
+    server.serve_forever()
+
+
+def auth(max_body=131072, engine='optimized'):
+    return EdgeGridAuth(
+        client_token='akab-client-token-xxx-xxxxxxxxxxxxxxxx',
+        client_secret='xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx=',
+        access_token='akab-access-token-xxx-xxxxxxxxxxxxxxxx',
+        max_body=max_body,
+        engine=engine,
+    )
+
+
+def run(session, path):
+    session.put('/upload', data=b'warm up')
+    wall, cpu = time.perf_counter(), time.thread_time()
+    for _ in range(UPLOADS):
+        with open(path, 'rb') as f:
+            assert session.put('/upload', data=f).status_code == 204
+    wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+    gib = UPLOADS * FILE_SIZE / 1024 ** 3
+    return gib / wall, cpu / gib
+
+
+ports = multiprocessing.Queue()
+server = multiprocessing.Process(target=serve, args=(ports,), daemon=True)
+server.start()
+base_url = f'http://127.0.0.1:{ports.get()}'
+
+with tempfile.NamedTemporaryFile() as f:
+    f.write(os.urandom(FILE_SIZE))
+    f.flush()
+
+    results = {}
+    for name in ('requests', 'sendfile', 'buffered'):
+        session = EdgeGridSession(auth(), base_url=base_url)
+        if name != 'requests':
+            session.mount('http://', FileUploadAdapter())
+        if name == 'buffered':
+            upload.can_sendfile = lambda sock: False
+        results[name] = run(session, f.name)
+        session.close()
+
+    print(f'{UPLOADS} uploads of {FILE_SIZE // 1024 ** 2} MiB')
+    for name, (throughput, cpu) in results.items():
+        print(f'{name:9} {throughput:6.2f} GiB/s, {cpu:6.3f} CPU s/GiB')
+
+    print()
+    for max_body in (128 * 1024, 8 * 1024 * 1024):
+        for engine in ('reference', 'optimized'):
+            session = requests.Session()
+            session.auth = auth(max_body, engine)
+            with open(f.name, 'rb') as body:
+                request = requests.Request('POST', 'https://example.com/upload', data=body)
+                seconds = timeit.timeit(lambda: session.prepare_request(request),
+                                        number=SIGNATURES)
+            print(f'signing, max_body {max_body // 1024:5} KiB, {engine:9} engine: '
+                  f'{seconds / SIGNATURES * 1e6:8.1f} us')
+
+server.terminate()
@@ -0,0 +1,70 @@
+# This benchmark compares sending concurrent signed requests over the default
+# HTTP/1.1 connection pool with sending them over multiplexed HTTP/2 connections.
+#
+# To run this benchmark:
+#
+# 1. Install the package with HTTP/2 support with "pip install -e .[http2]".
+#
+# 2. Open a Terminal or shell instance and run "python benchmarks/http2_transport.py".
+#
+# Both transports talk to local cleartext stand-in servers which answer each request after
+# 20 ms. The output shows the wall time and the number of connections each transport opened.
+# Against real hosts each saved connection also saves a TLS handshake, which the local
+# servers do not simulate.
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from akamai.edgegrid import EdgeGridAuth, EdgeGridSession
+from akamai.edgegrid.http2 import HTTP2Adapter
+from akamai.edgegrid.test.conftest import LocalServer
+from akamai.edgegrid.test.h2_server import H2Server
+
+REQUESTS = 2000
+CONCURRENCY = 100
+DELAY = 0.02
+
+auth = EdgeGridAuth(
+    client_token='akab-client-token-xxx-xxxxxxxxxxxxxxxx',
+    client_secret='xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx=',
+    access_token='akab-access-token-xxx-xxxxxxxxxxxxxxxx',
+)
+
+
+def run(session):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+        responses = list(pool.map(
+            lambda i: session.get(f'/papi/v1/properties/{i}'), range(REQUESTS)))
+    assert all(r.status_code == 200 for r in responses)
+    return time.perf_counter() - start
+
+
+def respond_later(_):
+    time.sleep(DELAY)
+    return 200, {'Content-Type': 'application/json'}, b'{}'
+
+
+h1_server = LocalServer()
+h1_server.responder = respond_later
+h1_server.thread.start()
+h1_session = EdgeGridSession(auth, base_url=h1_server.url)
+h1_session.mount('http://', requests.adapters.HTTPAdapter(
+    pool_connections=1, pool_maxsize=CONCURRENCY))
+h1_time = run(h1_session)
+h1_session.close()
+h1_server.shutdown()
+
+h2_server = H2Server(delay=DELAY).start()
+h2_session = EdgeGridSession(auth, base_url=h2_server.url)
+h2_session.mount('http://', HTTP2Adapter(http1=False, max_connections=4))
+h2_time = run(h2_session)
+h2_session.close()
+h2_server.stop()
+
+print(f'{REQUESTS} requests, {CONCURRENCY} concurrent, {DELAY * 1000:.0f} ms server delay')
+print(f'HTTP/1.1: {h1_time:6.2f} s, {REQUESTS / h1_time:7.0f} req/s, '
+      f'{h1_server.connections} connections')
+print(f'HTTP/2:   {h2_time:6.2f} s, {REQUESTS / h2_time:7.0f} req/s, '
+      f'{h2_server.connections} connections')
@@ -0,0 +1,70 @@
+# This benchmark compares the peak memory and time of parsing a large JSON response
+# with response.json() and with EdgeGridSession.stream_json().
+#
+# To run this benchmark:
+#
+# 1. Install the package with "pip install -e .".
+#
+# 2. Open a Terminal or shell instance and run "python benchmarks/streaming_json.py [MB]".
+#
+# A local server streams a synthetic document of about MB megabytes (default 200) with
+# chunked Transfer-Encoding. The output shows the wall time, the number of items parsed
+# and the peak memory allocated by Python while reading each response.
+
+import sys
+import time
+import tracemalloc
+
+from akamai.edgegrid import EdgeGridAuth, EdgeGridSession
+from akamai.edgegrid.test.conftest import LocalServer
+
+SIZE = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+ITEM = (b'{"credentialId": %d, "clientToken": "akab-client-token-xxx-xxxxxxxxxxxxxxxx", '
+        b'"status": "ACTIVE", "description": "' + b'x' * 120 + b'"}')
+COUNT = SIZE * 1024 * 1024 // len(ITEM)
+
+auth = EdgeGridAuth(
+    client_token='akab-client-token-xxx-xxxxxxxxxxxxxxxx',
+    client_secret='xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx=',
+    access_token='akab-access-token-xxx-xxxxxxxxxxxxxxxx',
+)
+
+
+def document(_):
+    def chunks():
+        yield b'{"items": ['
+        for start in range(0, COUNT, 1000):
+            yield b','.join(ITEM % i for i in range(start, min(start + 1000, COUNT)))
+            if start + 1000 < COUNT:
+                yield b','
+        yield b']}'
+    return 200, {'Content-Type': 'application/json'}, chunks()
+
+
+def measure(parse):
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = parse()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert count == COUNT
+    return elapsed, peak
+
+
+server = LocalServer()
+server.responder = document
+server.thread.start()
+session = EdgeGridSession(auth, base_url=server.url)
+
+json_time, json_peak = measure(
+    lambda: len(session.get('/identity-management/v3/api-clients').json()['items']))
+stream_time, stream_peak = measure(
+    lambda: sum(1 for _ in session.stream_json('/identity-management/v3/api-clients', ['items'])))
+
+session.close()
+server.shutdown()
+
+print(f'{COUNT} items, {SIZE} MB')
+print(f'response.json(): {json_time:6.2f} s, peak {json_peak / 2 ** 20:8.1f} MiB')
+print(f'stream_json():   {stream_time:6.2f} s, peak {stream_peak / 2 ** 20:8.1f} MiB')
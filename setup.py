@@ -18,7 +18,14 @@ setup(
         'dev': [
             'pylint>=2.7.0',
             'pytest>=6.1.0',
-            'pytest-cov>=2.12.1'
+            'pytest-cov>=2.12.1',
+            'httpx[http2]>=0.26.0',
+        ],
+        'http2': [
+            'httpx[http2]>=0.26.0',
+        ],
+        'opentelemetry': [
+            'opentelemetry-api>=1.0.0',
         ],
     },
     include_package_data=True,